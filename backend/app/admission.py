@@ -0,0 +1,186 @@
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument, UpdateMany
+from pymongo.errors import DuplicateKeyError
+
+from config import (
+    IDEMPOTENCY_STALE_SECONDS,
+    RATE_LIMIT_BACKEND,
+    RATE_LIMIT_IP_BURST,
+    RATE_LIMIT_IP_PER_MINUTE,
+    RATE_LIMIT_REF_BURST,
+    RATE_LIMIT_REF_PER_MINUTE,
+)
+
+class PaymentInProgress(Exception):
+    pass
+
+
+class TokenBuckets:
+    """In-process token buckets, one per key, for a single limit.
+
+    Each bucket holds up to ``burst`` tokens and refills at ``per_minute``.
+    Only the ``max_keys`` most recently used keys are kept; an evicted key
+    simply starts again with a full bucket.
+    """
+
+    def __init__(self, per_minute, burst, max_keys=100_000):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def take(self, key):
+        """Take one token. Returns 0 if allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return 0 if allowed else (1 - tokens) / self.rate
+
+
+class MongoWindows:
+    """Shared limit across workers: a fixed one-minute window counter per key.
+
+    Coarser than a token bucket (a burst of ``per_minute + burst`` fits in
+    one window) but one ``$inc`` per check, and old windows are removed by
+    the TTL index on ``rate_limits.expires_at``.
+    """
+
+    def __init__(self, db, scope, per_minute, burst):
+        self.db = db
+        self.scope = scope
+        self.limit = per_minute + burst
+
+    async def take(self, key):
+        now = time.time()
+        window = int(now // 60)
+        doc = await self.db.rate_limits.find_one_and_update(
+            {"_id": f"{self.scope}:{key}:{window}"},
+            {"$inc": {"count": 1}, "$setOnInsert": {"expires_at": datetime.utcfromtimestamp((window + 2) * 60)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return 0 if doc["count"] <= self.limit else (window + 1) * 60 - now
+
+
+class PaymentRateLimiter:
+    """Per-IP and per-external_reference limits on payment creation."""
+
+    def __init__(self, backend=RATE_LIMIT_BACKEND):
+        self.backend = backend
+        self.by_ip = TokenBuckets(RATE_LIMIT_IP_PER_MINUTE, RATE_LIMIT_IP_BURST)
+        self.by_reference = TokenBuckets(RATE_LIMIT_REF_PER_MINUTE, RATE_LIMIT_REF_BURST)
+        self.rejected = 0
+
+    def start(self, db):
+        if self.backend == "mongo":
+            self.by_ip = MongoWindows(db, "ip", RATE_LIMIT_IP_PER_MINUTE, RATE_LIMIT_IP_BURST)
+            self.by_reference = MongoWindows(db, "ref", RATE_LIMIT_REF_PER_MINUTE, RATE_LIMIT_REF_BURST)
+
+    async def check(self, ip, external_reference):
+        """Returns 0 if the call may proceed, else the Retry-After in whole seconds."""
+        wait = await self.by_ip.take(ip)
+        if not wait and external_reference:
+            wait = await self.by_reference.take(external_reference)
+        if wait:
+            self.rejected += 1
+        return math.ceil(wait)
+
+    def stats(self):
+        return {"backend": self.backend, "rejected": self.rejected}
+
+
+class IdempotencyStore:
+    """One payment creation per idempotency key, with its result cached.
+
+    ``begin`` claims the key by inserting it; a second request with the same
+    key gets the stored response of the first instead of creating another
+    payment, or PaymentInProgress while the first is still talking to
+    Mercado Pago. A claim left behind by a crashed worker is taken over
+    after ``stale_seconds``. A refused payment is not retried under its
+    key: its purchase gave its stock and tables back, so the buyer starts
+    a new purchase. Records expire with the TTL index on ``created_at``.
+    """
+
+    def __init__(self, stale_seconds=IDEMPOTENCY_STALE_SECONDS):
+        self.stale_seconds = stale_seconds
+        self.db = None
+        self.replayed = 0
+
+    def start(self, db):
+        self.db = db
+
+    async def begin(self, key, external_reference):
+        """Claim ``key``. Returns the cached response if the payment already exists."""
+        now = datetime.utcnow()
+        try:
+            await self.db.payment_idempotency.insert_one({
+                "_id": key, "external_reference": external_reference, "state": "in_progress", "created_at": now,
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+
+        record = await self.db.payment_idempotency.find_one({"_id": key})
+        if record is None:
+            return await self.begin(key, external_reference)  # abandoned in between
+        if record["state"] == "done":
+            self.replayed += 1
+            return record["response"]
+        taken = await self.db.payment_idempotency.find_one_and_update(
+            {"_id": key, "state": "in_progress",
+             "created_at": {"$lte": now - timedelta(seconds=self.stale_seconds)}},
+            {"$set": {"created_at": now}},
+        )
+        if taken is None:
+            raise PaymentInProgress(key)
+        return None
+
+    async def complete(self, key, response):
+        await self.db.payment_idempotency.update_one(
+            {"_id": key}, {"$set": {"state": "done", "response": response}}
+        )
+
+    async def abandon(self, key):
+        """Release the key after a failed attempt so the client can retry."""
+        await self.db.payment_idempotency.delete_one({"_id": key, "state": "in_progress"})
+
+    def stats(self):
+        return {"replayed": self.replayed}
+
+
+async def refresh_responses(db, payments):
+    """Keep the status of cached payment responses in step with the payments.
+
+    A replayed response then shows what the payment became (a card created
+    ``in_process`` and later rejected replays ``rejected``), not its status
+    at creation time.
+    """
+    updates = [
+        UpdateMany({"response.payment_id": payment["id"], "state": "done"},
+                   {"$set": {"response.status": payment["status"]}})
+        for payment in payments
+    ]
+    if updates:
+        await db.payment_idempotency.bulk_write(updates, ordered=False)
+
+
+payment_rate_limiter = PaymentRateLimiter()
+idempotency_store = IdempotencyStore()
+
+
+def get_payment_rate_limiter() -> PaymentRateLimiter:
+    return payment_rate_limiter
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    return idempotency_store
@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+
+from pymongo.errors import BulkWriteError
+
+import payment_events
+from config import ARCHIVE_BATCH_SIZE
+from events import ACTIVE, ARCHIVED, EVENT_COLLECTIONS, EVENTS, UnknownEvent
+
+logger = logging.getLogger(__name__)
+
+
+class EventNotFinished(Exception):
+    pass
+
+
+def archive_name(collection):
+    return f"{collection}_archive"
+
+
+async def _insert_new(collection, docs):
+    """Insert ``docs``, skipping the ones a previous interrupted run already copied."""
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        if any(err["code"] != 11000 for err in e.details["writeErrors"]):
+            raise
+
+
+async def _move_payment_events(db, event_id, references):
+    docs = await db[payment_events.EVENTS].find({"external_reference": {"$in": references}}).to_list(length=None)
+    if not docs:
+        return 0
+    for doc in docs:
+        doc["event_id"] = event_id  # payment events carry no event_id in the hot collection
+    await _insert_new(db[archive_name(payment_events.EVENTS)], docs)
+    await db[payment_events.EVENTS].delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+    return len(docs)
+
+
+async def archive_event(db, event_id, batch_size=ARCHIVE_BATCH_SIZE, force=False):
+    """Move every document of a finished event to the ``<collection>_archive`` collections.
+
+    Each collection is drained ``batch_size`` documents at a time through
+    an index led by event_id: one unordered ``insert_many`` into the cold
+    collection, then one ``delete_many`` of the same ids, so the hot
+    collections and their indexes only keep the events still running.
+    Copies come before deletes and duplicates are skipped, so a run that
+    dies halfway is finished by running it again. The payment history of
+    the event's purchases moves with them. ``force`` archives an event
+    that is still on sale. Returns the documents moved per collection.
+    """
+    event = await db[EVENTS].find_one({"_id": event_id})
+    if event is None:
+        raise UnknownEvent(event_id)
+    if event.get("status", ACTIVE) == ACTIVE and not force:
+        raise EventNotFinished(event_id)
+
+    moved = {}
+    for collection in EVENT_COLLECTIONS:
+        count = 0
+        while True:
+            docs = await db[collection].find({"event_id": event_id}).limit(batch_size).to_list(length=batch_size)
+            if not docs:
+                break
+            await _insert_new(db[archive_name(collection)], docs)
+            if collection == "purchases":
+                references = [doc["external_reference"] for doc in docs if doc.get("external_reference")]
+                moved[payment_events.EVENTS] = (moved.get(payment_events.EVENTS, 0)
+                                                + await _move_payment_events(db, event_id, references))
+            await db[collection].delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+            count += len(docs)
+        if count:
+            moved[collection] = count
+            logger.info("Archived %s documents of %s from %s", count, event_id, collection)
+
+    update = {"$set": {"status": ARCHIVED, "archived_at": datetime.utcnow()}}
+    if moved:
+        update["$inc"] = {f"archived.{collection}": count for collection, count in moved.items()}
+    await db[EVENTS].update_one({"_id": event_id}, update)
+    return moved
+
+
+async def _main(args):
+    import database
+
+    await database.connect_to_mongo()
+    try:
+        moved = await archive_event(database.get_database(), args.event_id, args.batch_size, args.force)
+        print(f"Archived {args.event_id}: {moved}")
+    except EventNotFinished:
+        raise SystemExit(f"{args.event_id} is still on sale; finish it first (events.py --set "
+                         f"{args.event_id} --status finished) or pass --force")
+    except UnknownEvent:
+        raise SystemExit(f"Unknown event: {args.event_id}")
+    finally:
+        database.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move a finished event to the archive collections")
+    parser.add_argument("event_id")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--force", action="store_true", help="archive even if the event is still on sale")
+    asyncio.run(_main(parser.parse_args()))
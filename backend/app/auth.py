@@ -0,0 +1,18 @@
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from config import ADMIN_TOKEN
+
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    """Dependency of every admin route: ``Authorization: Bearer <ADMIN_TOKEN>``.
+
+    Without ADMIN_TOKEN configured the admin routes are closed, never open.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API disabled: ADMIN_TOKEN is not set")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
@@ -0,0 +1,327 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import uuid
+from datetime import datetime
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from config import DEFAULT_EVENT_ID, TICKET_SIGNING_KEY
+
+logger = logging.getLogger(__name__)
+
+TICKETS = "tickets"
+VALID = "valid"
+USED = "used"
+REVOKED = "revoked"  # refunded or charged back before the door
+
+# Guests admitted per convite; anything not listed admits one
+TICKETS_PER_CONVITE = {"casal": 2}
+
+SIGNATURE_CHARS = 20  # 80 bits of HMAC-SHA256, short enough for a small QR code
+TICKET_KEY_CHARS = 24
+PURCHASE_TOKEN_CHARS = 32
+
+_key = (TICKET_SIGNING_KEY or "").encode()
+
+
+class InvalidTicket(Exception):
+    pass
+
+
+class TicketAlreadyUsed(Exception):
+    pass
+
+
+def sign(ticket_id):
+    """The code printed on the ticket: its id and a truncated HMAC of the id."""
+    digest = hmac.new(_key, ticket_id.encode(), hashlib.sha256).hexdigest()[:SIGNATURE_CHARS]
+    return f"{ticket_id}.{digest}"
+
+
+def ticket_key(ticket_id):
+    """Opaque key of a ticket in the scanner sync: a scanner derives it from the id in a scanned code."""
+    return hashlib.sha256(ticket_id.encode()).hexdigest()[:TICKET_KEY_CHARS]
+
+
+def purchase_token(external_reference):
+    """Secret handed to the buyer by iniciar-compra; fetching the tickets requires it."""
+    return hmac.new(_key, f"purchase:{external_reference}".encode(), hashlib.sha256).hexdigest()[:PURCHASE_TOKEN_CHARS]
+
+
+def check_purchase_token(external_reference, token):
+    return bool(token) and hmac.compare_digest(purchase_token(external_reference), token)
+
+
+def verify(code):
+    """Return the ticket id of a correctly signed code. Raises InvalidTicket."""
+    ticket_id, _, signature = code.strip().rpartition(".")
+    if not ticket_id or not hmac.compare_digest(sign(ticket_id)[-SIGNATURE_CHARS:], signature):
+        raise InvalidTicket(code)
+    return ticket_id
+
+
+def ticket_docs(purchase, now):
+    """Ticket documents for one approved purchase; ids are deterministic."""
+    count = TICKETS_PER_CONVITE.get(purchase.get("conviteType"), 1)
+    holder = f"{purchase.get('nome', '')} {purchase.get('sobrenome', '')}".strip()
+    return [{
+        "_id": f"{purchase['external_reference']}-{n}",
+        "event_id": purchase.get("event_id", DEFAULT_EVENT_ID),
+        "external_reference": purchase["external_reference"],
+        "conviteType": purchase.get("conviteType"),
+        "holder": holder,
+        "status": VALID,
+        "issued_at": now,
+        "updated_at": now,
+    } for n in range(1, count + 1)]
+
+
+async def issue_tickets(db, purchases):
+    """Issue the tickets of approved purchases in one unordered insert.
+
+    Ticket ids derive from the external_reference, so a repeated approval
+    (webhook retries, reconciliation) hits the unique ``_id`` and issues
+    nothing new. Returns how many tickets were created.
+    """
+    now = datetime.utcnow()
+    docs = [doc for purchase in purchases for doc in ticket_docs(purchase, now)]
+    if not docs:
+        return 0
+    try:
+        result = await db[TICKETS].insert_many(docs, ordered=False)
+        issued = len(result.inserted_ids)
+    except BulkWriteError as e:
+        if any(err["code"] != 11000 for err in e.details["writeErrors"]):
+            raise
+        issued = e.details["nInserted"]
+    if issued:
+        get_checkin_index().add(doc["_id"] for doc in docs)
+    return issued
+
+
+async def revoke_tickets(db, references):
+    """Revoke the unused tickets of refunded or charged back purchases. Returns how many."""
+    references = list(references)
+    if not references:
+        return 0
+    tickets = await db[TICKETS].find(
+        {"external_reference": {"$in": references}, "status": VALID}, {"_id": 1}
+    ).to_list(length=None)
+    if not tickets:
+        return 0
+    now = datetime.utcnow()
+    ids = [t["_id"] for t in tickets]
+    result = await db[TICKETS].update_many(
+        {"_id": {"$in": ids}, "status": VALID},
+        {"$set": {"status": REVOKED, "revoked_at": now, "updated_at": now}},
+    )
+    index = get_checkin_index()
+    for ticket_id in ids:
+        index.status[ticket_id] = REVOKED
+    logger.info("Revoked %s tickets of %s refunded purchases", result.modified_count, len(references))
+    return result.modified_count
+
+
+async def purchase_codes(db, external_reference, event_id=DEFAULT_EVENT_ID):
+    tickets = await db[TICKETS].find(
+        {"external_reference": external_reference, "event_id": event_id},
+        {"status": 1, "holder": 1, "conviteType": 1},
+    ).sort("_id", 1).to_list(length=None)
+    return [{**t, "code": sign(t.pop("_id"))} for t in tickets]
+
+
+class CheckInIndex:
+    """In-memory ``ticket id -> status`` for the door.
+
+    Loaded once at startup and kept in sync by the ``tickets`` change stream
+    (a periodic reload on standalone servers), so a scan is validated with
+    an HMAC check and a dict lookup, without touching Mongo. Admitting a
+    ticket is still one conditional ``valid -> used`` update, which is what
+    makes a ticket single-use across every worker and scanner.
+    """
+
+    def __init__(self, reload_seconds=30.0):
+        self.reload_seconds = reload_seconds
+        self.db = None
+        self.status = {}
+        self._task = None
+        self._change_stream = False
+        self._counters = {"scans": 0, "admitted": 0, "already_used": 0, "invalid": 0, "reloads": 0}
+
+    async def start(self, db):
+        if not TICKET_SIGNING_KEY:
+            raise RuntimeError("TICKET_SIGNING_KEY is not set; it is only optional with APP_ENV=development")
+        self.db = db
+        await self.reload()
+        self._task = asyncio.create_task(self._sync(), name="checkin-sync")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def reload(self):
+        status = {}
+        async for ticket in self.db[TICKETS].find({}, {"status": 1}):
+            status[ticket["_id"]] = ticket["status"]
+        self.status = status
+        self._counters["reloads"] += 1
+
+    def add(self, ticket_ids):
+        for ticket_id in ticket_ids:
+            self.status.setdefault(ticket_id, VALID)
+
+    async def _sync(self):
+        while True:
+            try:
+                async with self.db[TICKETS].watch(full_document="updateLookup") as stream:
+                    if not self._change_stream:
+                        self._change_stream = True
+                        await self.reload()  # catch up on what changed before the stream opened
+                    async for change in stream:
+                        ticket = change.get("fullDocument")
+                        if ticket:
+                            self.status[ticket["_id"]] = ticket["status"]
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                if self._change_stream:
+                    logger.warning("Ticket change stream interrupted: %s", e)
+                    self._change_stream = False
+                    await asyncio.sleep(1)
+                    continue
+                logger.info("Ticket change stream unavailable, reloading every %ss: %s", self.reload_seconds, e)
+                await self._reload_loop()
+
+    async def _reload_loop(self):
+        while True:
+            await asyncio.sleep(self.reload_seconds)
+            try:
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error reloading tickets: %s", e)
+
+    def validate(self, code):
+        """Signature and local status check. Returns the ticket id or raises."""
+        self._counters["scans"] += 1
+        try:
+            ticket_id = verify(code)
+        except InvalidTicket:
+            self._counters["invalid"] += 1
+            raise
+        # A signed id this worker has not synced yet is left for Mongo to decide
+        status = self.status.get(ticket_id)
+        if status == REVOKED:
+            self._counters["invalid"] += 1
+            raise InvalidTicket(code)
+        if status == USED:
+            self._counters["already_used"] += 1
+            raise TicketAlreadyUsed(ticket_id)
+        return ticket_id
+
+    async def check_in(self, code, device_id=None, scanned_at=None, event_id=DEFAULT_EVENT_ID):
+        """Admit one ticket at the event's door. Raises InvalidTicket or TicketAlreadyUsed."""
+        ticket_id = self.validate(code)
+        now = datetime.utcnow()
+        ticket = await self.db[TICKETS].find_one_and_update(
+            {"_id": ticket_id, "event_id": event_id, "status": VALID},
+            {"$set": {"status": USED, "used_at": scanned_at or now, "device_id": device_id, "updated_at": now}},
+            projection={"holder": 1, "conviteType": 1},
+        )
+        if ticket is None:
+            # A ticket of another event, or a revoked one, is as invalid here as a forged one
+            current = await self.db[TICKETS].find_one({"_id": ticket_id, "event_id": event_id}, {"status": 1})
+            if current is None or current["status"] == REVOKED:
+                if current is not None:
+                    self.status[ticket_id] = REVOKED
+                self._counters["invalid"] += 1
+                raise InvalidTicket(code)
+            # Used elsewhere since this worker last synced
+            self.status[ticket_id] = USED
+            self._counters["already_used"] += 1
+            raise TicketAlreadyUsed(ticket_id)
+        self.status[ticket_id] = USED
+        self._counters["admitted"] += 1
+        return {"ticket_id": ticket_id, "holder": ticket.get("holder"), "conviteType": ticket.get("conviteType")}
+
+    async def check_in_batch(self, scans, device_id=None, event_id=DEFAULT_EVENT_ID):
+        """Apply the scans an offline scanner queued, in order.
+
+        Valid tickets are flipped by one unordered bulk write of conditional
+        updates tagged with a batch id; re-reading them tells which scans won.
+        The first scan of a ticket in the batch wins, later ones are reported
+        ``already_used``.
+        """
+        results = [None] * len(scans)
+        first = {}
+        for i, scan in enumerate(scans):
+            try:
+                ticket_id = self.validate(scan["code"])
+            except InvalidTicket:
+                results[i] = {"code": scan["code"], "result": "invalid"}
+                continue
+            except TicketAlreadyUsed:
+                results[i] = {"code": scan["code"], "result": "already_used"}
+                continue
+            if ticket_id in first:
+                self._counters["already_used"] += 1
+                results[i] = {"code": scan["code"], "result": "already_used"}
+                continue
+            first[ticket_id] = i
+
+        if first:
+            batch_id = uuid.uuid4().hex
+            now = datetime.utcnow()
+            await self.db[TICKETS].bulk_write([
+                UpdateOne(
+                    {"_id": ticket_id, "event_id": event_id, "status": VALID},
+                    {"$set": {"status": USED, "used_at": scans[i].get("scanned_at") or now,
+                              "device_id": device_id, "checkin_batch": batch_id, "updated_at": now}},
+                )
+                for ticket_id, i in first.items()
+            ], ordered=False)
+            batch = {t["_id"]: t for t in await self.db[TICKETS].find(
+                {"_id": {"$in": list(first)}, "event_id": event_id}, {"checkin_batch": 1, "status": 1}
+            ).to_list(length=None)}
+            for ticket_id, i in first.items():
+                if ticket_id not in batch or batch[ticket_id]["status"] == REVOKED:
+                    result = "invalid"
+                else:
+                    self.status[ticket_id] = USED
+                    result = "admitted" if batch[ticket_id].get("checkin_batch") == batch_id else "already_used"
+                self._counters[result] += 1
+                results[i] = {"code": scans[i]["code"], "result": result}
+        return results
+
+    async def changes_since(self, since=None, event_id=DEFAULT_EVENT_ID):
+        """Tickets of the event changed after ``since``, for scanners that validate offline.
+
+        Tickets are keyed by ``ticket_key``: the ids carry the purchase's
+        external_reference, which a scanner has no business receiving in bulk.
+        """
+        query = {"event_id": event_id}
+        if since:
+            query["updated_at"] = {"$gt": since}
+        tickets = await self.db[TICKETS].find(query, {"status": 1, "updated_at": 1}).to_list(length=None)
+        return [{"key": ticket_key(t["_id"]), "status": t["status"]} for t in tickets]
+
+    def stats(self):
+        return {
+            "tickets": len(self.status),
+            "used": sum(1 for s in self.status.values() if s == USED),
+            "change_stream": self._change_stream,
+            **self._counters,
+        }
+
+
+checkin_index = CheckInIndex()
+
+
+def get_checkin_index() -> CheckInIndex:
+    return checkin_index
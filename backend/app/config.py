@@ -8,8 +8,106 @@ DATABASE_NAME = os.getenv("DATABASE_NAME", "eventos_db")
 MERCADO_PAGO_ACCESS_TOKEN = os.getenv("MERCADO_PAGO_ACCESS_TOKEN")
 FRONTEND_URL = os.getenv("FRONTEND_URL")
 
+# Mercado Pago gateway
+MERCADO_PAGO_API_URL = os.getenv("MERCADO_PAGO_API_URL", "https://api.mercadopago.com")
+MERCADO_PAGO_TIMEOUT = float(os.getenv("MERCADO_PAGO_TIMEOUT", "10"))  # seconds per call
+MERCADO_PAGO_MAX_CONCURRENCY = int(os.getenv("MERCADO_PAGO_MAX_CONCURRENCY", "50"))
+
+# Cache de buscas de pagamento em status-compra
+PAYMENT_LOOKUP_CACHE_SIZE = int(os.getenv("PAYMENT_LOOKUP_CACHE_SIZE", "10000"))
+PAYMENT_LOOKUP_FOUND_TTL = float(os.getenv("PAYMENT_LOOKUP_FOUND_TTL", "3600"))  # seconds
+PAYMENT_LOOKUP_NOT_FOUND_TTL = float(os.getenv("PAYMENT_LOOKUP_NOT_FOUND_TTL", "5"))  # seconds
+
+# Reserva de mesas: a mesa fica segura até o expires_at da compra; este é o
+# prazo usado quando a compra ainda não existe
+TABLE_HOLD_SECONDS = int(os.getenv("TABLE_HOLD_SECONDS", "900"))
+
 # Pricing constants
 CONVITE_UNITARIO_PRICE = 2500  # R$25.00 in cents
 CONVITE_CASAL_PRICE = 4000  # R$40.00 in cents
+CONVITE_CAMAROTE_PRICE = 20000  # R$200.00 in cents, mesa included
 MESA_PRICE = 2000  # R$20.00 in cents
-ESTACIONAMENTO_PRICE = 2000  # R$20.00 in cents
\ No newline at end of file
+ESTACIONAMENTO_PRICE = 2000  # R$20.00 in cents
+
+# Lotes de preço (JSON, recarregado sem restart); sem arquivo valem as constantes acima
+PRICING_FILE = os.getenv("PRICING_FILE")
+PRICING_REFRESH_SECONDS = float(os.getenv("PRICING_REFRESH_SECONDS", "10"))
+
+# Logs: LOG_FORMAT=json para uma linha JSON por registro; LOG_SAMPLE_RATE < 1
+# descarta parte dos registros abaixo de WARNING nos picos de tráfego
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1"))
+
+# Expiração de compras abandonadas: pending além de expires_at vira expired e
+# devolve mesas e estoque; compras expiradas são apagadas depois de N dias
+PURCHASE_PENDING_SECONDS = int(os.getenv("PURCHASE_PENDING_SECONDS", "1800"))
+PIX_EXPIRATION_SECONDS = int(os.getenv("PIX_EXPIRATION_SECONDS", "1800"))
+EXPIRY_SWEEP_SECONDS = float(os.getenv("EXPIRY_SWEEP_SECONDS", "60"))
+EXPIRY_BATCH_SIZE = int(os.getenv("EXPIRY_BATCH_SIZE", "500"))
+EXPIRED_PURCHASE_TTL_DAYS = int(os.getenv("EXPIRED_PURCHASE_TTL_DAYS", "30"))
+
+# Ambiente: só APP_ENV=development aceita padrões inseguros, como a chave de teste abaixo
+APP_ENV = os.getenv("APP_ENV", "production")
+
+# Rotas /api/admin/..., /admin/exports/... e /checkin dos leitores da portaria: exigem "Authorization: Bearer <ADMIN_TOKEN>";
+# sem o token ficam fechadas
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Ingressos: chave HMAC dos códigos dos QR codes; defina a mesma em todos os workers.
+# Fora de development o servidor não sobe sem ela
+TICKET_SIGNING_KEY = os.getenv("TICKET_SIGNING_KEY") or (
+    "dev-ticket-signing-key" if APP_ENV == "development" else None
+)
+
+# Servidor: processos workers (serve.py) e tempo de drenagem no desligamento
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "5000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0"))  # 0 = um worker por CPU
+DRAIN_SECONDS = float(os.getenv("DRAIN_SECONDS", "20"))
+# Pré-stop: ao receber SIGTERM o worker responde 503 em /readyz e segue atendendo
+# por N segundos, para o balanceador tirá-lo de rotação antes de fechar o socket
+PRESTOP_SECONDS = float(os.getenv("PRESTOP_SECONDS", "5"))
+
+# Controle de admissão na criação de pagamentos: limites por IP e por
+# external_reference (token bucket; RATE_LIMIT_BACKEND=mongo compartilha entre
+# workers) e fila máxima esperando o Mercado Pago antes de responder 503
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_IP_PER_MINUTE = int(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "30"))
+RATE_LIMIT_IP_BURST = int(os.getenv("RATE_LIMIT_IP_BURST", "10"))
+RATE_LIMIT_REF_PER_MINUTE = int(os.getenv("RATE_LIMIT_REF_PER_MINUTE", "6"))
+RATE_LIMIT_REF_BURST = int(os.getenv("RATE_LIMIT_REF_BURST", "3"))
+IDEMPOTENCY_STALE_SECONDS = float(os.getenv("IDEMPOTENCY_STALE_SECONDS", "60"))
+MERCADO_PAGO_MAX_QUEUE = int(os.getenv("MERCADO_PAGO_MAX_QUEUE", "50"))
+
+# Exportações (CSV/NDJSON): documentos lidos do cursor por lote
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Reconciliação com o Mercado Pago (reconciliation.py): compras abertas lidas
+# por lote, buscas por janela de data com concorrência limitada e paginação
+RECONCILE_BATCH_SIZE = int(os.getenv("RECONCILE_BATCH_SIZE", "500"))
+RECONCILE_CONCURRENCY = int(os.getenv("RECONCILE_CONCURRENCY", "4"))
+RECONCILE_PAGE_SIZE = int(os.getenv("RECONCILE_PAGE_SIZE", "100"))
+RECONCILE_WINDOW_MINUTES = int(os.getenv("RECONCILE_WINDOW_MINUTES", "60"))
+RECONCILE_MIN_AGE_SECONDS = int(os.getenv("RECONCILE_MIN_AGE_SECONDS", "300"))  # deixa o webhook chegar primeiro
+
+# Status em lote (POST /api/status-compra/batch): referências por chamada e
+# páginas da busca única no Mercado Pago (mais recentes primeiro) para as compras
+# ainda sem payment_id; o que passar dessas páginas é buscado por external_reference
+STATUS_BATCH_MAX_REFERENCES = int(os.getenv("STATUS_BATCH_MAX_REFERENCES", "500"))
+STATUS_BATCH_SEARCH_PAGES = int(os.getenv("STATUS_BATCH_SEARCH_PAGES", "5"))
+STATUS_BATCH_SEARCH_CONCURRENCY = int(os.getenv("STATUS_BATCH_SEARCH_CONCURRENCY", "4"))
+
+# Vendedores: cadastro em memória (valida vendedor_code sem ir ao banco) e
+# contadores de vendas gravados em lote; vendas não contadas de um worker que
+# caiu são recontadas a partir de vendor_sales depois de N segundos
+VENDOR_FLUSH_SECONDS = float(os.getenv("VENDOR_FLUSH_SECONDS", "5"))
+VENDOR_RELOAD_SECONDS = float(os.getenv("VENDOR_RELOAD_SECONDS", "30"))  # sem change stream
+VENDOR_REPLAY_AFTER_SECONDS = float(os.getenv("VENDOR_REPLAY_AFTER_SECONDS", "120"))
+
+# Eventos: cada documento leva event_id; as rotas antigas /api/... servem o
+# DEFAULT_EVENT_ID e /api/eventos/{event_id}/... os demais. A configuração de
+# cada evento (coleção events) fica em memória e é relida a cada N segundos
+DEFAULT_EVENT_ID = os.getenv("DEFAULT_EVENT_ID", "default")
+EVENT_REFRESH_SECONDS = float(os.getenv("EVENT_REFRESH_SECONDS", "10"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
@@ -1,33 +1,51 @@
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 import logging
 from config import MONGO_URL, DATABASE_NAME
+from indexes import ensure_indexes
+from observability import MongoCommandTimer
 
 # Configuração do logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Tamanho do pool de conexões compartilhado por todas as rotas
+MONGO_MAX_POOL_SIZE = 100
+MONGO_MIN_POOL_SIZE = 10
+
 class Database:
-    client: MongoClient = None
-    db = None
+    client: AsyncIOMotorClient = None
+    db: AsyncIOMotorDatabase = None
 
 db = Database()
 
-def connect_to_mongo():
-    """Connect to MongoDB."""
+async def connect_to_mongo():
+    """Connect to MongoDB using a single pooled async client."""
     try:
-        db.client = MongoClient(MONGO_URL)
+        db.client = AsyncIOMotorClient(
+            MONGO_URL,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            event_listeners=[MongoCommandTimer()],
+        )
         db.db = db.client[DATABASE_NAME]
-        
+
         # Testando a conexão
-        db.client.admin.command('ping')  # Comando para verificar a conexão com o MongoDB
-        
+        await db.client.admin.command('ping')  # Comando para verificar a conexão com o MongoDB
+
         logger.info("Connected to MongoDB!")
+
+        # Garante os índices das coleções quentes (idempotente)
+        await ensure_indexes(db.db)
     except Exception as e:
-        logger.error(f"Failed to connect to MongoDB: {str(e)}")
+        logger.error("Failed to connect to MongoDB: %s", e)
         raise
 
 def close_mongo_connection():
     """Close the MongoDB connection."""
     if db.client:
         db.client.close()
-        logger.info("MongoDB connection closed!")
\ No newline at end of file
+        logger.info("MongoDB connection closed!")
+
+def get_database() -> AsyncIOMotorDatabase:
+    """Return the database handle created by connect_to_mongo."""
+    return db.db
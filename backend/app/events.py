@@ -0,0 +1,214 @@
+import argparse
+import asyncio
+import json
+import logging
+from datetime import datetime
+
+from fastapi import HTTPException, Path, Request
+
+from config import DEFAULT_EVENT_ID, EVENT_REFRESH_SECONDS
+from pricing import PriceBook, PriceTier, get_price_book
+
+logger = logging.getLogger(__name__)
+
+EVENTS = "events"
+
+ACTIVE = "active"  # on sale
+FINISHED = "finished"  # no new purchases; check-in, tickets and reports still served
+ARCHIVED = "archived"  # its documents were moved to the cold collections (archive.py)
+STATUSES = (ACTIVE, FINISHED, ARCHIVED)
+
+# Collections whose documents belong to one evento through their event_id.
+# payment_events, webhook_queue and the admission collections are keyed by
+# payment or external_reference, which are unique across events.
+EVENT_COLLECTIONS = ["purchases", "tables", "reservations", "tickets", "vendor_sales", "inventory", "sales_rollups"]
+
+
+class UnknownEvent(Exception):
+    pass
+
+
+class Event:
+    """One evento as the routes see it: id, status and its own PriceBook."""
+
+    __slots__ = ("id", "doc", "prices")
+
+    def __init__(self, doc, prices):
+        self.id = doc["_id"]
+        self.doc = doc
+        self.prices = prices
+
+    @property
+    def status(self):
+        return self.doc.get("status", ACTIVE)
+
+    @property
+    def on_sale(self):
+        return self.status == ACTIVE
+
+    def to_dict(self):
+        return {"event_id": self.id, "nome": self.doc.get("nome"), "status": self.status,
+                "price_tier": self.prices.active.name}
+
+
+class EventRegistry:
+    """In-memory ``event_id -> Event`` built from the ``events`` collection.
+
+    Re-read every ``refresh_seconds``, so opening, finishing or re-pricing
+    an event needs no restart, and a request resolves its event with a dict
+    lookup. An event's ``pricing`` (``{"tiers": [...]}``, the PRICING_FILE
+    format) gets its own PriceBook, rebuilt only when it changes; without
+    one, new events use the constants in config.py. ``DEFAULT_EVENT_ID``
+    always exists and uses the global price book unless its document
+    overrides the prices.
+    """
+
+    def __init__(self, refresh_seconds=EVENT_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.db = None
+        self.events = {DEFAULT_EVENT_ID: Event({"_id": DEFAULT_EVENT_ID, "status": ACTIVE}, get_price_book())}
+        self._task = None
+
+    async def start(self, db):
+        self.db = db
+        await backfill(db)
+        await self.refresh()
+        self._task = asyncio.create_task(self._refresh_loop(), name="event-registry-refresh")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _prices(self, doc):
+        event_id = doc["_id"]
+        current = self.events.get(event_id)
+        pricing = doc.get("pricing")
+        if current is not None and current.doc.get("pricing") == pricing:
+            return current.prices
+        if pricing is None and event_id == DEFAULT_EVENT_ID:
+            return get_price_book()
+        book = PriceBook(path=None, event_id=event_id)
+        if pricing is not None:
+            book.set_tiers([PriceTier.from_dict(tier) for tier in pricing["tiers"]])
+        book.db = self.db
+        return book
+
+    async def refresh(self):
+        events = {}
+        async for doc in self.db[EVENTS].find({}):
+            try:
+                events[doc["_id"]] = Event(doc, self._prices(doc))
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error("Keeping event %s as it was, invalid document: %s", doc.get("_id"), e)
+                if doc.get("_id") in self.events:
+                    events[doc["_id"]] = self.events[doc["_id"]]
+        events.setdefault(DEFAULT_EVENT_ID, self.events[DEFAULT_EVENT_ID])
+        for event in events.values():
+            # The global book refreshes itself; the others are refreshed here
+            if event.on_sale and event.prices is not get_price_book():
+                await event.prices.refresh()
+        self.events = events
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error refreshing events: %s", e)
+
+    def get(self, event_id):
+        event = self.events.get(event_id)
+        if event is None:
+            raise UnknownEvent(event_id)
+        return event
+
+    def stats(self):
+        return {"events": [event.to_dict() for event in self.events.values()]}
+
+
+async def backfill(db, event_id=DEFAULT_EVENT_ID):
+    """Give documents written before events existed to ``event_id``.
+
+    One indexed ``update_many`` per collection (every event collection has an
+    index led by event_id), so it is cheap once done and safe on every
+    startup. Sales rollups are keyed by event in their _id and are rebuilt
+    instead (``python sales_rollups.py``).
+    """
+    updated = {}
+    for collection in EVENT_COLLECTIONS:
+        if collection == "sales_rollups":
+            continue
+        result = await db[collection].update_many({"event_id": None}, {"$set": {"event_id": event_id}})
+        if result.modified_count:
+            updated[collection] = result.modified_count
+    if updated:
+        logger.info("Assigned documents without an event to %s: %s", event_id, updated)
+    if await db.sales_rollups.find_one({"event_id": None}, {"_id": 1}):
+        logger.warning("sales_rollups has documents from before events; run python sales_rollups.py to rebuild")
+    return updated
+
+
+event_registry = EventRegistry()
+
+
+def get_event_registry() -> EventRegistry:
+    return event_registry
+
+
+async def current_event(request: Request) -> Event:
+    """The evento of the request: {event_id} on /api/eventos/{event_id}/..., DEFAULT_EVENT_ID on /api/..."""
+    event_id = request.path_params.get("event_id", DEFAULT_EVENT_ID)
+    try:
+        return event_registry.get(event_id)
+    except UnknownEvent:
+        raise HTTPException(status_code=404, detail=f"Unknown event: {event_id}")
+
+
+def event_path(event_id: str = Path(..., description="Event id, e.g. festa-junina-2026")):
+    """Documents the {event_id} of the event-scoped routes; current_event resolves it"""
+    return event_id
+
+
+async def _main(args):
+    import database
+
+    await database.connect_to_mongo()
+    try:
+        db = database.get_database()
+        if args.backfill:
+            print(f"Backfilled: {await backfill(db)}")
+        if args.set:
+            update = {"updated_at": datetime.utcnow()}
+            if args.nome:
+                update["nome"] = args.nome
+            if args.status:
+                update["status"] = args.status
+            if args.pricing_file:
+                with open(args.pricing_file) as f:
+                    pricing = {"tiers": json.load(f)["tiers"]}
+                for tier in pricing["tiers"]:
+                    PriceTier.from_dict(tier)  # fail here, not in every worker
+                update["pricing"] = pricing
+            await db[EVENTS].update_one(
+                {"_id": args.set}, {"$set": update, "$setOnInsert": {"created_at": datetime.utcnow()}}, upsert=True
+            )
+        async for event in db[EVENTS].find({}, {"pricing": 0}).sort("_id", 1):
+            print(" ".join(f"{key}={value}" for key, value in event.items()))
+    finally:
+        database.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List, create or update eventos")
+    parser.add_argument("--set", metavar="EVENT_ID", help="create or update this event")
+    parser.add_argument("--nome")
+    parser.add_argument("--status", choices=[ACTIVE, FINISHED], help="archived is set by archive.py")
+    parser.add_argument("--pricing-file", help="price tiers for this event, in the PRICING_FILE format")
+    parser.add_argument("--backfill", action="store_true",
+                        help=f"assign documents without event_id to {DEFAULT_EVENT_ID}")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from config import EXPIRY_BATCH_SIZE, EXPIRY_SWEEP_SECONDS, PIX_EXPIRATION_SECONDS, PURCHASE_PENDING_SECONDS
+from inventory import get_inventory
+from reservations import get_reservation_engine
+from status_stream import get_status_broker
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+EXPIRED = "expired"
+
+# Purchases created before expires_at existed: Mercado Pago's default PIX
+# validity is 24h, so nothing older can still be paid
+LEGACY_PENDING_SECONDS = 24 * 3600
+
+# Time after a PIX charge expires for its last-second webhook to arrive
+PIX_GRACE_SECONDS = 300
+
+
+def pending_expires_at(now):
+    """When a purchase that never got a payment is given up."""
+    return now + timedelta(seconds=PURCHASE_PENDING_SECONDS)
+
+
+def pix_expiration(now):
+    """``date_of_expiration`` for a new PIX charge and the purchase's matching ``expires_at``."""
+    charge_expires = now + timedelta(seconds=PIX_EXPIRATION_SECONDS)
+    date_of_expiration = charge_expires.replace(tzinfo=timezone.utc).isoformat(timespec="milliseconds")
+    return date_of_expiration, charge_expires + timedelta(seconds=PIX_GRACE_SECONDS)
+
+
+class ExpirySweeper:
+    """Expires abandoned pending purchases and gives back what they held.
+
+    Every purchase carries ``expires_at`` (iniciar-compra sets it, a PIX
+    charge moves it to the charge's own expiration). One worker at a time,
+    holder of a lease in the ``leases`` collection, moves pending purchases
+    past that date to ``expired`` in batches of ``batch_size`` and releases
+    their table holds and stock. Each batch is a short indexed update, and
+    the loop yields between batches so request handling is never starved.
+    Expired purchases are removed later by a TTL index.
+    """
+
+    LEASE_ID = "expiry-sweeper"
+
+    def __init__(self, interval=EXPIRY_SWEEP_SECONDS, batch_size=EXPIRY_BATCH_SIZE, lease_seconds=None):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds or max(3 * interval, 30)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self.db = None
+        self._task = None
+        self._counters = {"runs": 0, "batches": 0, "expired": 0, "tables_released": 0, "stock_released": 0}
+        self.leader = False
+
+    def start(self, db):
+        self.db = db
+        self._task = asyncio.create_task(self._loop(), name="expiry-sweeper")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.leader:
+            await self.db.leases.delete_one({"_id": self.LEASE_ID, "owner": self.owner})
+            self.leader = False
+
+    async def acquire_lease(self):
+        """Take or renew the sweeper lease. Returns True if this worker holds it."""
+        now = datetime.utcnow()
+        try:
+            lease = await self.db.leases.find_one_and_update(
+                {"_id": self.LEASE_ID, "$or": [{"owner": self.owner}, {"expires_at": {"$lte": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # Someone else holds an unexpired lease; the upsert lost the race
+            lease = None
+        self.leader = lease is not None and lease["owner"] == self.owner
+        return self.leader
+
+    def _query(self, now):
+        return {"status": PENDING, "$or": [
+            {"expires_at": {"$lte": now}},
+            {"expires_at": {"$exists": False}, "created_at": {"$lte": now - timedelta(seconds=LEGACY_PENDING_SECONDS)}},
+        ]}
+
+    async def expire_batch(self, now=None):
+        """Expire up to ``batch_size`` purchases. Returns how many were expired."""
+        now = now or datetime.utcnow()
+        stale = await self.db.purchases.find(self._query(now), {"_id": 1}).limit(self.batch_size).to_list(
+            length=self.batch_size
+        )
+        if not stale:
+            return 0
+        ids = [p["_id"] for p in stale]
+        # The status condition loses to a payment approved in the meantime
+        result = await self.db.purchases.update_many(
+            {"_id": {"$in": ids}, **self._query(now)},
+            {"$set": {"status": EXPIRED, "expired_at": now, "updated_at": now}},
+        )
+        # Releasing is idempotent, so re-reading by status is enough to skip
+        # purchases that were paid between the find and the update
+        expired = await self.db.purchases.find(
+            {"_id": {"$in": ids}, "status": EXPIRED}, {"external_reference": 1, "inventory": 1}
+        ).to_list(length=None)
+        refs = [p["external_reference"] for p in expired]
+        # Stock is returned one purchase at a time, so skip those that took none
+        with_stock = [p["external_reference"] for p in expired if p.get("inventory")]
+
+        self._counters["tables_released"] += await get_reservation_engine().release(refs)
+        self._counters["stock_released"] += await get_inventory().release_purchases(with_stock)
+        broker = get_status_broker()
+        for ref in refs:
+            broker.publish(ref, EXPIRED)
+
+        self._counters["batches"] += 1
+        self._counters["expired"] += result.modified_count
+        return result.modified_count
+
+    async def sweep(self):
+        """Expire everything that is due, batch by batch. Returns the total."""
+        total = 0
+        while True:
+            expired = await self.expire_batch()
+            total += expired
+            if expired < self.batch_size:
+                break
+            # Long backlogs: keep the lease alive and let requests run between batches
+            if not await self.acquire_lease():
+                break
+            await asyncio.sleep(0)
+        self._counters["runs"] += 1
+        return total
+
+    async def _loop(self):
+        while True:
+            # Jitter keeps the workers' lease attempts apart
+            await asyncio.sleep(self.interval * random.uniform(0.8, 1.2))
+            try:
+                if await self.acquire_lease():
+                    expired = await self.sweep()
+                    if expired:
+                        logger.info("Expired %s abandoned purchases", expired)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error expiring purchases: %s", e)
+
+    def stats(self):
+        return {"leader": self.leader, "interval": self.interval, "batch_size": self.batch_size, **self._counters}
+
+
+expiry_sweeper = ExpirySweeper()
+
+
+def get_expiry_sweeper() -> ExpirySweeper:
+    return expiry_sweeper
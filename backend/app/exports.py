@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import csv
+import io
+import logging
+import sys
+import zlib
+from datetime import datetime
+
+import orjson
+
+from config import DEFAULT_EVENT_ID, EXPORT_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson")
+
+# What each export reads: collection, columns in order (also the projection),
+# and the fields the status/date/vendor filters apply to. Archived events are
+# read from the collection's cold copy, "<collection>_archive" (archive.py).
+EXPORTS = {
+    "purchases": {
+        "collection": "purchases",
+        "columns": ["external_reference", "nome", "sobrenome", "telefone", "conviteType", "mesa",
+                    "estacionamento", "total_amount", "price_tier", "status", "status_detail",
+                    "payment_method", "payment_id", "vendedor_code", "created_at", "updated_at"],
+        "date_field": "created_at",
+        "vendor_field": "vendedor_code",
+    },
+    "reservations": {
+        "collection": "reservations",
+        "columns": ["table_id", "purchase_id", "status", "created_at", "expires_at"],
+        "date_field": "created_at",
+        "vendor_field": None,
+    },
+    "vendor_sales": {
+        "collection": "vendor_sales",
+        "columns": ["vendedor_code", "payment_id", "purchase_id", "amount", "status", "created_at"],
+        "date_field": "created_at",
+        "vendor_field": "vendedor_code",
+    },
+}
+
+
+class UnknownExport(Exception):
+    pass
+
+
+def export_query(name, status=None, start=None, end=None, vendedor_code=None, event_id=DEFAULT_EVENT_ID):
+    """Mongo filter for an export of one event; ``start`` is inclusive, ``end`` exclusive."""
+    if name not in EXPORTS:
+        raise UnknownExport(name)
+    spec = EXPORTS[name]
+    query = {"event_id": event_id}
+    if status:
+        query["status"] = status
+    if start or end:
+        query[spec["date_field"]] = {
+            **({"$gte": start} if start else {}),
+            **({"$lt": end} if end else {}),
+        }
+    if vendedor_code:
+        if spec["vendor_field"] is None:
+            raise ValueError(f"{name} cannot be filtered by vendor")
+        query[spec["vendor_field"]] = vendedor_code
+    return query
+
+
+async def batches(db, name, query, batch_size=EXPORT_BATCH_SIZE, archived=False):
+    """Yield lists of at most ``batch_size`` documents straight off the cursor.
+
+    The cursor walks the (event_id, _id) index (hinted) so Mongo only reads
+    the event's documents and never sorts in memory, and only one batch is
+    held here at a time.
+    """
+    spec = EXPORTS[name]
+    collection = spec["collection"] + ("_archive" if archived else "")
+    projection = {"_id": 0, **{column: 1 for column in spec["columns"]}}
+    hint = [("event_id", 1), ("_id", 1)] if "event_id" in query else [("_id", 1)]
+    cursor = (db[collection].find(query, projection, batch_size=batch_size)
+              .sort("_id", 1).hint(hint))
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@"):
+        return "'" + value  # spreadsheets would evaluate it as a formula
+    return value
+
+
+async def csv_chunks(docs, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for batch in docs:
+        writer.writerows([_cell(doc.get(column)) for column in columns] for doc in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def ndjson_chunks(docs, columns):
+    async for batch in docs:
+        yield b"".join(orjson.dumps(doc, default=str) + b"\n" for doc in batch)
+
+
+async def gzip_chunks(chunks):
+    """Compress on the fly, one gzip member for the whole stream."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream(db, name, fmt="csv", query=None, batch_size=EXPORT_BATCH_SIZE, gzip=False, archived=False):
+    """Encoded export of ``name`` as an async iterator of bytes."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    docs = batches(db, name, query or {}, batch_size, archived)
+    encode = csv_chunks if fmt == "csv" else ndjson_chunks
+    chunks = encode(docs, EXPORTS[name]["columns"])
+    return gzip_chunks(chunks) if gzip else chunks
+
+
+def filename(name, fmt, gzip=False, event_id=DEFAULT_EVENT_ID):
+    prefix = name if event_id == DEFAULT_EVENT_ID else f"{event_id}-{name}"
+    return f"{prefix}-{datetime.utcnow():%Y%m%dT%H%M%S}.{fmt}" + (".gz" if gzip else "")
+
+
+async def _main(args):
+    import database
+    from events import ARCHIVED, EVENTS
+
+    query = export_query(args.name, args.status, args.start, args.end, args.vendedor_code, args.event)
+    await database.connect_to_mongo()
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        db = database.get_database()
+        event = await db[EVENTS].find_one({"_id": args.event}, {"status": 1}) or {}
+        written = 0
+        async for chunk in stream(db, args.name, args.format, query, args.batch_size, args.gzip,
+                                  archived=event.get("status") == ARCHIVED):
+            out.write(chunk)
+            written += len(chunk)
+        logger.info("Exported %s to %s (%s bytes)", args.name, args.output or "stdout", written)
+    finally:
+        if args.output:
+            out.close()
+        database.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a collection to CSV or NDJSON")
+    parser.add_argument("name", choices=sorted(EXPORTS))
+    parser.add_argument("--event", default=DEFAULT_EVENT_ID, help="event_id to export")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--status")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="created_at >= (ISO date)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="created_at < (ISO date)")
+    parser.add_argument("--vendedor-code")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("-o", "--output", help="file to write (default stdout)")
+    asyncio.run(_main(parser.parse_args()))
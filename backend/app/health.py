@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Health:
+    """Per-process state behind the liveness and readiness probes.
+
+    Probes never touch Mongo themselves: a background task pings it every
+    ``check_interval`` seconds and the readiness probe only looks at the
+    time of the last successful ping. A worker is ready once startup has
+    finished and stops being ready when SIGTERM arrives: serve.py calls
+    ``begin_drain`` and keeps the worker serving for PRESTOP_SECONDS, so
+    the load balancer drains it before uvicorn closes its sockets.
+    """
+
+    def __init__(self, check_interval=5.0, stale_after=15.0):
+        self.check_interval = check_interval
+        self.stale_after = stale_after
+        self.started_at = time.monotonic()
+        self.ready = False
+        self.draining = False
+        self.mongo_ok_at = None
+        self.mongo_error = None
+        self.db = None
+        self._task = None
+
+    def start(self, db):
+        self.db = db
+        self.mongo_ok_at = time.monotonic()  # connect_to_mongo has just pinged
+        self._task = asyncio.create_task(self._check_loop(), name="health-check")
+        self.ready = True
+
+    def begin_drain(self):
+        self.ready = False
+        self.draining = True
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _check_loop(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await asyncio.wait_for(self.db.command("ping"), timeout=self.check_interval)
+                self.mongo_ok_at = time.monotonic()
+                self.mongo_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.mongo_error is None:
+                    logger.warning("MongoDB health check failed: %s", e)
+                self.mongo_error = str(e) or type(e).__name__
+
+    def liveness(self):
+        return {"status": "ok", "pid": os.getpid(), "uptime_seconds": round(time.monotonic() - self.started_at, 1)}
+
+    def readiness(self):
+        """``(ready, body)``; ready needs startup done, no drain and a recent Mongo ping."""
+        mongo_age = None if self.mongo_ok_at is None else time.monotonic() - self.mongo_ok_at
+        mongo_ok = mongo_age is not None and mongo_age <= self.stale_after
+        ready = self.ready and mongo_ok
+        body = {
+            "status": "ready" if ready else "draining" if self.draining else "not_ready",
+            "pid": os.getpid(),
+            "mongo_last_ok_seconds": None if mongo_age is None else round(mongo_age, 1),
+        }
+        if self.mongo_error:
+            body["mongo_error"] = self.mongo_error
+        return ready, body
+
+
+health = Health()
+
+
+def get_health() -> Health:
+    return health
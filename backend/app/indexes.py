@@ -0,0 +1,216 @@
+import argparse
+import asyncio
+import logging
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from config import EXPIRED_PURCHASE_TTL_DAYS
+from events import EVENT_COLLECTIONS
+
+logger = logging.getLogger(__name__)
+
+
+def _event_id_id(name="event_id__id"):
+    # Per-event scans in _id order: exports, archiving
+    return IndexModel([("event_id", ASCENDING), ("_id", ASCENDING)], name=name)
+
+
+# Declarative registry of the indexes each collection must have.
+# Names are explicit so the startup diff compares by name, not key order.
+# Indexes on per-event data lead with event_id, so a hot event's queries
+# only touch its own keys however many events the collection holds.
+INDEXES = {
+    "purchases": [
+        IndexModel([("external_reference", ASCENDING)], name="external_reference_unique", unique=True),
+        IndexModel(
+            [("payment_id", ASCENDING)],
+            name="payment_id_unique",
+            unique=True,
+            # Pending purchases have no payment_id yet
+            partialFilterExpression={"payment_id": {"$exists": True}},
+        ),
+        IndexModel([("status", ASCENDING), ("expires_at", ASCENDING)], name="status_expires_at"),
+        # Reconciliation walks open purchases in external_reference order
+        IndexModel([("status", ASCENDING), ("external_reference", ASCENDING)], name="status_external_reference"),
+        IndexModel([("expired_at", ASCENDING)], name="expired_at_ttl",
+                   expireAfterSeconds=EXPIRED_PURCHASE_TTL_DAYS * 24 * 3600,
+                   partialFilterExpression={"status": "expired"}),
+        # Sold count of the event's price book, per-event reports
+        IndexModel([("event_id", ASCENDING), ("status", ASCENDING), ("created_at", ASCENDING)],
+                   name="event_id_status_created_at"),
+        _event_id_id(),
+    ],
+    "tables": [
+        IndexModel([("event_id", ASCENDING), ("status", ASCENDING), ("type", ASCENDING)],
+                   name="event_id_status_type"),
+        IndexModel([("purchase_id", ASCENDING), ("status", ASCENDING)], name="purchase_id_status"),
+        IndexModel([("status", ASCENDING), ("hold_expires_at", ASCENDING)], name="status_hold_expires_at"),
+    ],
+    "reservations": [
+        IndexModel([("table_id", ASCENDING), ("status", ASCENDING)], name="table_id_status"),
+        IndexModel([("purchase_id", ASCENDING), ("status", ASCENDING)], name="purchase_id_status"),
+        IndexModel([("status", ASCENDING), ("expires_at", ASCENDING)], name="status_expires_at"),
+        _event_id_id(),
+    ],
+    "vendors": [
+        IndexModel([("code", ASCENDING)], name="code_unique", unique=True),
+    ],
+    "vendor_sales": [
+        IndexModel([("payment_id", ASCENDING)], name="payment_id_unique", unique=True),
+        IndexModel([("counted", ASCENDING), ("created_at", ASCENDING)], name="counted_created_at"),
+        _event_id_id(),
+    ],
+    "sales_rollups": [
+        IndexModel([("event_id", ASCENDING), ("kind", ASCENDING), ("vendor", ASCENDING), ("bucket", ASCENDING)],
+                   name="event_id_kind_vendor_bucket"),
+        IndexModel([("event_id", ASCENDING), ("kind", ASCENDING), ("amount_cents", DESCENDING)],
+                   name="event_id_kind_amount_cents"),
+        IndexModel([("event_id", ASCENDING), ("kind", ASCENDING), ("count", DESCENDING)],
+                   name="event_id_kind_count"),
+    ],
+    "inventory": [
+        IndexModel([("event_id", ASCENDING), ("sku", ASCENDING)], name="event_id_sku"),
+    ],
+    "payment_events": [
+        IndexModel([("external_reference", ASCENDING), ("received_at", DESCENDING)],
+                   name="external_reference_received_at"),
+    ],
+    "tickets": [
+        IndexModel([("external_reference", ASCENDING)], name="external_reference"),
+        IndexModel([("event_id", ASCENDING), ("updated_at", ASCENDING)], name="event_id_updated_at"),
+    ],
+    "payment_idempotency": [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=24 * 3600),
+        # Webhooks update the cached response of their payment
+        IndexModel([("response.payment_id", ASCENDING)], name="response_payment_id", sparse=True),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "webhook_queue": [
+        # One queued notification per payment; repeats are coalesced into it
+        IndexModel(
+            [("payment_id", ASCENDING)],
+            name="payment_id_queued_unique",
+            unique=True,
+            partialFilterExpression={"status": "queued"},
+        ),
+        IndexModel([("status", ASCENDING), ("received_at", ASCENDING)], name="status_received_at"),
+        IndexModel([("processed_at", ASCENDING)], name="processed_at_ttl", expireAfterSeconds=7 * 24 * 3600,
+                   partialFilterExpression={"status": "done"}),
+    ],
+}
+
+# Cold copies of archived events (archive.py): only read per event, by exports
+# and audits, so one (event_id, _id) index each.
+INDEXES.update({f"{collection}_archive": [_event_id_id()] for collection in EVENT_COLLECTIONS})
+INDEXES["payment_events_archive"] = [
+    IndexModel([("event_id", ASCENDING)], name="event_id"),
+    IndexModel([("external_reference", ASCENDING), ("received_at", DESCENDING)],
+               name="external_reference_received_at"),
+]
+
+# Hot-path queries that must be served by an index, used by check_query_plans.
+HOT_QUERIES = [
+    ("purchases", {"external_reference": "plan-check"}),
+    ("purchases", {"payment_id": 0}),
+    ("purchases", {"status": "pending", "expires_at": {"$lte": 0}}),
+    ("purchases", {"status": "pending", "external_reference": {"$gt": ""}}),
+    ("purchases", {"event_id": "plan-check", "status": "approved"}),
+    ("tables", {"event_id": "plan-check"}),
+    ("tables", {"event_id": "plan-check", "status": "available", "type": "camarote"}),
+    ("tables", {"status": "held", "hold_expires_at": {"$lte": 0}}),
+    ("reservations", {"table_id": "plan-check", "status": "reserved"}),
+    ("vendors", {"code": "plan-check"}),
+    ("vendor_sales", {"payment_id": 0}),
+    ("webhook_queue", {"status": "queued"}),
+    ("payment_events", {"external_reference": "plan-check"}),
+    ("tickets", {"external_reference": "plan-check"}),
+    ("tickets", {"event_id": "plan-check", "updated_at": {"$gt": 0}}),
+    ("inventory", {"event_id": "plan-check"}),
+    ("sales_rollups", {"event_id": "plan-check", "kind": "hour", "vendor": "plan-check"}),
+]
+
+
+async def index_report(db, registry=INDEXES):
+    """Compare the registry with the indexes that exist in the database.
+
+    Returns ``{collection: {"missing": [...], "extra": [...]}}``. The default
+    ``_id_`` index is never reported as extra.
+    """
+    async def existing(collection):
+        return {index["name"] async for index in db[collection].list_indexes()}
+
+    # One round trip for all collections: this runs on every worker's startup
+    names = await asyncio.gather(*(existing(collection) for collection in registry))
+    report = {}
+    for (collection, models), existing_names in zip(registry.items(), names):
+        declared = {model.document["name"] for model in models}
+        report[collection] = {
+            "missing": sorted(declared - existing_names),
+            "extra": sorted(existing_names - declared - {"_id_"}),
+        }
+    return report
+
+
+async def ensure_indexes(db, registry=INDEXES):
+    """Create any missing registry indexes. Safe to run on every startup.
+
+    Extra indexes are only reported, never dropped.
+    """
+    report = await index_report(db, registry)
+    for collection, models in registry.items():
+        missing = report[collection]["missing"]
+        if missing:
+            to_create = [model for model in models if model.document["name"] in missing]
+            await db[collection].create_indexes(to_create)
+            logger.info("Created indexes on %s: %s", collection, ', '.join(missing))
+        if report[collection]["extra"]:
+            logger.warning("Indexes not in registry on %s: %s", collection, ', '.join(report[collection]['extra']))
+    return report
+
+
+def _winning_stages(plan):
+    stage = plan.get("stage")
+    stages = [stage] if stage else []
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _winning_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _winning_stages(child)
+    return stages
+
+
+async def check_query_plans(db, queries=HOT_QUERIES):
+    """Run explain on each hot query and return the ones doing a collection scan."""
+    collection_scans = []
+    for collection, query in queries:
+        explain = await db.command("explain", {"find": collection, "filter": query}, verbosity="queryPlanner")
+        winning = explain["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in _winning_stages(winning):
+            collection_scans.append({"collection": collection, "filter": query})
+    return collection_scans
+
+
+async def _main(apply):
+    import database
+
+    await database.connect_to_mongo()
+    db = database.get_database()
+    try:
+        report = await ensure_indexes(db) if apply else await index_report(db)
+        for collection, diff in report.items():
+            print(f"{collection}: missing={diff['missing']} extra={diff['extra']}")
+        scans = await check_query_plans(db)
+        for scan in scans:
+            print(f"COLLSCAN: {scan['collection']} {scan['filter']}")
+        return 1 if scans else 0
+    finally:
+        database.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report, apply and verify MongoDB indexes")
+    parser.add_argument("--apply", action="store_true", help="create missing indexes before checking")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(_main(args.apply)))
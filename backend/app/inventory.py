@@ -0,0 +1,188 @@
+import argparse
+import asyncio
+import logging
+import random
+from datetime import datetime
+
+from pymongo import ReturnDocument, UpdateOne
+
+from config import DEFAULT_EVENT_ID
+
+logger = logging.getLogger(__name__)
+
+
+class SoldOut(Exception):
+    pass
+
+
+def purchase_skus(convite_type, mesa=False, estacionamento=False):
+    """Stock keeping units a purchase consumes, one unit each."""
+    skus = [f"convite:{convite_type}"]
+    if mesa and convite_type != "camarote":
+        skus.append("mesa")
+    if estacionamento:
+        skus.append("estacionamento")
+    return skus
+
+
+class Inventory:
+    """Stock counters per event and product, split into shards to spread write contention.
+
+    Each SKU's stock lives in ``shards`` documents (``{_id:
+    "<event_id>:<sku>:<n>", event_id, sku, remaining}``). Taking a unit is
+    one conditional ``$inc`` on a random shard with stock left, falling back
+    to the other shards, so it never goes below zero. SKUs without counters
+    are not limited. ``snapshot`` is an in-memory view of what remains per
+    ``(event_id, sku)``, adjusted on every local change and
+    re-read from Mongo every ``refresh_seconds``; it lets sold-out products
+    be refused without a round-trip.
+    """
+
+    def __init__(self, refresh_seconds=2.0):
+        self.refresh_seconds = refresh_seconds
+        self.db = None
+        self.snapshot = {}
+        self._shards = {}
+        self._task = None
+
+    def start(self, db):
+        self.db = db
+        self._task = asyncio.create_task(self._refresh_loop(), name="inventory-refresh")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def refresh(self):
+        snapshot = {}
+        shards = {}
+        async for doc in self.db.inventory.find({}, {"event_id": 1, "sku": 1, "remaining": 1}):
+            key = (doc.get("event_id", DEFAULT_EVENT_ID), doc["sku"])
+            snapshot[key] = snapshot.get(key, 0) + doc["remaining"]
+            shards.setdefault(key, []).append(doc["_id"])
+        self.snapshot = snapshot
+        self._shards = shards
+
+    def remaining(self, event_id=DEFAULT_EVENT_ID):
+        """``{sku: remaining}`` of one event."""
+        return {sku: count for (event, sku), count in self.snapshot.items() if event == event_id}
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error refreshing inventory snapshot: %s", e)
+
+    async def _take(self, key):
+        shard_ids = self._shards.get(key)
+        if not shard_ids:
+            return None  # not tracked
+        if self.snapshot.get(key, 0) <= 0:
+            raise SoldOut(key[1])
+        for shard_id in random.sample(shard_ids, len(shard_ids)):
+            doc = await self.db.inventory.find_one_and_update(
+                {"_id": shard_id, "remaining": {"$gt": 0}},
+                {"$inc": {"remaining": -1}},
+                projection={"_id": 1},
+                return_document=ReturnDocument.AFTER,
+            )
+            if doc is not None:
+                self.snapshot[key] = self.snapshot.get(key, 1) - 1
+                return shard_id
+        self.snapshot[key] = 0
+        raise SoldOut(key[1])
+
+    async def reserve(self, skus, event_id=DEFAULT_EVENT_ID):
+        """Take one unit of every SKU of the event or none. Returns the shard allocations."""
+        allocations = []
+        try:
+            for sku in skus:
+                shard_id = await self._take((event_id, sku))
+                if shard_id is not None:
+                    allocations.append({"event_id": event_id, "sku": sku, "shard": shard_id})
+        except SoldOut:
+            await self.give_back(allocations)
+            raise
+        return allocations
+
+    async def give_back(self, allocations):
+        if not allocations:
+            return
+        await self.db.inventory.bulk_write(
+            [UpdateOne({"_id": a["shard"]}, {"$inc": {"remaining": 1}}) for a in allocations],
+            ordered=False,
+        )
+        for a in allocations:
+            # Purchases from before events have allocations without event_id
+            key = (a.get("event_id", DEFAULT_EVENT_ID), a["sku"])
+            self.snapshot[key] = self.snapshot.get(key, 0) + 1
+
+    async def release_purchases(self, external_references):
+        """Return the stock held by purchases whose payment failed or expired.
+
+        Each purchase is flagged ``inventory_released`` by a conditional update
+        first, so repeated notifications never return the same stock twice.
+        """
+        released = 0
+        for external_reference in external_references:
+            purchase = await self.db.purchases.find_one_and_update(
+                {"external_reference": external_reference,
+                 "inventory": {"$exists": True, "$ne": []},
+                 "inventory_released": {"$ne": True}},
+                {"$set": {"inventory_released": True, "inventory_released_at": datetime.utcnow()}},
+                projection={"inventory": 1},
+            )
+            if purchase:
+                await self.give_back(purchase["inventory"])
+                released += 1
+        return released
+
+    async def set_stock(self, sku, quantity, shards=1, event_id=DEFAULT_EVENT_ID):
+        """Replace the counters of one SKU of the event with ``quantity`` units split over ``shards``."""
+        await self.db.inventory.delete_many({"event_id": event_id, "sku": sku})
+        per_shard, extra = divmod(quantity, shards)
+        await self.db.inventory.insert_many([
+            {"_id": f"{event_id}:{sku}:{n}", "event_id": event_id, "sku": sku, "shard": n,
+             "remaining": per_shard + (1 if n < extra else 0)}
+            for n in range(shards)
+        ])
+        await self.refresh()
+
+
+inventory = Inventory()
+
+
+def get_inventory() -> Inventory:
+    return inventory
+
+
+async def _main(args):
+    import database
+
+    await database.connect_to_mongo()
+    try:
+        inv = Inventory()
+        inv.db = database.get_database()
+        for spec in args.set or []:
+            sku, quantity = spec.rsplit("=", 1)
+            await inv.set_stock(sku, int(quantity), args.shards, args.event)
+        await inv.refresh()
+        for (event_id, sku), remaining in sorted(inv.snapshot.items()):
+            print(f"{event_id} {sku}: {remaining} remaining in {len(inv._shards[event_id, sku])} shards")
+    finally:
+        database.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show or set product stock")
+    parser.add_argument("--set", action="append", metavar="SKU=QTY",
+                        help="e.g. convite:unitario=800, mesa=60, estacionamento=150")
+    parser.add_argument("--shards", type=int, default=8, help="counter documents per SKU")
+    parser.add_argument("--event", default=DEFAULT_EVENT_ID, help="event the --set stock belongs to")
+    asyncio.run(_main(parser.parse_args()))
@@ -1,15 +1,57 @@
+from datetime import datetime
+from typing import List, Optional
+
 from pydantic import BaseModel, Field
-from typing import Optional
 
-class PurchaseRequest(BaseModel):
+from config import STATUS_BATCH_MAX_REFERENCES
+
+# Request bodies of the API routes. The payment bodies live in payment_models.
+
+
+class TableReservation(BaseModel):
+    table_id: str
+    purchase_id: str
+
+
+class MultiTableReservation(BaseModel):
+    table_ids: List[str] = Field(..., min_length=1)
+    purchase_id: str
+
+
+class InitiatePurchaseRequest(BaseModel):
     nome: str
     sobrenome: str
-    telefone: str = Field(..., pattern=r"^$$?\d{2}$$?\s?\d{4,5}-?\d{4}$")
+    telefone: str
     conviteType: str
-    mesa: bool = False
-    estacionamento: bool = False
+    mesa: bool
+    estacionamento: bool
+    amount: Optional[float] = None  # valor mostrado ao cliente, ignorado; o total é calculado no servidor
+    vendedor_code: Optional[str] = None
 
+
+class StatusBatchRequest(BaseModel):
+    # external_reference or purchase _id, mixed freely
+    references: List[str] = Field(..., min_length=1, max_length=STATUS_BATCH_MAX_REFERENCES)
+
+
+class CheckInRequest(BaseModel):
+    code: str
+    device_id: Optional[str] = None
+
+
+class OfflineScan(BaseModel):
+    code: str
+    scanned_at: Optional[datetime] = None
+
+
+class CheckInSync(BaseModel):
+    device_id: str
+    scans: List[OfflineScan] = Field(..., max_length=5000)
+
+
+# Shape of a document in the purchases collection
 class Purchase(BaseModel):
+    event_id: str
     nome: str
     sobrenome: str
     telefone: str
@@ -20,11 +62,4 @@ class Purchase(BaseModel):
     status: str = "pending"
     preference_id: Optional[str] = None
     payment_id: Optional[str] = None
-    payment_details: Optional[dict] = None
-
-class PaymentWebhook(BaseModel):
-    type: str
-    data: dict
-
-class StatusResponse(BaseModel):
-    status: str
\ No newline at end of file
+    status_detail: Optional[str] = None
@@ -0,0 +1,179 @@
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+from config import LOG_FORMAT, LOG_LEVEL, LOG_SAMPLE_RATE
+
+# Upper bounds in seconds, from a cached lookup to a slow Mercado Pago call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Spans of the request being handled, for the Server-Timing header
+_spans = contextvars.ContextVar("spans", default=None)
+
+
+class Histogram:
+    """Prometheus-style histogram with fixed buckets, one series per label set."""
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        # Mongo command events arrive on driver threads
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _label_text(self, label_values, extra=None):
+        pairs = list(zip(self.labels, label_values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._series.items())
+        for label_values, (counts, total, count) in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                le = ("le", bound if bound == "+Inf" else repr(bound))
+                lines.append(f"{self.name}_bucket{self._label_text(label_values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(label_values)} {total}")
+            lines.append(f"{self.name}_count{self._label_text(label_values)} {count}")
+        return "\n".join(lines)
+
+
+HTTP_REQUESTS = Histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests",
+    labels=("method", "route", "status"),
+)
+GATEWAY_CALLS = Histogram(
+    "mercadopago_request_duration_seconds", "Mercado Pago API call latency",
+    labels=("operation", "outcome"),
+)
+MONGO_COMMANDS = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency as seen by the driver",
+    labels=("command",),
+)
+REGISTRY = [HTTP_REQUESTS, GATEWAY_CALLS, MONGO_COMMANDS]
+
+
+def render_metrics():
+    """All histograms in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+@contextmanager
+def span(name, histogram=None, *label_values):
+    """Time a block, record it for the current request and optionally in a histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        spans = _spans.get()
+        if spans is not None:
+            spans.append((name, elapsed))
+        if histogram is not None:
+            histogram.observe(elapsed, *label_values)
+
+
+def _route_template(request):
+    # The path template keeps label cardinality bounded (no ids in labels)
+    route = request.scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+async def timing_middleware(request, call_next):
+    """Record the request duration and expose its spans as Server-Timing."""
+    spans = []
+    token = _spans.set(spans)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        timings = [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in spans]
+        timings.append(f"app;dur={(time.perf_counter() - start) * 1000:.1f}")
+        response.headers["Server-Timing"] = ", ".join(timings)
+        return response
+    finally:
+        HTTP_REQUESTS.observe(time.perf_counter() - start, request.method, _route_template(request), status)
+        _spans.reset(token)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Feeds mongo_command_duration_seconds from the driver's command events.
+
+    Motor runs the driver on a thread pool, so events cannot be tied back to
+    the request that issued them; the timings are aggregated per command.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMANDS.observe(event.duration_micros / 1e6, event.command_name)
+
+    def failed(self, event):
+        MONGO_COMMANDS.observe(event.duration_micros / 1e6, event.command_name)
+
+
+class SamplingFilter(logging.Filter):
+    """Let through every WARNING and above but only a fraction of the rest."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    """Root logging setup: level, format and sampling from config.py."""
+    handler = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+    if LOG_SAMPLE_RATE < 1:
+        handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
@@ -0,0 +1,157 @@
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+
+from pymongo import InsertOne, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+EVENTS = "payment_events"
+
+# Fields copied from a Mercado Pago payment onto the purchase document. Anything
+# else in the response only lives in payment_events.
+PURCHASE_FIELDS = ("status", "status_detail")
+
+# Purchases whose stock and tables were settled: sold (approved) or given back.
+# A payment notification never reopens them; see purchase_filter.
+CLOSED_STATUSES = ("approved", "refunded", "charged_back", "rejected", "cancelled", "expired")
+# What an approved purchase may still become through its own payment
+AFTER_APPROVED = ("approved", "refunded", "charged_back")
+
+
+def event_doc(external_reference, payment, source, now=None):
+    """One entry of a purchase's payment history, wrapping the raw response."""
+    return {
+        "external_reference": external_reference,
+        "payment_id": payment.get("id"),
+        "status": payment.get("status"),
+        "source": source,
+        "received_at": now or datetime.utcnow(),
+        "payload": payment,
+    }
+
+
+def purchase_fields(payment, now=None):
+    """The compact ``$set`` for the purchase: ids and status, not the payload."""
+    fields = {field: payment.get(field) for field in PURCHASE_FIELDS}
+    fields["payment_id"] = payment["id"]
+    fields["updated_at"] = now or datetime.utcnow()
+    return fields
+
+
+def purchase_filter(external_reference, payment):
+    """Filter for applying ``payment`` to its purchase without undoing a settled status.
+
+    Open purchases take any payment status. An approved purchase only moves
+    through its own payment (refund, chargeback) or a newer approved one,
+    so a late or out-of-order notification of an earlier attempt can't
+    downgrade it. Rejected, cancelled, expired, refunded and charged-back
+    purchases already gave their stock and tables back and stay closed.
+    """
+    allowed = [{"status": {"$nin": list(CLOSED_STATUSES)}}]
+    if payment.get("status") in AFTER_APPROVED:
+        allowed.append({"status": "approved", "payment_id": payment["id"]})
+    if payment.get("status") == "approved":
+        allowed.append({"status": "approved", "payment_id": {"$lt": payment["id"]}})
+    return {"external_reference": external_reference, "$or": allowed}
+
+
+def insert(external_reference, payment, source, now=None):
+    """Bulk-write operation appending one payment event."""
+    return InsertOne(event_doc(external_reference, payment, source, now))
+
+
+async def record(db, external_reference, payment, source):
+    """Append a payment response to the history of a purchase."""
+    await db[EVENTS].insert_one(event_doc(external_reference, payment, source))
+
+
+async def history(db, external_reference, limit=50, payload=False):
+    """Most recent payment events of a purchase, newest first."""
+    projection = {"_id": 0, "external_reference": 0}
+    if not payload:
+        projection["payload"] = 0
+    cursor = db[EVENTS].find({"external_reference": external_reference}, projection)
+    return await cursor.sort("received_at", -1).limit(limit).to_list(length=limit)
+
+
+async def latest_payment_id(db, external_reference):
+    doc = await db[EVENTS].find_one(
+        {"external_reference": external_reference, "payment_id": {"$ne": None}},
+        {"payment_id": 1},
+        sort=[("received_at", -1)],
+    )
+    return doc["payment_id"] if doc else None
+
+
+async def latest_payment_ids(db, external_references):
+    """``latest_payment_id`` for many purchases in one query: {external_reference: payment_id}."""
+    latest = {}
+    async for doc in db[EVENTS].find(
+        {"external_reference": {"$in": list(external_references)}, "payment_id": {"$ne": None}},
+        {"external_reference": 1, "payment_id": 1},
+        sort=[("external_reference", 1), ("received_at", -1)],
+    ):
+        latest.setdefault(doc["external_reference"], doc["payment_id"])
+    return latest
+
+
+async def migrate(db, batch_size=500):
+    """Move ``payment_details`` out of existing purchases into payment_events.
+
+    Streams the purchases that still carry the payload in ``_id`` order,
+    ``batch_size`` at a time. Each event is upserted on (external_reference,
+    source=migration) so a run that stops between the two writes can simply
+    be started again. Returns the number of purchases migrated.
+    """
+    migrated = 0
+    last_id = None
+    while True:
+        query = {"payment_details": {"$exists": True}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await db.purchases.find(
+            query, {"external_reference": 1, "payment_details": 1, "updated_at": 1}
+        ).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+
+        events = []
+        slim = []
+        for purchase in batch:
+            payment = purchase["payment_details"] or {}
+            doc = event_doc(purchase["external_reference"], payment, "migration",
+                            purchase.get("updated_at"))
+            events.append(UpdateOne(
+                {"external_reference": doc["external_reference"], "source": "migration"},
+                {"$setOnInsert": doc},
+                upsert=True,
+            ))
+            slim.append(UpdateOne(
+                {"_id": purchase["_id"]},
+                {"$set": {"status_detail": payment.get("status_detail")}, "$unset": {"payment_details": ""}},
+            ))
+        await db[EVENTS].bulk_write(events, ordered=False)
+        await db.purchases.bulk_write(slim, ordered=False)
+        migrated += len(batch)
+        last_id = batch[-1]["_id"]
+        logger.info("Migrated %s purchases", migrated)
+    return migrated
+
+
+async def _main(args):
+    import database
+
+    await database.connect_to_mongo()
+    try:
+        migrated = await migrate(database.get_database(), args.batch_size)
+        print(f"Moved payment_details of {migrated} purchases to {EVENTS}")
+    finally:
+        database.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move payment_details from purchases into payment_events")
+    parser.add_argument("--batch-size", type=int, default=500)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+import uuid
+
+from observability import GATEWAY_CALLS, span
+from config import (
+    MERCADO_PAGO_ACCESS_TOKEN,
+    MERCADO_PAGO_API_URL,
+    MERCADO_PAGO_MAX_CONCURRENCY,
+    MERCADO_PAGO_MAX_QUEUE,
+    MERCADO_PAGO_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentGatewayError(Exception):
+    """Raised when Mercado Pago cannot be reached or the call times out."""
+
+
+class PaymentGateway:
+    """Async Mercado Pago client backed by a pooled, keep-alive httpx client.
+
+    Responses keep the SDK shape (``{"status": <http status>, "response": <json>}``)
+    so the route handlers can check ``status`` exactly as they did with
+    ``mercadopago.SDK``.
+    """
+
+    def __init__(self, base_url=MERCADO_PAGO_API_URL, access_token=MERCADO_PAGO_ACCESS_TOKEN,
+                 timeout=MERCADO_PAGO_TIMEOUT, max_concurrency=MERCADO_PAGO_MAX_CONCURRENCY,
+                 max_queue=MERCADO_PAGO_MAX_QUEUE, transport=None):
+        self.base_url = base_url
+        self.access_token = access_token
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        # Optional httpx transport, e.g. an ASGITransport for in-process benchmarks
+        self.transport = transport
+        self.client = None  # httpx.AsyncClient, created by start()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+        self._waiting = 0
+        self._stats = {}
+
+    async def start(self):
+        """Create the pooled HTTP client. Safe to call more than once.
+
+        Called on the first Mercado Pago call; httpx is imported here so a
+        new worker does not pay for it before it can serve.
+        """
+        if self.client is None:
+            import httpx
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.access_token}"},
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                transport=self.transport,
+            )
+            logger.info("Payment gateway ready (%s)", self.base_url)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+            logger.info("Payment gateway closed!")
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    @property
+    def saturated(self):
+        """Every connection is busy and ``max_queue`` calls are already waiting for one."""
+        return self._in_flight >= self.max_concurrency and self._waiting >= self.max_queue
+
+    def retry_after(self):
+        """Rough seconds until a queued call would get a connection, for a 503's Retry-After."""
+        stats = self._stats.get("create") or {}
+        avg = stats["total_ms"] / stats["calls"] / 1000 if stats.get("calls") else self.timeout / 2
+        return max(1, int(avg * (self._waiting / self.max_concurrency + 1)))
+
+    def metrics(self):
+        """Per-operation call counters and latency totals."""
+        return {
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "operations": {name: dict(stats) for name, stats in self._stats.items()},
+        }
+
+    def _record(self, operation, elapsed, outcome):
+        stats = self._stats.setdefault(operation, {
+            "calls": 0, "errors": 0, "timeouts": 0, "total_ms": 0.0, "max_ms": 0.0,
+        })
+        stats["calls"] += 1
+        if outcome != "ok":
+            stats[outcome] += 1
+        elapsed_ms = elapsed * 1000
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    async def _request(self, operation, method, url, timeout=None, **kwargs):
+        if self.client is None:
+            await self.start()
+        import httpx
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            self._in_flight += 1
+            start = time.perf_counter()
+            outcome = "errors"
+            try:
+                with span(f"mp_{operation}"):
+                    response = await self.client.request(
+                        method, url, timeout=timeout or self.timeout, **kwargs
+                    )
+                outcome = "ok" if response.status_code < 500 else "errors"
+            except httpx.TimeoutException as e:
+                outcome = "timeouts"
+                raise PaymentGatewayError(f"Mercado Pago {operation} timed out") from e
+            except httpx.HTTPError as e:
+                raise PaymentGatewayError(f"Mercado Pago {operation} failed: {str(e)}") from e
+            finally:
+                self._in_flight -= 1
+                elapsed = time.perf_counter() - start
+                self._record(operation, elapsed, outcome)
+                GATEWAY_CALLS.observe(elapsed, operation, outcome)
+        finally:
+            self._semaphore.release()
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"message": response.text}
+        return {"status": response.status_code, "response": body}
+
+    async def create_payment(self, payment_data, idempotency_key=None, timeout=None):
+        headers = {"X-Idempotency-Key": idempotency_key or str(uuid.uuid4())}
+        return await self._request(
+            "create", "POST", "/v1/payments", json=payment_data, headers=headers, timeout=timeout
+        )
+
+    async def get_payment(self, payment_id, timeout=None):
+        return await self._request("get", "GET", f"/v1/payments/{payment_id}", timeout=timeout)
+
+    async def search_payments(self, filters, timeout=None):
+        return await self._request(
+            "search", "GET", "/v1/payments/search", params=filters, timeout=timeout
+        )
+
+
+gateway = PaymentGateway()
+
+
+def get_gateway() -> PaymentGateway:
+    return gateway
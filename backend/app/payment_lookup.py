@@ -0,0 +1,229 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from config import (
+    PAYMENT_LOOKUP_CACHE_SIZE,
+    PAYMENT_LOOKUP_FOUND_TTL,
+    PAYMENT_LOOKUP_NOT_FOUND_TTL,
+)
+from payment_gateway import PaymentGatewayError
+
+_NOT_FOUND = object()
+
+
+def mp_date(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+async def search_created_between(gateway, begin, end, page_size, max_pages=None, newest_first=False, wanted=None):
+    """Every Mercado Pago payment created in [begin, end], following the pages.
+
+    Stops after ``max_pages`` calls when given, and as soon as a payment of
+    each external_reference in ``wanted`` was seen. ``newest_first`` pages
+    from the latest payment back. Raises PaymentGatewayError when a page
+    cannot be fetched.
+    """
+    remaining = set(wanted) if wanted is not None else None
+    results = []
+    offset = 0
+    pages = 0
+    while max_pages is None or pages < max_pages:
+        pages += 1
+        page = await gateway.search_payments({
+            "range": "date_created",
+            "begin_date": mp_date(begin),
+            "end_date": mp_date(end),
+            "sort": "date_created",
+            "criteria": "desc" if newest_first else "asc",
+            "limit": page_size,
+            "offset": offset,
+        })
+        if page["status"] != 200:
+            raise PaymentGatewayError(f"Mercado Pago search returned {page['status']}")
+        batch = page["response"].get("results") or []
+        results.extend(batch)
+        offset += len(batch)
+        if not batch or offset >= page["response"].get("paging", {}).get("total", 0):
+            break
+        if remaining is not None:
+            remaining.difference_update(payment.get("external_reference") for payment in batch)
+            if not remaining:
+                break
+    return results
+
+
+async def search_references(gateway, references, concurrency):
+    """Payments of each external_reference, one search per reference. Raises PaymentGatewayError."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def search(reference):
+        async with semaphore:
+            page = await gateway.search_payments({"external_reference": reference})
+        if page["status"] != 200:
+            raise PaymentGatewayError(f"Mercado Pago search returned {page['status']}")
+        return page["response"].get("results") or []
+
+    found = await asyncio.gather(*(search(reference) for reference in references))
+    return [payment for payments in found for payment in payments]
+
+
+def _updated(payment):
+    return payment.get("date_last_updated") or payment.get("date_created") or ""
+
+
+def preferred_payment(payment, other):
+    """Which of two payments of one purchase decides its status: approved first, then the latest."""
+    if (payment["status"] == "approved") != (other["status"] == "approved"):
+        return payment if payment["status"] == "approved" else other
+    return payment if _updated(payment) >= _updated(other) else other
+
+
+class PaymentLookupCache:
+    """Single-flight, TTL + LRU cache in front of Mercado Pago payment searches.
+
+    Concurrent ``resolve`` calls for the same key share one loader call.
+    Found payments are kept for ``found_ttl`` seconds; "not found yet"
+    answers (a PIX still waiting to be paid) for the much shorter
+    ``not_found_ttl``. The least recently used entry is evicted beyond
+    ``max_size``.
+    """
+
+    def __init__(self, max_size=PAYMENT_LOOKUP_CACHE_SIZE, found_ttl=PAYMENT_LOOKUP_FOUND_TTL,
+                 not_found_ttl=PAYMENT_LOOKUP_NOT_FOUND_TTL):
+        self.max_size = max_size
+        self.found_ttl = found_ttl
+        self.not_found_ttl = not_found_ttl
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._stats = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+        }
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key, value):
+        ttl = self.not_found_ttl if value is _NOT_FOUND else self.found_ttl
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    async def resolve(self, key, loader):
+        """Return the cached payment for ``key`` or load it once with ``loader()``.
+
+        ``loader`` returns the payment dict or None when it does not exist yet.
+        """
+        cached = self._get(key)
+        if cached is not None:
+            if cached is _NOT_FOUND:
+                self._stats["negative_hits"] += 1
+                return None
+            self._stats["hits"] += 1
+            return cached
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self._stats["coalesced"] += 1
+            return await asyncio.shield(in_flight)
+
+        self._stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            payment = await loader()
+            self._put(key, _NOT_FOUND if payment is None else payment)
+            future.set_result(payment)
+            return payment
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure with no waiters is not logged as unhandled
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+    async def resolve_many(self, keys, loader):
+        """``resolve`` for many keys, loading every key not cached with one ``loader(keys)`` call.
+
+        ``loader`` returns ``{key: payment}`` for the keys it found; the rest
+        are cached as not found. Keys already being loaded by another call
+        are waited on instead of loaded again. Returns ``{key: payment or None}``.
+        """
+        results = {}
+        waiting = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            cached = self._get(key)
+            if cached is not None:
+                self._stats["negative_hits" if cached is _NOT_FOUND else "hits"] += 1
+                results[key] = None if cached is _NOT_FOUND else cached
+            elif key in self._in_flight:
+                self._stats["coalesced"] += 1
+                waiting[key] = self._in_flight[key]
+            else:
+                missing.append(key)
+
+        if missing:
+            self._stats["misses"] += len(missing)
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in missing}
+            self._in_flight.update(futures)
+            try:
+                found = await loader(missing)
+                for key, future in futures.items():
+                    payment = found.get(key)
+                    self._put(key, _NOT_FOUND if payment is None else payment)
+                    future.set_result(payment)
+                    results[key] = payment
+            except asyncio.CancelledError:
+                for future in futures.values():
+                    future.cancel()
+                raise
+            except Exception as e:
+                for future in futures.values():
+                    future.set_exception(e)
+                    future.exception()
+                raise
+            finally:
+                for key in futures:
+                    del self._in_flight[key]
+
+        for key, future in waiting.items():
+            results[key] = await asyncio.shield(future)
+        return results
+
+    def stats(self):
+        return {
+            **self._stats,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "in_flight": len(self._in_flight),
+        }
+
+
+payment_lookup = PaymentLookupCache()
+
+
+def get_payment_lookup() -> PaymentLookupCache:
+    return payment_lookup
@@ -0,0 +1,123 @@
+from functools import lru_cache
+from typing import Optional, Union
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+
+class Identification(BaseModel):
+    type: Optional[str] = None
+    number: Optional[str] = None
+
+
+class Payer(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    email: Optional[str] = None
+    first_name: str = ""
+    last_name: str = ""
+    identification: Optional[Identification] = None
+
+
+class PaymentRequest(BaseModel):
+    """Fields every payment route needs. Unknown fields are kept and sent on to Mercado Pago."""
+
+    model_config = ConfigDict(extra="allow")
+
+    # Ignored: the charge is always the purchase's server-quoted total_amount
+    transaction_amount: Optional[float] = None
+    external_reference: str = Field(..., min_length=1)
+    payer: Payer
+    payment_method_id: str
+    # Sent by the front-end; the vendor is taken from the purchase, never forwarded
+    vendedor_code: Optional[str] = None
+
+    def to_mercadopago(self, transaction_amount):
+        """Body for Mercado Pago, charging ``transaction_amount`` (reais)."""
+        body = self.model_dump(exclude={"vendedor_code"}, exclude_none=True)
+        body["transaction_amount"] = transaction_amount
+        return body
+
+
+class CardPaymentRequest(PaymentRequest):
+    token: str
+    statement_descriptor: str
+    installments: int = 1
+    issuer_id: Optional[Union[int, str]] = None
+
+
+class PixPaymentRequest(PaymentRequest):
+    notification_url: str
+    date_of_expiration: Optional[str] = None
+
+
+class TransactionData(BaseModel):
+    qr_code: Optional[str] = None
+    qr_code_base64: Optional[str] = None
+    ticket_url: Optional[str] = None
+
+
+class PointOfInteraction(BaseModel):
+    transaction_data: Optional[TransactionData] = None
+
+
+class MercadoPagoPayment(BaseModel):
+    """The parts of a Mercado Pago payment response the backend reads."""
+
+    model_config = ConfigDict(extra="allow")
+
+    id: int
+    status: str
+    status_detail: Optional[str] = None
+    external_reference: Optional[str] = None
+    transaction_amount: Optional[float] = None
+    point_of_interaction: Optional[PointOfInteraction] = None
+
+    @property
+    def qr_code_base64(self):
+        poi = self.point_of_interaction
+        return poi.transaction_data.qr_code_base64 if poi and poi.transaction_data else None
+
+
+class PaymentCreated(BaseModel):
+    payment_id: int
+    status: str
+
+
+class PixPaymentCreated(PaymentCreated):
+    qr_code_base64: Optional[str] = None
+
+
+def json_body(model):
+    """Dependency parsing the raw request body straight into ``model``.
+
+    ``model_validate_json`` parses and validates in one pass in pydantic-core,
+    where a ``model`` parameter would go through ``json.loads`` first.
+    Invalid bodies are a 400 with pydantic's error list, as the routes
+    answered for missing fields before.
+    """
+    async def parse(request: Request):
+        try:
+            return model.model_validate_json(await request.body())
+        except ValidationError as e:
+            raise HTTPException(status_code=400, detail=e.errors(include_url=False, include_context=False, include_input=False))
+    return parse
+
+
+@lru_cache(maxsize=None)
+def body_schema(model):
+    """``openapi_extra`` documenting a body parsed by ``json_body``."""
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    # Inline the nested models: "#/$defs/..." means nothing inside the OpenAPI document
+    def inline(node):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return inline(defs[node["$ref"].rsplit("/", 1)[-1]])
+            return {key: inline(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [inline(item) for item in node]
+        return node
+
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": inline(schema)}}}}
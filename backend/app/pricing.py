@@ -0,0 +1,220 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from types import MappingProxyType
+
+from config import (
+    CONVITE_CAMAROTE_PRICE,
+    CONVITE_CASAL_PRICE,
+    CONVITE_UNITARIO_PRICE,
+    DEFAULT_EVENT_ID,
+    ESTACIONAMENTO_PRICE,
+    MESA_PRICE,
+    PRICING_FILE,
+    PRICING_REFRESH_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Camarote already includes its exclusive table, so mesa adds nothing to it
+MESA_INCLUDED = {"camarote"}
+
+
+class UnknownProduct(Exception):
+    pass
+
+
+def naive_utc(value):
+    """``until`` as the naive UTC datetime ``utcnow`` is compared with.
+
+    Accepts an ISO string or a datetime; one with an offset ("...-03:00",
+    "...Z") is converted to UTC, one without is taken as UTC already.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class PriceTier:
+    """One lote: its prices (in cents) and the rule that ends it.
+
+    A tier stays active until ``until`` (a UTC datetime) passes or
+    ``until_sold`` purchases have been approved, whichever comes first.
+    The full price matrix is built once, here, into a read-only mapping
+    keyed by ``(conviteType, mesa, estacionamento, vendor)``.
+    """
+
+    def __init__(self, name, convite, mesa, estacionamento, vendor_discount_percent=0,
+                 until=None, until_sold=None):
+        self.name = name
+        self.until = until
+        self.until_sold = until_sold
+        matrix = {}
+        for convite_type, with_mesa, with_parking, with_vendor in itertools.product(
+                convite, (False, True), (False, True), (False, True)):
+            cents = convite[convite_type]
+            if with_mesa and convite_type not in MESA_INCLUDED:
+                cents += mesa
+            if with_parking:
+                cents += estacionamento
+            if with_vendor and vendor_discount_percent:
+                # Integer rounding half up, done once at build time
+                cents -= (cents * vendor_discount_percent + 50) // 100
+            matrix[(convite_type, with_mesa, with_parking, with_vendor)] = cents
+        self.prices = MappingProxyType(matrix)
+
+    @classmethod
+    def from_dict(cls, data):
+        until = data.get("until")
+        return cls(
+            name=data["name"],
+            convite={k: int(v) for k, v in data["convite"].items()},
+            mesa=int(data.get("mesa", MESA_PRICE)),
+            estacionamento=int(data.get("estacionamento", ESTACIONAMENTO_PRICE)),
+            vendor_discount_percent=int(data.get("vendor_discount_percent", 0)),
+            until=naive_utc(until) if until else None,
+            until_sold=data.get("until_sold"),
+        )
+
+    def is_active(self, now, sold):
+        if self.until is not None and now >= self.until:
+            return False
+        if self.until_sold is not None and sold >= self.until_sold:
+            return False
+        return True
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "until": self.until.isoformat() if self.until else None,
+            "until_sold": self.until_sold,
+        }
+
+
+def default_tiers():
+    """A single tier from the price constants in config.py."""
+    return [PriceTier(
+        name="padrao",
+        convite={
+            "unitario": CONVITE_UNITARIO_PRICE,
+            "casal": CONVITE_CASAL_PRICE,
+            "camarote": CONVITE_CAMAROTE_PRICE,
+        },
+        mesa=MESA_PRICE,
+        estacionamento=ESTACIONAMENTO_PRICE,
+    )]
+
+
+class PriceBook:
+    """Holds the tiers and the currently active one, for one evento.
+
+    ``quote`` is a single dict lookup on the active tier's matrix. Which tier
+    is active, and the tier list itself (from ``PRICING_FILE``, reloaded when
+    the file changes), are refreshed by a background task, so price changes
+    between lotes need no restart. Events with their own prices get a book
+    without a file, filled by ``set_tiers`` (see events.EventRegistry).
+    """
+
+    def __init__(self, path=PRICING_FILE, refresh_seconds=PRICING_REFRESH_SECONDS, event_id=DEFAULT_EVENT_ID):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.event_id = event_id
+        self.db = None
+        self.tiers = default_tiers()
+        self.active = self.tiers[0]
+        self.sold = 0
+        self._mtime = None
+        self._task = None
+        self.load()
+
+    def load(self):
+        """(Re)load the tiers from the pricing file if it changed. Returns True on reload."""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._mtime:
+            return False
+        with open(self.path) as f:
+            tiers = [PriceTier.from_dict(tier) for tier in json.load(f)["tiers"]]
+        if not tiers:
+            raise ValueError(f"{self.path} defines no price tiers")
+        self.tiers = tiers
+        self._mtime = mtime
+        self._select()
+        logger.info("Loaded %s price tiers from %s", len(tiers), self.path)
+        return True
+
+    def set_tiers(self, tiers):
+        if not tiers:
+            raise ValueError(f"Event {self.event_id} defines no price tiers")
+        self.tiers = tiers
+        self._select()
+
+    def _select(self):
+        now = datetime.utcnow()
+        # The last tier applies once every earlier one has ended
+        active = next((t for t in self.tiers if t.is_active(now, self.sold)), self.tiers[-1])
+        if active is not self.active:
+            logger.info("Price tier is now %s", active.name)
+        self.active = active
+
+    async def refresh(self):
+        try:
+            self.load()
+        except (OSError, ValueError, KeyError) as e:
+            logger.error("Keeping current prices, could not load %s: %s", self.path, e)
+        if self.db is not None and any(t.until_sold is not None for t in self.tiers):
+            self.sold = await self.db.purchases.count_documents(
+                {"event_id": self.event_id, "status": "approved"}
+            )
+        self._select()
+
+    def start(self, db):
+        self.db = db
+        self._task = asyncio.create_task(self._refresh_loop(), name="price-book-refresh")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error refreshing prices: %s", e)
+            await asyncio.sleep(self.refresh_seconds)
+
+    def quote(self, convite_type, mesa=False, estacionamento=False, vendor=False):
+        """Total in cents for one purchase under the active tier."""
+        tier = self.active
+        try:
+            return tier.prices[(convite_type, bool(mesa), bool(estacionamento), bool(vendor))], tier.name
+        except KeyError:
+            raise UnknownProduct(convite_type)
+
+    def table(self):
+        tier = self.active
+        return {
+            **tier.to_dict(),
+            "prices": [
+                {"conviteType": c, "mesa": m, "estacionamento": e, "vendor": v, "total_amount": cents}
+                for (c, m, e, v), cents in tier.prices.items()
+            ],
+        }
+
+
+price_book = PriceBook()
+
+
+def get_price_book() -> PriceBook:
+    return price_book
@@ -0,0 +1,202 @@
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from config import (
+    PURCHASE_PENDING_SECONDS,
+    RECONCILE_BATCH_SIZE,
+    RECONCILE_CONCURRENCY,
+    RECONCILE_MIN_AGE_SECONDS,
+    RECONCILE_PAGE_SIZE,
+    RECONCILE_WINDOW_MINUTES,
+)
+from payment_lookup import preferred_payment, search_created_between
+from webhook_queue import apply_payments
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINTS = "reconcile_checkpoints"
+CHECKPOINT_ID = "payments"
+
+# Purchase statuses a webhook may still change
+OPEN_STATUSES = ["pending", "in_process", "authorized"]
+
+
+class Reconciler:
+    """Catches up purchases whose Mercado Pago webhook never arrived.
+
+    Open purchases are read in ``external_reference`` order, ``batch_size``
+    at a time. For each batch the span of dates in which their payments can
+    have been created is covered by date-range searches, one per window of
+    ``window_minutes`` (``concurrency`` windows at a time, each paginated),
+    so one call resolves every purchase of that window instead of one
+    search per purchase. Windows are aligned, and reused by the next batch.
+    Purchases whose payment status differs are updated through the webhook
+    path (``apply_payments``: bulk writes, tables, stock, tickets, vendors).
+
+    After each batch the last ``external_reference`` is stored in
+    ``reconcile_checkpoints``; an interrupted run resumes from there and a
+    finished run removes it. With ``dry_run`` nothing is written and the
+    changes are returned in the report instead.
+    """
+
+    def __init__(self, db, gateway, batch_size=RECONCILE_BATCH_SIZE, concurrency=RECONCILE_CONCURRENCY,
+                 page_size=RECONCILE_PAGE_SIZE, window_minutes=RECONCILE_WINDOW_MINUTES,
+                 min_age_seconds=RECONCILE_MIN_AGE_SECONDS, dry_run=False):
+        self.db = db
+        self.gateway = gateway
+        self.batch_size = batch_size
+        self.page_size = page_size
+        self.window = timedelta(minutes=window_minutes)
+        self.min_age = timedelta(seconds=min_age_seconds)
+        self.dry_run = dry_run
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._windows = {}
+        self.changes = []
+        self.counters = {"batches": 0, "scanned": 0, "matched": 0, "changed": 0,
+                         "windows": 0, "search_errors": 0, "payments_seen": 0}
+
+    async def _search_window(self, start):
+        """Every payment created in [start, start + window)."""
+        async with self._semaphore:
+            return await search_created_between(self.gateway, start, start + self.window, self.page_size)
+
+    async def _payments_for(self, spans):
+        """Payments created in any of the (begin, end) spans, searched by aligned window.
+
+        Only windows that hold at least one span are searched, and only
+        those not already fetched for an earlier batch.
+        """
+        starts = set()
+        for begin, end in spans:
+            start = datetime.min + ((begin - datetime.min) // self.window) * self.window
+            while start <= end:
+                starts.add(start)
+                start += self.window
+        starts = sorted(starts)
+        # Batches move forward in time: windows before this one are done with
+        self._windows = {s: p for s, p in self._windows.items() if s >= starts[0]}
+        missing = [s for s in starts if s not in self._windows]
+        self.counters["windows"] += len(missing)
+        fetched = await asyncio.gather(*(self._search_window(s) for s in missing), return_exceptions=True)
+        failed = False
+        for start, payments in zip(missing, fetched):
+            if isinstance(payments, Exception):
+                self.counters["search_errors"] += 1
+                logger.error("Reconciliation search from %s failed: %s", start, payments)
+                failed = True
+                continue
+            self.counters["payments_seen"] += len(payments)
+            self._windows[start] = payments
+        return [p for s in starts for p in self._windows.get(s, [])], failed
+
+    async def reconcile_batch(self, purchases, now):
+        """Compare one batch of purchases with Mercado Pago and apply what changed."""
+        # A purchase's payment is created between the purchase and its expiration
+        spans = [
+            (p["created_at"],
+             min(now, p.get("expires_at") or p["created_at"] + timedelta(seconds=PURCHASE_PENDING_SECONDS)))
+            for p in purchases
+        ]
+        payments, failed = await self._payments_for(spans)
+
+        by_reference = {p["external_reference"]: p for p in purchases}
+        found = {}
+        for payment in payments:
+            reference = payment.get("external_reference")
+            if reference in by_reference:
+                found[reference] = preferred_payment(payment, found[reference]) if reference in found else payment
+
+        changed = []
+        for reference, payment in found.items():
+            purchase = by_reference[reference]
+            if payment["status"] != purchase.get("status") or payment["id"] != purchase.get("payment_id"):
+                changed.append(payment)
+                if self.dry_run:
+                    self.changes.append({"external_reference": reference, "payment_id": payment["id"],
+                                         "from": purchase.get("status"), "to": payment["status"]})
+        if changed and not self.dry_run:
+            await apply_payments(self.db, changed, "reconcile", now)
+
+        self.counters["batches"] += 1
+        self.counters["scanned"] += len(purchases)
+        self.counters["matched"] += len(found)
+        self.counters["changed"] += len(changed)
+        return not failed
+
+    async def run(self, restart=False, limit=None):
+        """Reconcile every open purchase (or ``limit`` of them). Returns the report."""
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        checkpoint = None if restart else await self.db[CHECKPOINTS].find_one({"_id": CHECKPOINT_ID})
+        after = checkpoint["after"] if checkpoint else ""
+        if after:
+            logger.info("Resuming reconciliation after %s", after)
+
+        complete = True
+        while limit is None or self.counters["scanned"] < limit:
+            size = self.batch_size if limit is None else min(self.batch_size, limit - self.counters["scanned"])
+            purchases = await self.db.purchases.find(
+                {"status": {"$in": OPEN_STATUSES}, "external_reference": {"$gt": after},
+                 "created_at": {"$lte": now - self.min_age}},
+                {"external_reference": 1, "status": 1, "payment_id": 1, "created_at": 1, "expires_at": 1},
+            ).sort("external_reference", 1).limit(size).to_list(length=size)
+            if not purchases:
+                break
+            if not await self.reconcile_batch(purchases, now):
+                # A window could not be searched: leave the checkpoint before this batch
+                complete = False
+                break
+            after = purchases[-1]["external_reference"]
+            if not self.dry_run:
+                await self.db[CHECKPOINTS].update_one(
+                    {"_id": CHECKPOINT_ID}, {"$set": {"after": after, "updated_at": datetime.utcnow()}}, upsert=True
+                )
+            await asyncio.sleep(0)
+        else:
+            complete = False  # stopped at the limit
+
+        if complete and not self.dry_run:
+            await self.db[CHECKPOINTS].delete_one({"_id": CHECKPOINT_ID})
+
+        elapsed = time.perf_counter() - started
+        return {
+            **self.counters,
+            "dry_run": self.dry_run,
+            "complete": complete,
+            "elapsed_s": round(elapsed, 3),
+            "purchases_per_s": round(self.counters["scanned"] / elapsed, 1) if elapsed else None,
+            "changes": self.changes,
+        }
+
+
+async def _main(args):
+    import database
+    from payment_gateway import get_gateway
+
+    await database.connect_to_mongo()
+    gateway = get_gateway()
+    try:
+        reconciler = Reconciler(database.get_database(), gateway, batch_size=args.batch_size,
+                                concurrency=args.concurrency, window_minutes=args.window_minutes,
+                                dry_run=args.dry_run)
+        report = await reconciler.run(restart=args.restart, limit=args.limit)
+        for change in report.pop("changes"):
+            print(f"{change['external_reference']}  {change['from']} -> {change['to']}  (payment {change['payment_id']})")
+        print(" ".join(f"{key}={value}" for key, value in report.items()))
+    finally:
+        await gateway.close()
+        database.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile open purchases with Mercado Pago")
+    parser.add_argument("--dry-run", action="store_true", help="report the changes without writing them")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the beginning")
+    parser.add_argument("--limit", type=int, help="stop after this many purchases")
+    parser.add_argument("--batch-size", type=int, default=RECONCILE_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=RECONCILE_CONCURRENCY)
+    parser.add_argument("--window-minutes", type=int, default=RECONCILE_WINDOW_MINUTES)
+    asyncio.run(_main(parser.parse_args()))
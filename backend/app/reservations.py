@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+
+from config import DEFAULT_EVENT_ID, TABLE_HOLD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+AVAILABLE = "available"
+HELD = "held"
+RESERVED = "reserved"
+
+
+class TableNotFound(Exception):
+    pass
+
+
+class TableUnavailable(Exception):
+    pass
+
+
+def _claimable(now):
+    """Filter for a table that can be taken: free, or held with an expired hold."""
+    return {"$or": [
+        {"status": AVAILABLE},
+        {"status": HELD, "hold_expires_at": {"$lte": now}},
+    ]}
+
+
+class ReservationEngine:
+    """Table reservations built on one conditional ``find_one_and_update``.
+
+    The table document is the source of truth: a reservation succeeds only if
+    the update that flips the table out of ``available`` matches, so two
+    buyers can never both win. New reservations are ``held`` until the
+    payment is approved (``confirm``) or rejected (``release``); a hold
+    expires with its purchase (``hold_until``), or after ``hold_seconds``
+    when there is none, and is then claimable again immediately and swept
+    back to ``available`` in the background.
+    """
+
+    def __init__(self, hold_seconds=TABLE_HOLD_SECONDS, sweep_interval=30.0, on_change=None):
+        self.hold_seconds = hold_seconds
+        self.sweep_interval = sweep_interval
+        self.on_change = on_change
+        self.db = None
+        self._sweeper = None
+        self.expired = 0
+
+    def start(self, db):
+        self.db = db
+        self._sweeper = asyncio.create_task(self._sweep_loop(), name="reservation-sweeper")
+
+    async def stop(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    def _notify(self, table_id, fields):
+        if self.on_change:
+            self.on_change(table_id, fields)
+
+    async def reserve(self, table_id, purchase_id, hold_seconds=None, event_id=DEFAULT_EVENT_ID, until=None):
+        """Hold one of the event's tables for a purchase, until ``until`` when given.
+
+        Raises TableNotFound / TableUnavailable.
+        """
+        try:
+            table_obj_id = ObjectId(table_id)
+        except (InvalidId, TypeError):
+            raise TableNotFound(table_id)
+
+        now = datetime.utcnow()
+        hold = {
+            "status": HELD,
+            "purchase_id": purchase_id,
+            "held_at": now,
+            "hold_expires_at": until or now + timedelta(seconds=hold_seconds or self.hold_seconds),
+        }
+        table = await self.db.tables.find_one_and_update(
+            {"_id": table_obj_id, "event_id": event_id, **_claimable(now)},
+            {"$set": hold},
+            projection={"_id": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if table is None:
+            # Only the losing path pays for the extra lookup
+            if await self.db.tables.count_documents({"_id": table_obj_id, "event_id": event_id}, limit=1) == 0:
+                raise TableNotFound(table_id)
+            raise TableUnavailable(table_id)
+
+        await self.db.reservations.insert_one({
+            "event_id": event_id,
+            "table_id": table_id,
+            "purchase_id": purchase_id,
+            "status": HELD,
+            "created_at": now,
+            "expires_at": hold["hold_expires_at"],
+        })
+        self._notify(table_id, hold)
+        return hold
+
+    async def reserve_many(self, table_ids, purchase_id, hold_seconds=None, event_id=DEFAULT_EVENT_ID, until=None):
+        """Hold every table or none: tables already taken by this call are released on failure."""
+        held = []
+        try:
+            for table_id in table_ids:
+                await self.reserve(table_id, purchase_id, hold_seconds, event_id, until)
+                held.append(table_id)
+        except (TableNotFound, TableUnavailable):
+            await self._release_tables(held, purchase_id)
+            raise
+        return held
+
+    async def _release_tables(self, table_ids, purchase_id):
+        if not table_ids:
+            return
+        await self.db.tables.update_many(
+            {"_id": {"$in": [ObjectId(t) for t in table_ids]}, "purchase_id": purchase_id, "status": HELD},
+            {"$set": {"status": AVAILABLE}, "$unset": {"purchase_id": "", "held_at": "", "hold_expires_at": ""}},
+        )
+        await self.db.reservations.update_many(
+            {"table_id": {"$in": list(table_ids)}, "purchase_id": purchase_id, "status": HELD},
+            {"$set": {"status": "released", "updated_at": datetime.utcnow()}},
+        )
+        for table_id in table_ids:
+            self._notify(table_id, {"status": AVAILABLE})
+
+    async def hold_until(self, purchase_ids, until):
+        """Keep the holds of purchases at least until ``until``; never shortens one.
+
+        Called with the purchase's ``expires_at`` when its payment is
+        created, and again while a card payment is ``in_process``, so a hold
+        lasts as long as the purchase can still be paid but always expires.
+        Returns how many tables were extended.
+        """
+        purchase_ids = list(purchase_ids)
+        if not purchase_ids:
+            return 0
+        result = await self.db.tables.update_many(
+            {"purchase_id": {"$in": purchase_ids}, "status": HELD}, {"$max": {"hold_expires_at": until}}
+        )
+        await self.db.reservations.update_many(
+            {"purchase_id": {"$in": purchase_ids}, "status": HELD}, {"$max": {"expires_at": until}}
+        )
+        return result.modified_count
+
+    async def confirm(self, purchase_ids):
+        """Turn the holds of paid purchases into permanent reservations.
+
+        Returns the holds that were lost before the payment settled, as
+        ``{purchase_id: [table_id, ...]}``: tables the purchase reserved
+        whose hold expired, or was taken by another buyer, in the meantime.
+        Their reservations are marked ``lost``; the purchase was paid for a
+        table it does not have, so it has to be reseated or refunded.
+        """
+        purchase_ids = list(purchase_ids)
+        if not purchase_ids:
+            return {}
+        wanted = await self.db.reservations.find(
+            {"purchase_id": {"$in": purchase_ids}, "status": {"$in": [HELD, "expired"]}},
+            {"table_id": 1, "purchase_id": 1},
+        ).to_list(length=None)
+        if not wanted:
+            return {}
+        tables = await self.db.tables.find(
+            {"purchase_id": {"$in": purchase_ids}, "status": {"$in": [HELD, RESERVED]}},
+            {"_id": 1, "purchase_id": 1, "status": 1},
+        ).to_list(length=None)
+        now = datetime.utcnow()
+        held = [t for t in tables if t["status"] == HELD]
+        if held:
+            # A hold can expire and be re-taken while the payment settles; the
+            # purchase_id condition keeps us from confirming someone else's hold.
+            await self.db.tables.update_many(
+                {"_id": {"$in": [t["_id"] for t in held]}, "purchase_id": {"$in": purchase_ids}, "status": HELD},
+                {"$set": {"status": RESERVED, "reserved_at": now}, "$unset": {"hold_expires_at": ""}},
+            )
+            await self.db.reservations.update_many(
+                {"purchase_id": {"$in": purchase_ids}, "status": HELD,
+                 "table_id": {"$in": [str(t["_id"]) for t in held]}},
+                {"$set": {"status": RESERVED, "updated_at": now}},
+            )
+            for table in held:
+                self._notify(str(table["_id"]), {"status": RESERVED})
+
+        kept = {(t["purchase_id"], str(t["_id"])) for t in tables}
+        missing = [r for r in wanted if (r["purchase_id"], r["table_id"]) not in kept]
+        lost = {}
+        for reservation in missing:
+            lost.setdefault(reservation["purchase_id"], []).append(reservation["table_id"])
+        if missing:
+            await self.db.reservations.update_many(
+                {"_id": {"$in": [r["_id"] for r in missing]}}, {"$set": {"status": "lost", "updated_at": now}}
+            )
+            for purchase_id, table_ids in lost.items():
+                logger.error("Purchase %s paid but lost its hold on tables %s: reseat or refund it",
+                             purchase_id, ", ".join(table_ids))
+        return lost
+
+    async def release(self, purchase_ids):
+        """Free the tables held by purchases whose payment was rejected or cancelled."""
+        purchase_ids = list(purchase_ids)
+        if not purchase_ids:
+            return 0
+        tables = await self.db.tables.find(
+            {"purchase_id": {"$in": purchase_ids}, "status": HELD}, {"_id": 1, "purchase_id": 1}
+        ).to_list(length=None)
+        by_purchase = {}
+        for table in tables:
+            by_purchase.setdefault(table["purchase_id"], []).append(str(table["_id"]))
+        for purchase_id, table_ids in by_purchase.items():
+            await self._release_tables(table_ids, purchase_id)
+        return len(tables)
+
+    async def expire_holds(self):
+        """Return expired holds to ``available``. Returns how many were freed."""
+        now = datetime.utcnow()
+        expired = await self.db.tables.find(
+            {"status": HELD, "hold_expires_at": {"$lte": now}}, {"_id": 1}
+        ).to_list(length=None)
+        if not expired:
+            return 0
+        ids = [t["_id"] for t in expired]
+        result = await self.db.tables.update_many(
+            {"_id": {"$in": ids}, "status": HELD, "hold_expires_at": {"$lte": now}},
+            {"$set": {"status": AVAILABLE}, "$unset": {"purchase_id": "", "held_at": "", "hold_expires_at": ""}},
+        )
+        await self.db.reservations.update_many(
+            {"status": HELD, "expires_at": {"$lte": now}},
+            {"$set": {"status": "expired", "updated_at": now}},
+        )
+        for table_id in ids:
+            self._notify(str(table_id), {"status": AVAILABLE})
+        self.expired += result.modified_count
+        return result.modified_count
+
+    async def _sweep_loop(self):
+        while True:
+            # Jitter keeps several workers from sweeping in lockstep
+            await asyncio.sleep(self.sweep_interval * random.uniform(0.8, 1.2))
+            try:
+                freed = await self.expire_holds()
+                if freed:
+                    logger.info("Released %s expired table holds", freed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error expiring table holds: %s", e)
+
+
+reservation_engine = ReservationEngine()
+
+
+def get_reservation_engine() -> ReservationEngine:
+    return reservation_engine
@@ -0,0 +1,83 @@
+from fastapi import APIRouter, Depends
+
+import payment_events
+from admission import get_idempotency_store, get_payment_rate_limiter
+from auth import require_admin
+from checkin import get_checkin_index
+from database import get_database
+from events import get_event_registry
+from expiry import get_expiry_sweeper
+from indexes import check_query_plans, index_report
+from payment_gateway import get_gateway
+from payment_lookup import get_payment_lookup
+from status_stream import get_status_broker
+from table_cache import get_table_cache
+from vendors import get_vendor_registry
+from webhook_queue import get_webhook_queue
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+# Admin Endpoints
+@router.get("/api/admin/gateway-stats")
+async def gateway_stats(gateway=Depends(get_gateway)):
+    """Mercado Pago call counters, latency totals and in-flight requests"""
+    return gateway.metrics()
+
+@router.get("/api/admin/webhook-queue")
+async def webhook_queue_stats(queue=Depends(get_webhook_queue)):
+    """Webhook queue depth, lag and duplicate/processed counters"""
+    return await queue.metrics()
+
+@router.get("/api/admin/table-cache")
+async def table_cache_stats(cache=Depends(get_table_cache)):
+    """Table inventory cache hit/miss counters"""
+    return cache.stats()
+
+@router.get("/api/admin/status-streams")
+async def status_stream_stats(broker=Depends(get_status_broker)):
+    """Open status streams per worker"""
+    return broker.stats()
+
+@router.get("/api/admin/payment-lookup-cache")
+async def payment_lookup_stats(lookup=Depends(get_payment_lookup)):
+    """Hit/miss, coalescing and eviction counters of the status-compra payment lookup cache"""
+    return lookup.stats()
+
+@router.get("/api/admin/indexes")
+async def indexes_status(db=Depends(get_database)):
+    """Missing/extra indexes per collection and hot queries still doing collection scans"""
+    return {
+        "indexes": await index_report(db),
+        "collection_scans": await check_query_plans(db),
+    }
+
+@router.get("/api/admin/checkin")
+async def checkin_stats(index=Depends(get_checkin_index)):
+    """Check-in index size and scan counters"""
+    return index.stats()
+
+@router.get("/api/admin/admission")
+async def admission_stats(limiter=Depends(get_payment_rate_limiter), store=Depends(get_idempotency_store),
+                          gateway=Depends(get_gateway)):
+    """Payment admission control: rate-limited calls, replayed payments and gateway saturation"""
+    return {**limiter.stats(), **store.stats(), "gateway_saturated": gateway.saturated}
+
+@router.get("/api/admin/expiry")
+async def expiry_stats(sweeper=Depends(get_expiry_sweeper)):
+    """Abandoned-purchase sweeper: leadership and how much it has expired and released"""
+    return sweeper.stats()
+
+@router.get("/api/admin/payment-events/{external_reference}")
+async def payment_history(external_reference: str, payload: bool = False, db=Depends(get_database)):
+    """Payment history of one purchase, newest first; raw responses only with ?payload=true"""
+    return {"events": await payment_events.history(db, external_reference, payload=payload)}
+
+@router.get("/api/admin/vendors")
+async def vendor_registry_stats(registry=Depends(get_vendor_registry)):
+    """Vendor registry: codes loaded, rejected codes and counter flushes/replays"""
+    return registry.stats()
+
+@router.get("/api/admin/events")
+async def event_registry_stats(registry=Depends(get_event_registry)):
+    """Events loaded in memory: status and active price tier of each"""
+    return registry.stats()
@@ -0,0 +1,47 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from auth import require_admin
+from checkin import InvalidTicket, TicketAlreadyUsed, check_purchase_token, get_checkin_index, purchase_codes
+from database import get_database
+from events import current_event
+from models import CheckInRequest, CheckInSync
+
+router = APIRouter()
+
+# Ingressos e check-in na portaria
+@router.get("/ingressos/{external_reference}")
+async def ingressos(external_reference: str, db=Depends(get_database), event=Depends(current_event),
+                    ticket_token: Optional[str] = Header(None, alias="X-Ticket-Token")):
+    """Signed ticket codes of an approved purchase, for the QR codes; only for the buyer's ticket_token"""
+    if not check_purchase_token(external_reference, ticket_token):
+        raise HTTPException(status_code=403, detail="Invalid ticket token")
+    tickets = await purchase_codes(db, external_reference, event.id)
+    if not tickets:
+        raise HTTPException(status_code=404, detail="No tickets for this purchase")
+    return {"tickets": tickets}
+
+@router.post("/checkin", dependencies=[Depends(require_admin)])
+async def checkin(scan: CheckInRequest, index=Depends(get_checkin_index), event=Depends(current_event)):
+    """Admit one scanned ticket of the event; each code is accepted exactly once"""
+    try:
+        return {"result": "admitted", **await index.check_in(scan.code, scan.device_id, event_id=event.id)}
+    except InvalidTicket:
+        raise HTTPException(status_code=404, detail="Invalid ticket")
+    except TicketAlreadyUsed:
+        raise HTTPException(status_code=409, detail="Ticket already used")
+
+@router.get("/checkin/sync", dependencies=[Depends(require_admin)])
+async def checkin_changes(since: Optional[datetime] = None, index=Depends(get_checkin_index),
+                          event=Depends(current_event)):
+    """Ticket statuses of the event changed since the scanner's last sync (all tickets without since)"""
+    synced_at = datetime.utcnow()
+    return {"synced_at": synced_at, "tickets": await index.changes_since(since, event.id)}
+
+@router.post("/checkin/sync", dependencies=[Depends(require_admin)])
+async def checkin_upload(sync: CheckInSync, index=Depends(get_checkin_index), event=Depends(current_event)):
+    """Scans queued by a scanner while offline, applied in order with a result per scan"""
+    results = await index.check_in_batch([scan.model_dump() for scan in sync.scans], sync.device_id, event.id)
+    return {"results": results}
@@ -0,0 +1,33 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+import exports
+from auth import require_admin
+from config import EXPORT_BATCH_SIZE
+from database import get_database
+from events import ARCHIVED, current_event
+
+router = APIRouter()
+
+# Exports for event day and accounting, streamed from the cursor
+@router.get("/admin/exports/{name}", dependencies=[Depends(require_admin)])
+async def export(name: str, format: str = "csv", status: Optional[str] = None, start: Optional[datetime] = None,
+                 end: Optional[datetime] = None, vendedor_code: Optional[str] = None,
+                 batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=10000), gzip: bool = False,
+                 db=Depends(get_database), event=Depends(current_event)):
+    """purchases, reservations or vendor_sales of the event as CSV/NDJSON, filtered by status, created_at range and vendor"""
+    try:
+        query = exports.export_query(name, status, start, end, vendedor_code, event.id)
+        body = exports.stream(db, name, format, query, batch_size, gzip, archived=event.status == ARCHIVED)
+    except exports.UnknownExport:
+        raise HTTPException(status_code=404, detail=f"Unknown export: {name}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media_type = "application/gzip" if gzip else ("text/csv" if format == "csv" else "application/x-ndjson")
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="{exports.filename(name, format, gzip, event.id)}"',
+    })
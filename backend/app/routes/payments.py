@@ -0,0 +1,163 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+
+from admission import PaymentInProgress, get_idempotency_store, get_payment_rate_limiter
+from database import get_database
+from expiry import pix_expiration
+from payment_gateway import get_gateway
+from payment_models import (CardPaymentRequest, PixPaymentRequest, MercadoPagoPayment, PaymentCreated,
+                            PixPaymentCreated, json_body, body_schema)
+from reservations import get_reservation_engine
+from webhook_queue import apply_payments
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Payment creation: admission control shared by the three payment routes
+async def admit_payment(request, external_reference, limiter, gateway):
+    """Rate limits per IP and per purchase, then shed load when Mercado Pago is saturated"""
+    retry_after = await limiter.check(request.client.host if request.client else "unknown", external_reference)
+    if retry_after:
+        raise HTTPException(status_code=429, detail="Too many payment attempts",
+                            headers={"Retry-After": str(retry_after)})
+    if gateway.saturated:
+        raise HTTPException(status_code=503, detail="Payment service busy, try again shortly",
+                            headers={"Retry-After": str(gateway.retry_after())})
+
+async def create_payment_once(payment, payment_method, idempotency_key, db, gateway, store, build_response,
+                              expires_at=None):
+    """Charge a pending purchase its quoted total unless this idempotency key already did; returns the route's response"""
+    external_reference = payment.external_reference
+    # Without a client key, one live payment per purchase and method (double clicks, retries)
+    key = idempotency_key or f"{external_reference}:{payment_method}"
+    try:
+        cached = await store.begin(key, external_reference)
+    except PaymentInProgress:
+        raise HTTPException(status_code=409, detail="Payment already in progress", headers={"Retry-After": "2"})
+    if cached is not None:
+        logger.info("Returning existing payment %s for %s", cached["payment_id"], external_reference)
+        return ORJSONResponse(cached)
+
+    try:
+        purchase = await db.purchases.find_one({"external_reference": external_reference},
+                                               {"status": 1, "total_amount": 1})
+        if purchase is None:
+            raise HTTPException(status_code=404, detail="Purchase not found")
+        if purchase.get("status") != "pending" or not purchase.get("total_amount"):
+            raise HTTPException(status_code=409, detail=f"Purchase is not awaiting payment ({purchase.get('status')})")
+
+        # The amount charged is the one iniciar-compra quoted, never the client's. Mercado Pago
+        # gets the same key, so a retry after a timeout returns the first charge instead of a second
+        payment_result = await gateway.create_payment(payment.to_mercadopago(purchase["total_amount"] / 100),
+                                                      idempotency_key=key)
+        logger.debug("%s payment creation response: %s", payment_method, payment_result)
+
+        if payment_result["status"] != 201:
+            logger.error("Error creating %s payment: %s", payment_method, payment_result)
+            raise HTTPException(status_code=500, detail=f"Error creating {payment_method} payment")
+
+        payment_response = payment_result["response"]
+        created = MercadoPagoPayment.model_validate(payment_response)
+        update = {"$set": {"payment_method": payment_method}}
+        if expires_at is not None:
+            update["$set"]["expires_at"] = expires_at
+        else:
+            update["$unset"] = {"expires_at": ""}  # card payments settle through the webhook
+        await db.purchases.update_one({"external_reference": external_reference, "status": "pending"}, update)
+        # Tables stay held as long as the purchase can still be paid; a card's hold stays bounded
+        engine = get_reservation_engine()
+        await engine.hold_until([external_reference],
+                                expires_at or datetime.utcnow() + timedelta(seconds=engine.hold_seconds))
+        # Same guarded path as the webhook: a card approved or rejected on the spot gets its
+        # tickets, or gives its tables and stock back, without waiting for the notification
+        await apply_payments(db, [payment_response], "create")
+        logger.info("%s payment created successfully. ID: %s", payment_method, created.id)
+
+        response = build_response(created).model_dump()
+        await store.complete(key, response)
+        return ORJSONResponse(response)
+    except BaseException:
+        await store.abandon(key)
+        raise
+
+def card_payment_created(payment):
+    return PaymentCreated(payment_id=payment.id, status=payment.status)
+
+@router.post("/api/criar-pagamento-cartao-credito", response_model=PaymentCreated, response_class=ORJSONResponse,
+          openapi_extra=body_schema(CardPaymentRequest))
+async def criar_pagamento_cartao_credito(request: Request,
+                                         payment: CardPaymentRequest = Depends(json_body(CardPaymentRequest)),
+                                         db=Depends(get_database), gateway=Depends(get_gateway),
+                                         limiter=Depends(get_payment_rate_limiter),
+                                         store=Depends(get_idempotency_store),
+                                         idempotency_key: Optional[str] = Header(None, alias="X-Idempotency-Key")):
+    try:
+        logger.debug("Initiating credit card payment for %s %s", payment.payer.first_name, payment.payer.last_name)
+
+        await admit_payment(request, payment.external_reference, limiter, gateway)
+        return await create_payment_once(
+            payment, "credit_card", idempotency_key, db, gateway, store, card_payment_created,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error in criar_pagamento_cartao_credito: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/api/criar-pagamento-cartao-debito", response_model=PaymentCreated, response_class=ORJSONResponse,
+          openapi_extra=body_schema(CardPaymentRequest))
+async def criar_pagamento_cartao_debito(request: Request,
+                                        payment: CardPaymentRequest = Depends(json_body(CardPaymentRequest)),
+                                        db=Depends(get_database), gateway=Depends(get_gateway),
+                                        limiter=Depends(get_payment_rate_limiter),
+                                        store=Depends(get_idempotency_store),
+                                        idempotency_key: Optional[str] = Header(None, alias="X-Idempotency-Key")):
+    try:
+        logger.debug("Initiating debit card payment for %s %s", payment.payer.first_name, payment.payer.last_name)
+
+        # Set payment method as debit card
+        payment.payment_method_id = 'debit_card'
+
+        await admit_payment(request, payment.external_reference, limiter, gateway)
+        return await create_payment_once(
+            payment, "debit_card", idempotency_key, db, gateway, store, card_payment_created,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error in criar_pagamento_cartao_debito: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/api/criar-pagamento-pix", response_model=PixPaymentCreated, response_class=ORJSONResponse,
+          openapi_extra=body_schema(PixPaymentRequest))
+async def criar_pagamento_pix(request: Request,
+                              payment: PixPaymentRequest = Depends(json_body(PixPaymentRequest)),
+                              db=Depends(get_database), gateway=Depends(get_gateway),
+                              limiter=Depends(get_payment_rate_limiter),
+                              store=Depends(get_idempotency_store),
+                              idempotency_key: Optional[str] = Header(None, alias="X-Idempotency-Key")):
+    try:
+        logger.debug("Initiating PIX payment for %s %s", payment.payer.first_name, payment.payer.last_name)
+
+        payment.payment_method_id = 'pix'
+        # The charge and the purchase expire together
+        date_of_expiration, expires_at = pix_expiration(datetime.utcnow())
+        if payment.date_of_expiration is None:
+            payment.date_of_expiration = date_of_expiration
+
+        await admit_payment(request, payment.external_reference, limiter, gateway)
+        return await create_payment_once(
+            payment, "pix", idempotency_key, db, gateway, store,
+            lambda created: PixPaymentCreated(payment_id=created.id, status=created.status,
+                                              qr_code_base64=created.qr_code_base64),
+            expires_at=expires_at,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error in criar_pagamento_pix: %s", e)
+        raise HTTPException(status_code=500, detail="Internal server error")
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from health import get_health
+from observability import render_metrics
+
+router = APIRouter()
+
+# Probes: never hit Mongo, see health.py
+@router.get("/healthz")
+async def liveness(health=Depends(get_health)):
+    """Liveness: the worker's event loop is answering"""
+    return health.liveness()
+
+@router.get("/readyz")
+async def readiness(health=Depends(get_health)):
+    """Readiness: startup finished, not draining and Mongo answered a recent ping"""
+    ready, body = health.readiness()
+    if not ready:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Latency histograms (HTTP routes, Mercado Pago, MongoDB) for Prometheus"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
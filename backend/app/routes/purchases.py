@@ -0,0 +1,274 @@
+import logging
+import re
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+import payment_events
+from checkin import purchase_token
+from config import (PURCHASE_PENDING_SECONDS, RECONCILE_PAGE_SIZE, STATUS_BATCH_SEARCH_CONCURRENCY,
+                    STATUS_BATCH_SEARCH_PAGES)
+from database import get_database
+from events import current_event
+from expiry import pending_expires_at
+from inventory import SoldOut, get_inventory, purchase_skus
+from models import InitiatePurchaseRequest, StatusBatchRequest
+from payment_gateway import PaymentGatewayError, get_gateway
+from payment_lookup import get_payment_lookup, preferred_payment, search_created_between, search_references
+from pricing import UnknownProduct
+from status_stream import get_status_broker
+from vendors import get_vendor_registry
+from webhook_queue import apply_payments
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Purchase and Payment Endpoints
+@router.post("/iniciar-compra")
+async def iniciar_compra(purchase: InitiatePurchaseRequest, db=Depends(get_database), event=Depends(current_event),
+                         stock=Depends(get_inventory), vendors=Depends(get_vendor_registry)):
+    try:
+        if not event.on_sale:
+            raise HTTPException(status_code=409, detail=f"Event {event.id} is not on sale")
+        if purchase.vendedor_code and vendors.get(purchase.vendedor_code) is None:
+            raise HTTPException(status_code=400, detail=f"Unknown vendedor_code: {purchase.vendedor_code}")
+
+        try:
+            total_amount, price_tier = event.prices.quote(
+                purchase.conviteType, purchase.mesa, purchase.estacionamento, bool(purchase.vendedor_code)
+            )
+        except UnknownProduct:
+            raise HTTPException(status_code=400, detail=f"Unknown conviteType: {purchase.conviteType}")
+
+        try:
+            allocations = await stock.reserve(
+                purchase_skus(purchase.conviteType, purchase.mesa, purchase.estacionamento), event.id
+            )
+        except SoldOut as e:
+            raise HTTPException(status_code=409, detail=f"Esgotado: {e}")
+
+        # Generate a new ObjectId for the purchase
+        new_id = ObjectId()
+        now = datetime.utcnow()
+        
+        purchase_doc = purchase.dict(exclude={"amount"})
+        purchase_doc.update({
+            "_id": new_id,
+            "event_id": event.id,
+            "total_amount": total_amount,  # In cents
+            "price_tier": price_tier,
+            "inventory": allocations,
+            "status": "pending",
+            "telefone": re.sub(r'\D', '', purchase.telefone),
+            "external_reference": str(new_id),  # Use the ObjectId as the external_reference
+            "created_at": now,
+            "expires_at": pending_expires_at(now),  # abandoned carts are expired by the sweeper
+        })
+
+        # Add vendor information if available
+        if purchase.vendedor_code:
+            purchase_doc["vendedor_code"] = purchase.vendedor_code
+
+        try:
+            result = await db.purchases.insert_one(purchase_doc)
+        except Exception:
+            await stock.give_back(allocations)
+            raise
+        purchase_id = str(result.inserted_id)
+
+        logger.info("Purchase initiated successfully, ID: %s, External Reference: %s, Total: %s cents", purchase_id, purchase_doc['external_reference'], total_amount)
+
+        return {
+            "purchase_id": purchase_id,
+            "amount": total_amount / 100,
+            "external_reference": purchase_doc["external_reference"],
+            "ticket_token": purchase_token(purchase_doc["external_reference"]),  # required by /ingressos
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error in iniciar_compra: %s", e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/estoque")
+async def estoque(stock=Depends(get_inventory), event=Depends(current_event)):
+    """Remaining stock per product of the event, from the in-memory snapshot"""
+    return {"remaining": stock.remaining(event.id)}
+
+@router.get("/precos")
+async def precos(event=Depends(current_event)):
+    """Active price tier of the event and its full price matrix, in cents"""
+    return event.prices.table()
+
+@router.post("/status-compra/batch")
+async def status_compra_batch(batch: StatusBatchRequest, db=Depends(get_database), gateway=Depends(get_gateway),
+                              lookup=Depends(get_payment_lookup), event=Depends(current_event)):
+    """Status and payment_id of many purchases, by external_reference or purchase id, in request order"""
+    try:
+        references = list(dict.fromkeys(batch.references))
+        ids = [ObjectId(reference) for reference in references if ObjectId.is_valid(reference)]
+        purchases = await db.purchases.find(
+            {"event_id": event.id, "$or": [{"external_reference": {"$in": references}}, {"_id": {"$in": ids}}]},
+            {"external_reference": 1, "status": 1, "payment_id": 1, "created_at": 1},
+        ).to_list(length=None)
+        by_reference = {}
+        for purchase in purchases:
+            by_reference[purchase["external_reference"]] = purchase
+            by_reference.setdefault(str(purchase["_id"]), purchase)
+
+        unpaid = {p["external_reference"]: p for p in by_reference.values() if not p.get("payment_id")}
+        if unpaid:
+            # One date-range search, newest first, covers the purchases still without a payment_id
+            async def search_and_store(missing):
+                begin = min((unpaid[ref].get("created_at") for ref in missing if unpaid[ref].get("created_at")),
+                            default=datetime.utcnow() - timedelta(seconds=PURCHASE_PENDING_SECONDS))
+                wanted = set(missing)
+                payments = await search_created_between(gateway, begin, datetime.utcnow(), RECONCILE_PAGE_SIZE,
+                                                        max_pages=STATUS_BATCH_SEARCH_PAGES, newest_first=True,
+                                                        wanted=wanted)
+                rest = wanted - {payment.get("external_reference") for payment in payments}
+                if rest and len(payments) >= STATUS_BATCH_SEARCH_PAGES * RECONCILE_PAGE_SIZE:
+                    # The range had more pages than we read: look the rest up one by one
+                    payments += await search_references(gateway, sorted(rest), STATUS_BATCH_SEARCH_CONCURRENCY)
+                found = {}
+                for payment in payments:
+                    reference = payment.get("external_reference")
+                    if reference in wanted:
+                        found[reference] = preferred_payment(payment, found[reference]) if reference in found else payment
+                if found:
+                    # Same guarded path as the webhook: no downgrade, tables, stock and tickets follow
+                    await apply_payments(db, list(found.values()), "search")
+                    logger.info("Batch status search resolved %s of %s purchases", len(found), len(missing))
+                return found
+
+            try:
+                found = await lookup.resolve_many(list(unpaid), search_and_store)
+            except PaymentGatewayError as e:
+                logger.error("Batch status search failed: %s", e)
+                found = {}
+            current = {}
+            if any(found.values()):
+                # What the purchases took, which is not necessarily the payment found
+                current = {p["external_reference"]: p for p in await db.purchases.find(
+                    {"external_reference": {"$in": [ref for ref in unpaid if found.get(ref)]}},
+                    {"external_reference": 1, "status": 1, "payment_id": 1},
+                ).to_list(length=None)}
+            stored = await payment_events.latest_payment_ids(
+                db, [ref for ref in unpaid if not current.get(ref, {}).get("payment_id")]
+            )
+            for ref, purchase in unpaid.items():
+                if current.get(ref, {}).get("payment_id"):
+                    purchase["status"], purchase["payment_id"] = current[ref]["status"], current[ref]["payment_id"]
+                elif ref in stored:
+                    purchase["payment_id"] = stored[ref]
+
+        results = []
+        for reference in batch.references:
+            purchase = by_reference.get(reference)
+            results.append({
+                "reference": reference,
+                "found": purchase is not None,
+                "external_reference": purchase["external_reference"] if purchase else None,
+                "status": purchase.get("status") if purchase else None,
+                "payment_id": str(purchase["payment_id"]) if purchase and purchase.get("payment_id") else None,
+            })
+        return {"results": results}
+    except Exception as e:
+        logger.error("Error in status_compra_batch: %s", e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/status-compra/{external_reference}")
+async def status_compra(external_reference: str, db=Depends(get_database), gateway=Depends(get_gateway),
+                        lookup=Depends(get_payment_lookup), event=Depends(current_event)):
+    try:
+        logger.debug("Checking status for external_reference: %s", external_reference)
+        
+        # First, try to find the purchase by external_reference
+        purchase = await db.purchases.find_one(
+            {"external_reference": external_reference, "event_id": event.id}, {"payment_id": 1}
+        )
+        
+        # If not found, try to find by _id
+        if not purchase:
+            try:
+                purchase = await db.purchases.find_one(
+                    {"_id": ObjectId(external_reference), "event_id": event.id}, {"payment_id": 1}
+                )
+            except:
+                pass
+
+        if not purchase:
+            logger.error("Purchase not found for external_reference: %s", external_reference)
+            raise HTTPException(status_code=404, detail="Purchase not found")
+
+        # Get payment_id from purchase document
+        payment_id = purchase.get("payment_id")
+        
+        if not payment_id:
+            # If payment_id not in database, try to find it from Mercado Pago.
+            # Concurrent polls for the same purchase share one search.
+            async def search_and_store():
+                logger.info("Payment ID not found in database, searching in Mercado Pago...")
+                payment_info = await gateway.search_payments({"external_reference": external_reference})
+
+                logger.debug("Mercado Pago search response: %s", payment_info)
+
+                if payment_info["status"] != 200 or not payment_info["response"]["results"]:
+                    return None
+
+                payment = None
+                for result in payment_info["response"]["results"]:
+                    payment = preferred_payment(result, payment) if payment else result
+
+                # Same guarded path as the webhook: no downgrade, tables, stock and tickets follow
+                await apply_payments(db, [payment], "search")
+                logger.info("Updated database with payment_id: %s", payment['id'])
+                return payment
+
+            payment = await lookup.resolve(external_reference, search_and_store)
+
+            if payment:
+                payment_id = payment["id"]
+            else:
+                # Try to get payment directly if we have the ID from creation response
+                try:
+                    payment_id = await payment_events.latest_payment_id(db, external_reference)
+                    if payment_id:
+                        logger.info("Found payment_id from stored payment events: %s", payment_id)
+                except Exception as e:
+                    logger.error("Error getting payment from stored events: %s", e)
+
+                if not payment_id:
+                    logger.error("Payment ID not found in Mercado Pago or stored details")
+                    raise HTTPException(status_code=404, detail="Payment ID not found")
+
+        logger.debug("Returning payment_id: %s", payment_id)
+        return {"payment_id": str(payment_id)}
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error("Error in status_compra: %s", e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/status-compra/{external_reference}/stream")
+async def status_compra_stream(external_reference: str, request: Request, db=Depends(get_database),
+                               broker=Depends(get_status_broker), event=Depends(current_event)):
+    """Server-Sent Events stream of a purchase's status, closed once it is final"""
+    if broker.full:
+        raise HTTPException(status_code=503, detail="Too many open status streams", headers={"Retry-After": "5"})
+
+    purchase = await db.purchases.find_one(
+        {"external_reference": external_reference, "event_id": event.id}, {"status": 1, "payment_id": 1}
+    )
+    if not purchase:
+        raise HTTPException(status_code=404, detail="Purchase not found")
+
+    subscriber = broker.subscribe(external_reference, purchase.get("status"), purchase.get("payment_id"))
+    return StreamingResponse(
+        broker.events(external_reference, subscriber, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,88 @@
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+
+from database import get_database
+from events import current_event
+from models import MultiTableReservation, TableReservation
+from reservations import TableNotFound, TableUnavailable, get_reservation_engine
+from table_cache import get_table_cache
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Table Management Endpoints
+def table_response(view, if_none_match):
+    """Serve a cached table view, answering 304 when the client already has it"""
+    headers = {"ETag": view.etag, "Cache-Control": "no-cache"}
+    if if_none_match == view.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=view.body, media_type="application/json", headers=headers)
+
+@router.get("/tables")
+async def get_tables(if_none_match: Optional[str] = Header(None), cache=Depends(get_table_cache),
+                     event=Depends(current_event)):
+    """Get all tables of the event with their current status"""
+    try:
+        return table_response(await cache.view(event_id=event.id), if_none_match)
+    except Exception as e:
+        logger.error("Error fetching tables: %s", e)
+        raise HTTPException(status_code=500, detail="Error fetching tables")
+
+@router.get("/tables/available")
+async def get_available_tables(type: Optional[str] = None, if_none_match: Optional[str] = Header(None),
+                               cache=Depends(get_table_cache), event=Depends(current_event)):
+    """Get available tables of the event, optionally filtered by type"""
+    try:
+        return table_response(await cache.view(status="available", type=type or None, event_id=event.id),
+                              if_none_match)
+    except Exception as e:
+        logger.error("Error fetching available tables: %s", e)
+        raise HTTPException(status_code=500, detail="Error fetching available tables")
+
+async def purchase_hold_until(db, purchase_id, event_id):
+    """Holds expire with the purchase: its expires_at, or the default hold if it is not known yet"""
+    purchase = await db.purchases.find_one({"external_reference": purchase_id, "event_id": event_id},
+                                           {"status": 1, "expires_at": 1})
+    if purchase is None:
+        return None
+    if purchase.get("status") not in ("pending", "in_process"):
+        raise HTTPException(status_code=409, detail=f"Purchase is {purchase.get('status')}")
+    return purchase.get("expires_at")
+
+@router.post("/tables/{table_id}/reserve")
+async def reserve_table(table_id: str, reservation: TableReservation, engine=Depends(get_reservation_engine),
+                        db=Depends(get_database), event=Depends(current_event)):
+    """Hold a specific table for a purchase until its payment settles"""
+    if not event.on_sale:
+        raise HTTPException(status_code=409, detail=f"Event {event.id} is not on sale")
+    until = await purchase_hold_until(db, reservation.purchase_id, event.id)
+    try:
+        hold = await engine.reserve(table_id, reservation.purchase_id, event_id=event.id, until=until)
+        return {"message": "Table reserved successfully", "hold_expires_at": hold["hold_expires_at"]}
+    except TableNotFound:
+        raise HTTPException(status_code=404, detail="Table not found")
+    except TableUnavailable:
+        raise HTTPException(status_code=400, detail="Table is not available")
+    except Exception as e:
+        logger.error("Error reserving table: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/tables/reserve")
+async def reserve_tables(reservation: MultiTableReservation, engine=Depends(get_reservation_engine),
+                         db=Depends(get_database), event=Depends(current_event)):
+    """Hold several tables for one purchase; either all are held or none"""
+    if not event.on_sale:
+        raise HTTPException(status_code=409, detail=f"Event {event.id} is not on sale")
+    until = await purchase_hold_until(db, reservation.purchase_id, event.id)
+    try:
+        await engine.reserve_many(reservation.table_ids, reservation.purchase_id, event_id=event.id, until=until)
+        return {"message": "Tables reserved successfully", "table_ids": reservation.table_ids}
+    except TableNotFound as e:
+        raise HTTPException(status_code=404, detail=f"Table not found: {e}")
+    except TableUnavailable as e:
+        raise HTTPException(status_code=400, detail=f"Table is not available: {e}")
+    except Exception as e:
+        logger.error("Error reserving tables: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
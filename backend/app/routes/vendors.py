@@ -0,0 +1,38 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+import sales_rollups
+from database import get_database
+from events import current_event
+
+router = APIRouter()
+
+# Vendor Reports (served from sales_rollups, never aggregated at request time)
+@router.get("/vendors/leaderboard")
+async def vendors_leaderboard(limit: int = Query(10, ge=1, le=100), by: str = "amount", db=Depends(get_database),
+                              event=Depends(current_event)):
+    """Top vendors by sold amount or number of sales"""
+    if by not in ("amount", "count"):
+        raise HTTPException(status_code=400, detail="by must be 'amount' or 'count'")
+    field = "amount_cents" if by == "amount" else "count"
+    return {"leaderboard": await sales_rollups.leaderboard(db, event.id, limit, field)}
+
+@router.get("/vendors/{vendedor_code}/stats")
+async def vendor_stats(vendedor_code: str, db=Depends(get_database), event=Depends(current_event)):
+    """Totals for one vendor, broken down by conviteType, mesa and estacionamento"""
+    totals = await sales_rollups.vendor_totals(db, event.id, vendedor_code)
+    if totals is None:
+        raise HTTPException(status_code=404, detail="Vendor has no sales")
+    return totals
+
+@router.get("/reports/sales-by-hour")
+async def sales_by_hour(vendedor_code: Optional[str] = None, start: Optional[str] = None,
+                        end: Optional[str] = None, db=Depends(get_database), event=Depends(current_event)):
+    """Hourly sales buckets (YYYY-MM-DDTHH, UTC), for all vendors or one"""
+    return {"buckets": await sales_rollups.hourly(db, event.id, vendedor_code, start, end)}
+
+@router.get("/reports/breakdown")
+async def sales_breakdown(db=Depends(get_database), event=Depends(current_event)):
+    """Overall totals broken down by conviteType, mesa and estacionamento"""
+    return await sales_rollups.overall_totals(db, event.id) or {"count": 0, "amount_cents": 0}
@@ -0,0 +1,24 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from webhook_queue import get_webhook_queue
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Mercado Pago Webhook
+@router.post("/api/webhook")
+async def mercadopago_webhook(request: Request, queue=Depends(get_webhook_queue)):
+    try:
+        payload = await request.json()
+        logger.debug("Received Mercado Pago webhook: %s", payload)
+
+        # Persiste a notificação; o processamento fica com os workers da fila
+        if payload.get("type") == "payment" and payload.get("data", {}).get("id"):
+            await queue.enqueue(payload)
+
+        return {"status": "ok"}
+    except Exception as e:
+        logger.error("Error processing Mercado Pago webhook: %s", e)
+        raise HTTPException(status_code=500, detail="Internal server error")
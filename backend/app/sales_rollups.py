@@ -0,0 +1,184 @@
+import argparse
+import asyncio
+import logging
+import re
+from collections import defaultdict
+
+from pymongo import DESCENDING, UpdateOne
+
+from config import DEFAULT_EVENT_ID
+from indexes import INDEXES, ensure_indexes
+
+logger = logging.getLogger(__name__)
+
+ROLLUPS = "sales_rollups"
+
+# Rollup documents are keyed by (event_id, kind, vendor, bucket); per event:
+#   ("total", None, None)   all sales          ("total", code, None)  one vendor
+#   ("hour", None, hour)    all sales per hour ("hour", code, hour)   one vendor per hour
+# vendor/bucket None is written as "*" in the _id.
+
+
+def rollup_id(event_id, kind, vendor=None, bucket=None):
+    return f"{event_id}|{kind}:{vendor or '*'}:{bucket or '*'}"
+
+
+def hour_bucket(moment):
+    return moment.strftime("%Y-%m-%dT%H")
+
+
+def _field(value):
+    """Make a value safe to use inside a dotted field path."""
+    return re.sub(r"[.$]", "_", str(value)) or "_"
+
+
+def sale_increments(sale, purchase=None):
+    """The counters one sale adds to every rollup it belongs to."""
+    amount_cents = int(round(float(sale["amount"]) * 100))
+    inc = {"count": 1, "amount_cents": amount_cents}
+    if purchase:
+        convite = _field(purchase.get("conviteType") or "desconhecido")
+        inc[f"by_convite.{convite}.count"] = 1
+        inc[f"by_convite.{convite}.amount_cents"] = amount_cents
+        if purchase.get("mesa"):
+            inc["mesa"] = 1
+        if purchase.get("estacionamento"):
+            inc["estacionamento"] = 1
+    return inc
+
+
+def sale_keys(sale):
+    event_id = sale.get("event_id", DEFAULT_EVENT_ID)
+    vendor = sale["vendedor_code"]
+    bucket = hour_bucket(sale["created_at"])
+    return [
+        (event_id, "total", None, None),
+        (event_id, "total", vendor, None),
+        (event_id, "hour", None, bucket),
+        (event_id, "hour", vendor, bucket),
+    ]
+
+
+def _upsert(key, inc, last_sale_at=None):
+    event_id, kind, vendor, bucket = key
+    update = {
+        "$setOnInsert": {"event_id": event_id, "kind": kind, "vendor": vendor, "bucket": bucket},
+        "$inc": inc,
+    }
+    if last_sale_at is not None:
+        update["$max"] = {"last_sale_at": last_sale_at}
+    return UpdateOne({"_id": rollup_id(*key)}, update, upsert=True)
+
+
+async def apply_sale(db, sale, purchase=None):
+    """Add one sale to its four rollup documents in a single bulk write."""
+    inc = sale_increments(sale, purchase)
+    await db[ROLLUPS].bulk_write(
+        [_upsert(key, inc, sale["created_at"]) for key in sale_keys(sale)], ordered=False
+    )
+
+
+def _public(doc):
+    if doc is None:
+        return None
+    doc.pop("_id", None)
+    return doc
+
+
+async def vendor_totals(db, event_id, vendedor_code):
+    return _public(await db[ROLLUPS].find_one({"_id": rollup_id(event_id, "total", vendedor_code)}))
+
+
+async def overall_totals(db, event_id):
+    return _public(await db[ROLLUPS].find_one({"_id": rollup_id(event_id, "total")}))
+
+
+async def leaderboard(db, event_id, limit=10, by="amount_cents"):
+    cursor = db[ROLLUPS].find(
+        {"event_id": event_id, "kind": "total", "vendor": {"$ne": None}}, {"_id": 0, "by_convite": 0}
+    ).sort(by, DESCENDING).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+async def hourly(db, event_id, vendedor_code=None, start=None, end=None):
+    query = {"event_id": event_id, "kind": "hour", "vendor": vendedor_code}
+    if start or end:
+        query["bucket"] = {}
+        if start:
+            query["bucket"]["$gte"] = start
+        if end:
+            query["bucket"]["$lt"] = end
+    cursor = db[ROLLUPS].find(query, {"_id": 0, "kind": 0}).sort("bucket", 1)
+    return await cursor.to_list(length=None)
+
+
+async def rebuild(db, batch_size=1000):
+    """Recompute every rollup from vendor_sales into a fresh collection and swap it in.
+
+    Sales are streamed in ``_id`` order, ``batch_size`` at a time, with one
+    ``$in`` lookup per batch for the purchase fields the breakdown needs.
+    Sales from before events count for DEFAULT_EVENT_ID. Returns the
+    number of sales processed.
+    """
+    staging = db[f"{ROLLUPS}_rebuild"]
+    await staging.drop()
+
+    processed = 0
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        sales = await db.vendor_sales.find(query).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not sales:
+            break
+        last_id = sales[-1]["_id"]
+
+        references = list({sale["purchase_id"] for sale in sales})
+        purchases = {
+            p["external_reference"]: p
+            async for p in db.purchases.find(
+                {"external_reference": {"$in": references}},
+                {"external_reference": 1, "conviteType": 1, "mesa": 1, "estacionamento": 1},
+            )
+        }
+
+        # Fold the batch in memory so each rollup document gets one write per batch
+        totals = defaultdict(lambda: defaultdict(int))
+        last_sale = {}
+        for sale in sales:
+            inc = sale_increments(sale, purchases.get(sale["purchase_id"]))
+            for key in sale_keys(sale):
+                for field, value in inc.items():
+                    totals[key][field] += value
+                last_sale[key] = max(last_sale.get(key, sale["created_at"]), sale["created_at"])
+
+        await staging.bulk_write(
+            [_upsert(key, dict(inc), last_sale[key]) for key, inc in totals.items()], ordered=False
+        )
+        processed += len(sales)
+        logger.info("Rebuilt rollups for %s sales", processed)
+
+    if processed:
+        await staging.rename(ROLLUPS, dropTarget=True)
+    else:
+        await db[ROLLUPS].drop()
+    # The swapped-in collection only has the _id index
+    await ensure_indexes(db, {ROLLUPS: INDEXES[ROLLUPS]})
+    return processed
+
+
+async def _main(batch_size):
+    import database
+
+    await database.connect_to_mongo()
+    try:
+        processed = await rebuild(database.get_database(), batch_size)
+        print(f"Rebuilt {ROLLUPS} from {processed} vendor sales")
+    finally:
+        database.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild sales rollups from vendor_sales")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(_main(args.batch_size))
@@ -0,0 +1,100 @@
+"""Production launcher: N uvicorn worker processes sharing one port.
+
+Each worker imports ``main`` and runs its lifespan on its own, so the Mongo
+client, the Mercado Pago HTTP pool and every background task are created
+after the fork and never shared between processes. On SIGTERM each worker
+first fails its readiness probe and keeps serving for PRESTOP_SECONDS, so
+the load balancer takes it out of rotation while it still answers; then it
+stops accepting connections, waits up to DRAIN_SECONDS for open requests
+and runs the shutdown (webhook batches in hand are finished first) before
+closing its clients. SIGINT, or a second SIGTERM, skips the pre-stop wait.
+
+    python serve.py --workers 4          # WEB_CONCURRENCY, default one per CPU
+
+Behind gunicorn (``gunicorn main:app -k uvicorn.workers.UvicornWorker -w 4
+--graceful-timeout 20``) there is no pre-stop wait: give the pod a preStop
+hook that sleeps PRESTOP_SECONDS instead.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import threading
+
+import uvicorn
+
+from config import DRAIN_SECONDS, HOST, PORT, PRESTOP_SECONDS, WEB_CONCURRENCY
+from health import get_health
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server whose readiness goes down before its sockets close."""
+
+    def __init__(self, config, prestop_seconds=PRESTOP_SECONDS):
+        super().__init__(config)
+        self.prestop_seconds = prestop_seconds
+        self._prestop = None
+
+    def handle_exit(self, sig, frame):
+        if sig == signal.SIGTERM and self.prestop_seconds > 0 and self._prestop is None and not self.should_exit:
+            get_health().begin_drain()
+            # uvicorn's handler only sets flags its main loop polls, so a timer thread can call it
+            self._prestop = threading.Timer(self.prestop_seconds, super().handle_exit, (sig, frame))
+            self._prestop.daemon = True
+            self._prestop.start()
+            return
+        super().handle_exit(sig, frame)
+
+
+def run_worker(config, sockets, prestop_seconds):
+    DrainingServer(config, prestop_seconds).run(sockets=sockets)
+
+
+def serve(config, workers, prestop_seconds):
+    """Run ``workers`` processes on one bound socket, forwarding SIGTERM/SIGINT to them as SIGTERM."""
+    if workers <= 1:
+        DrainingServer(config, prestop_seconds).run()
+        return
+    sock = config.bind_socket()
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_worker, args=(config, [sock], prestop_seconds), name=f"worker-{n}")
+        for n in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def stop(sig, frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for process in processes:
+        process.join()
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY or os.cpu_count() or 1)
+    parser.add_argument("--drain-seconds", type=float, default=DRAIN_SECONDS)
+    parser.add_argument("--prestop-seconds", type=float, default=PRESTOP_SECONDS)
+    args = parser.parse_args()
+
+    config = uvicorn.Config(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        timeout_graceful_shutdown=args.drain_seconds,
+        proxy_headers=True,
+        access_log=False,  # the timing middleware already measures every request
+    )
+    serve(config, args.workers, args.prestop_seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Statuses after which a purchase no longer changes and the stream can close
+FINAL_STATUSES = {"approved", "rejected", "cancelled", "refunded", "charged_back", "expired"}
+
+
+class Subscriber:
+    """One open stream. Holds only the latest status, never a backlog."""
+
+    __slots__ = ("status", "payment_id", "event")
+
+    def __init__(self, status=None, payment_id=None):
+        self.status = status
+        self.payment_id = payment_id
+        self.event = asyncio.Event()
+
+    def push(self, status, payment_id):
+        if status == self.status and payment_id == self.payment_id:
+            return
+        self.status = status
+        self.payment_id = payment_id
+        self.event.set()
+
+
+class StatusBroker:
+    """Fans purchase status changes out to the streams subscribed to them.
+
+    Updates come from this worker's payment routes and webhook queue via
+    ``publish``, and from other workers through a change stream on
+    ``purchases`` when the server supports it.
+    """
+
+    def __init__(self, max_subscribers=10000, heartbeat_interval=15.0):
+        self.max_subscribers = max_subscribers
+        self.heartbeat_interval = heartbeat_interval
+        self.db = None
+        self._subscribers = {}
+        self._count = 0
+        self._published = 0
+        self._watch_task = None
+
+    def start(self, db):
+        self.db = db
+        self._watch_task = asyncio.create_task(self._watch(), name="status-stream-watch")
+
+    async def stop(self):
+        if self._watch_task:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+
+    @property
+    def full(self):
+        return self._count >= self.max_subscribers
+
+    def subscribe(self, external_reference, status=None, payment_id=None):
+        subscriber = Subscriber(status, payment_id)
+        self._subscribers.setdefault(external_reference, set()).add(subscriber)
+        self._count += 1
+        return subscriber
+
+    def unsubscribe(self, external_reference, subscriber):
+        subscribers = self._subscribers.get(external_reference)
+        if subscribers and subscriber in subscribers:
+            subscribers.discard(subscriber)
+            self._count -= 1
+            if not subscribers:
+                del self._subscribers[external_reference]
+
+    def publish(self, external_reference, status, payment_id=None):
+        for subscriber in self._subscribers.get(external_reference, ()):
+            subscriber.push(status, payment_id)
+        self._published += 1
+
+    async def events(self, external_reference, subscriber, is_disconnected):
+        """Yield SSE frames until the purchase reaches a final status or the client leaves."""
+        try:
+            while True:
+                # Clear before reading so a push during the yield is not lost
+                subscriber.event.clear()
+                status = subscriber.status
+                if status is not None:
+                    data = {"status": status, "payment_id": subscriber.payment_id}
+                    yield f"event: status\ndata: {json.dumps(data, default=str)}\n\n"
+                    if status in FINAL_STATUSES:
+                        return
+                while True:
+                    try:
+                        await asyncio.wait_for(subscriber.event.wait(), timeout=self.heartbeat_interval)
+                        break
+                    except asyncio.TimeoutError:
+                        if await is_disconnected():
+                            return
+                        yield ": ping\n\n"
+        finally:
+            self.unsubscribe(external_reference, subscriber)
+
+    async def _watch(self):
+        pipeline = [
+            {"$match": {
+                "operationType": "update",
+                "updateDescription.updatedFields.status": {"$exists": True},
+            }},
+            {"$project": {
+                "fullDocument.external_reference": 1,
+                "fullDocument.status": 1,
+                "fullDocument.payment_id": 1,
+            }},
+        ]
+        connected = False
+        while True:
+            try:
+                async with self.db.purchases.watch(pipeline, full_document="updateLookup") as stream:
+                    connected = True
+                    async for change in stream:
+                        purchase = change.get("fullDocument") or {}
+                        if purchase.get("external_reference") in self._subscribers:
+                            self.publish(purchase["external_reference"], purchase.get("status"),
+                                         purchase.get("payment_id"))
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                if not connected:
+                    logger.info("Purchase change stream unavailable, streaming local updates only: %s", e)
+                    return
+                logger.warning("Purchase change stream interrupted: %s", e)
+                connected = False
+                await asyncio.sleep(1)
+
+    def stats(self):
+        return {
+            "subscribers": self._count,
+            "purchases_watched": len(self._subscribers),
+            "max_subscribers": self.max_subscribers,
+            "published": self._published,
+        }
+
+
+status_broker = StatusBroker()
+
+
+def get_status_broker() -> StatusBroker:
+    return status_broker
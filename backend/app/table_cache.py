@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+from pymongo.errors import PyMongoError
+
+from config import DEFAULT_EVENT_ID
+
+logger = logging.getLogger(__name__)
+
+# Public layout of a table: holds (purchase_id, held_at, hold_expires_at) stay out of the map
+PUBLIC_FIELDS = ("number", "type", "status", "capacity", "location", "price")
+
+
+class TableView:
+    """Pre-serialized response body for one table listing, with its ETag."""
+
+    __slots__ = ("tables", "body", "etag")
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.body = json.dumps({"tables": tables}, separators=(",", ":"), default=str).encode()
+        # Content hash, so every worker hands out the same ETag for the same layout
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+
+
+class TableInventoryCache:
+    """In-memory copy of the ``tables`` collection and its filtered views.
+
+    Each event's tables are loaded on first use and views (all tables,
+    available tables per ``type``) are derived and serialized on first use. ``patch`` applies a
+    local change such as a reservation; ``invalidate`` drops everything and
+    is triggered by the change stream when other workers write to ``tables``.
+    Without a replica set (no change streams) entries expire after ``max_age``.
+    """
+
+    def __init__(self, max_age=30.0):
+        self.max_age = max_age
+        self.db = None
+        self._tables = {}  # event_id -> tables
+        self._loaded_at = {}
+        self._views = {}
+        self._lock = asyncio.Lock()
+        self._watch_task = None
+        self._change_stream = False
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def start(self, db):
+        self.db = db
+        self._watch_task = asyncio.create_task(self._watch(), name="table-cache-watch")
+
+    async def stop(self):
+        if self._watch_task:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+
+    def invalidate(self):
+        self._tables = {}
+        self._views = {}
+        self.invalidations += 1
+
+    def patch(self, table_id, fields):
+        """Apply a local update to one cached table and drop the derived views of its event."""
+        for event_id, tables in self._tables.items():
+            for table in tables:
+                if table["_id"] == table_id:
+                    table.update((key, value) for key, value in fields.items() if key in PUBLIC_FIELDS)
+                    self._views = {key: view for key, view in self._views.items() if key[0] != event_id}
+                    return
+        self.invalidate()
+
+    def _fresh(self, event_id):
+        if event_id not in self._tables:
+            return False
+        return self._change_stream or time.monotonic() - self._loaded_at[event_id] <= self.max_age
+
+    async def _load(self, event_id):
+        tables = await self.db.tables.find({"event_id": event_id}, dict.fromkeys(PUBLIC_FIELDS, 1)).to_list(length=None)
+        for table in tables:
+            table["_id"] = str(table["_id"])
+        self._tables[event_id] = tables
+        self._loaded_at[event_id] = time.monotonic()
+        self._views = {key: view for key, view in self._views.items() if key[0] != event_id}
+
+    async def view(self, status=None, type=None, event_id=DEFAULT_EVENT_ID):
+        """Return the TableView of one event for the given filters, loading it if needed."""
+        key = (event_id, status, type)
+        if self._fresh(event_id):
+            view = self._views.get(key)
+            if view is not None:
+                self.hits += 1
+                return view
+
+        async with self._lock:
+            if not self._fresh(event_id):
+                await self._load(event_id)
+            view = self._views.get(key)
+            if view is not None:
+                self.hits += 1
+                return view
+            self.misses += 1
+            tables = [
+                table for table in self._tables[event_id]
+                if (status is None or table.get("status") == status)
+                and (type is None or table.get("type") == type)
+            ]
+            view = self._views[key] = TableView(tables)
+            return view
+
+    async def _watch(self):
+        while True:
+            try:
+                async with self.db.tables.watch() as stream:
+                    self._change_stream = True
+                    self.invalidate()
+                    async for _ in stream:
+                        self.invalidate()
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                # Standalone servers do not support change streams; fall back to max_age
+                if not self._change_stream:
+                    logger.info("Table change stream unavailable, using %ss expiry: %s", self.max_age, e)
+                    return
+                logger.warning("Table change stream interrupted: %s", e)
+                self._change_stream = False
+                await asyncio.sleep(1)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "events": len(self._tables),
+            "cached_tables": sum(len(tables) for tables in self._tables.values()),
+            "views": len(self._views),
+            "change_stream": self._change_stream,
+        }
+
+
+table_cache = TableInventoryCache()
+
+
+def get_table_cache() -> TableInventoryCache:
+    return table_cache
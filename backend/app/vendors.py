@@ -0,0 +1,322 @@
+import argparse
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+import sales_rollups
+from config import DEFAULT_EVENT_ID, VENDOR_FLUSH_SECONDS, VENDOR_RELOAD_SECONDS, VENDOR_REPLAY_AFTER_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# What the registry keeps of a vendor document; the sale counters stay in Mongo
+VENDOR_FIELDS = ["code", "nome", "active", "commission_percent"]
+
+# Flush tokens remembered per vendor, so replaying a flush never counts it twice
+APPLIED_FLUSHES_KEPT = 50
+
+
+async def record_sale(db, vendedor_code, payment_info, purchase=None):
+    """Record a vendor sale once per payment and queue it for the vendor counters.
+
+    The sale is upserted by ``payment_id``, so replays of the same payment
+    (webhook retries, queue redelivery) count nothing twice. New sales are
+    stored with ``counted: False`` and added to the ``vendors`` counters by
+    the registry's next flush. ``purchase`` supplies the sale's event_id and
+    conviteType/mesa/estacionamento for the sales rollups, and is looked up
+    when not given. Returns True when the sale was new.
+    """
+    if purchase is None:
+        purchase = await db.purchases.find_one(
+            {"external_reference": payment_info["external_reference"]},
+            {"event_id": 1, "conviteType": 1, "mesa": 1, "estacionamento": 1}
+        )
+    now = datetime.utcnow()
+    sale = {
+        "event_id": (purchase or {}).get("event_id", DEFAULT_EVENT_ID),
+        "vendedor_code": vendedor_code,
+        "payment_id": payment_info["id"],
+        "purchase_id": payment_info["external_reference"],
+        "amount": payment_info["transaction_amount"],
+        "status": payment_info["status"],
+        "counted": False,
+        "created_at": now
+    }
+    result = await db.vendor_sales.update_one(
+        {"payment_id": payment_info["id"]},
+        {"$setOnInsert": sale},
+        upsert=True
+    )
+    if result.upserted_id is None:
+        return False
+
+    get_vendor_registry().add_sale(result.upserted_id)
+    await sales_rollups.apply_sale(db, sale, purchase)
+    return True
+
+
+class VendorRegistry:
+    """In-memory ``code -> vendor`` for attributing purchases.
+
+    Loaded at startup and kept in sync by the ``vendors`` change stream (a
+    periodic reload on standalone servers), so ``iniciar-compra`` checks a
+    vendedor_code with a dict lookup instead of a query.
+
+    Sale counters are not written per sale. ``record_sale`` stores the sale
+    with ``counted: False``; every ``flush_seconds`` the worker claims its
+    pending sales under a flush token, adds them to ``vendors`` with one
+    ``$inc`` per vendor and marks them counted. A vendor document remembers
+    the tokens applied to it, so a flush interrupted by a crash is replayed
+    from ``vendor_sales`` without double counting. Sales left uncounted by a
+    dead worker (or by a CLI such as reconciliation.py) are replayed by
+    whichever worker finds them ``replay_after`` seconds later.
+    """
+
+    def __init__(self, flush_seconds=VENDOR_FLUSH_SECONDS, reload_seconds=VENDOR_RELOAD_SECONDS,
+                 replay_after=VENDOR_REPLAY_AFTER_SECONDS):
+        self.flush_seconds = flush_seconds
+        self.reload_seconds = reload_seconds
+        self.replay_after = timedelta(seconds=replay_after)
+        self.db = None
+        self.vendors = {}
+        self._codes = {}  # _id -> code, for change stream deletes
+        self._pending = []
+        self._tasks = []
+        self._change_stream = False
+        self._counters = {"lookups": 0, "unknown": 0, "reloads": 0, "sales": 0, "flushes": 0,
+                          "flushed_sales": 0, "replayed_sales": 0, "flush_errors": 0, "vendor_writes": 0}
+
+    async def start(self, db):
+        self.db = db
+        await self.reload()
+        self._tasks = [
+            asyncio.create_task(self._sync(), name="vendor-registry-sync"),
+            asyncio.create_task(self._flush_loop(), name="vendor-registry-flush"),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.db is not None and self._pending:
+            try:
+                await self.flush()
+            except Exception as e:
+                # Still counted: False in vendor_sales, the next replay picks them up
+                logger.error("Could not flush %s vendor sales on shutdown: %s", len(self._pending), e)
+
+    async def reload(self):
+        vendors, codes = {}, {}
+        async for vendor in self.db.vendors.find({}, {field: 1 for field in VENDOR_FIELDS}):
+            codes[vendor["_id"]] = vendor["code"]
+            vendors[vendor["code"]] = vendor
+        self.vendors, self._codes = vendors, codes
+        self._counters["reloads"] += 1
+
+    def get(self, code):
+        """The vendor for a code, or None when it is unknown or inactive."""
+        self._counters["lookups"] += 1
+        vendor = self.vendors.get(code)
+        # Vendors created before the registry have no "active" field
+        if vendor is None or vendor.get("active") is False:
+            self._counters["unknown"] += 1
+            return None
+        return vendor
+
+    def commission_cents(self, code, amount_cents):
+        vendor = self.vendors.get(code) or {}
+        return (amount_cents * (vendor.get("commission_percent") or 0) + 50) // 100
+
+    def _apply_change(self, change):
+        if change["operationType"] == "delete":
+            code = self._codes.pop(change["documentKey"]["_id"], None)
+            self.vendors.pop(code, None)
+            return
+        vendor = change.get("fullDocument")
+        if vendor:
+            vendor = {key: vendor[key] for key in ["_id", *VENDOR_FIELDS] if key in vendor}
+            self._codes[vendor["_id"]] = vendor["code"]
+            self.vendors[vendor["code"]] = vendor
+
+    async def _sync(self):
+        # Counter flushes update vendors all the time; only metadata changes matter here
+        pipeline = [{"$match": {"$or": [
+            {"operationType": {"$ne": "update"}},
+            *({f"updateDescription.updatedFields.{field}": {"$exists": True}} for field in VENDOR_FIELDS),
+        ]}}]
+        while True:
+            try:
+                async with self.db.vendors.watch(pipeline, full_document="updateLookup") as stream:
+                    if not self._change_stream:
+                        self._change_stream = True
+                        await self.reload()  # catch up on what changed before the stream opened
+                    async for change in stream:
+                        self._apply_change(change)
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                if self._change_stream:
+                    logger.warning("Vendor change stream interrupted: %s", e)
+                    self._change_stream = False
+                    await asyncio.sleep(1)
+                    continue
+                logger.info("Vendor change stream unavailable, reloading every %ss: %s", self.reload_seconds, e)
+                await self._reload_loop()
+
+    async def _reload_loop(self):
+        while True:
+            await asyncio.sleep(self.reload_seconds)
+            try:
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error reloading vendors: %s", e)
+
+    def add_sale(self, sale_id):
+        self._pending.append(sale_id)
+        self._counters["sales"] += 1
+
+    async def _apply_flush(self, token):
+        """Add the sales claimed under ``token`` to their vendors, then mark them counted."""
+        totals = defaultdict(lambda: {"total_sales": 0, "total_amount": 0, "total_commission_cents": 0})
+        last_sale = {}
+        sales = 0
+        async for sale in self.db.vendor_sales.find(
+            {"counted": token}, {"vendedor_code": 1, "amount": 1, "created_at": 1}
+        ):
+            code = sale["vendedor_code"]
+            totals[code]["total_sales"] += 1
+            totals[code]["total_amount"] += sale["amount"]
+            totals[code]["total_commission_cents"] += self.commission_cents(code, int(round(sale["amount"] * 100)))
+            last_sale[code] = max(last_sale.get(code, sale["created_at"]), sale["created_at"])
+            sales += 1
+        if totals:
+            # No upsert: a sale of a deleted or mistyped code must not recreate it as a vendor.
+            # A vendor that already has this token matches nothing, so a replay adds nothing twice
+            result = await self.db.vendors.bulk_write([
+                UpdateOne(
+                    {"code": code, "applied_flushes": {"$ne": token}},
+                    {
+                        "$inc": inc,
+                        "$max": {"last_sale_at": last_sale[code]},
+                        "$push": {"applied_flushes": {"$each": [token], "$slice": -APPLIED_FLUSHES_KEPT}},
+                    },
+                )
+                for code, inc in totals.items()
+            ], ordered=False)
+            self._counters["vendor_writes"] += len(totals)
+            if result.matched_count < len(totals):
+                logger.info("Flush %s matched %s of %s vendors (unknown codes or already applied)",
+                            token, result.matched_count, len(totals))
+        await self.db.vendor_sales.update_many({"counted": token}, {"$set": {"counted": True}})
+        return sales
+
+    async def flush(self):
+        """Add this worker's new sales to the vendor counters. Returns how many were counted."""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        token = ObjectId()
+        try:
+            await self.db.vendor_sales.update_many(
+                {"_id": {"$in": pending}, "counted": False}, {"$set": {"counted": token}}
+            )
+            flushed = await self._apply_flush(token)
+        except Exception:
+            self._counters["flush_errors"] += 1
+            raise
+        self._counters["flushes"] += 1
+        self._counters["flushed_sales"] += flushed
+        return flushed
+
+    async def replay(self):
+        """Count the sales a crashed worker left claimed or uncounted. Returns how many."""
+        stale = datetime.utcnow() - self.replay_after
+        replayed = 0
+        # Flushes that claimed their sales but never marked them counted
+        tokens = await self.db.vendor_sales.distinct(
+            "counted", {"counted": {"$type": "objectId", "$lt": ObjectId.from_datetime(stale)}}
+        )
+        for token in tokens:
+            replayed += await self._apply_flush(token)
+        # Sales whose worker never got to flush them
+        while True:
+            ids = [sale["_id"] async for sale in self.db.vendor_sales.find(
+                {"counted": False, "created_at": {"$lt": stale}}, {"_id": 1}
+            ).limit(1000)]
+            if not ids:
+                break
+            token = ObjectId()
+            await self.db.vendor_sales.update_many(
+                {"_id": {"$in": ids}, "counted": False}, {"$set": {"counted": token}}
+            )
+            replayed += await self._apply_flush(token)
+        if replayed:
+            logger.info("Replayed %s vendor sales into the vendor counters", replayed)
+        self._counters["replayed_sales"] += replayed
+        return replayed
+
+    async def _flush_loop(self):
+        replay_every = max(1, int(self.replay_after.total_seconds() // self.flush_seconds))
+        rounds = 0
+        while True:
+            try:
+                if rounds % replay_every == 0:
+                    await self.replay()
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error flushing vendor counters: %s", e)
+            rounds += 1
+            await asyncio.sleep(self.flush_seconds)
+
+    def stats(self):
+        return {**self._counters, "vendors": len(self.vendors), "pending_sales": len(self._pending),
+                "change_stream": self._change_stream}
+
+
+vendor_registry = VendorRegistry()
+
+
+def get_vendor_registry() -> VendorRegistry:
+    return vendor_registry
+
+
+async def _main(args):
+    import database
+
+    await database.connect_to_mongo()
+    try:
+        db = database.get_database()
+        if args.add:
+            update = {"active": not args.inactive}
+            if args.nome:
+                update["nome"] = args.nome
+            if args.commission is not None:
+                update["commission_percent"] = args.commission
+            await db.vendors.update_one({"code": args.add}, {"$set": update}, upsert=True)
+        if args.replay:
+            registry = VendorRegistry(replay_after=0)
+            registry.db = db
+            print(f"Replayed {await registry.replay()} vendor sales")
+        async for vendor in db.vendors.find({}, {"_id": 0, "applied_flushes": 0}).sort("code", 1):
+            print(" ".join(f"{key}={value}" for key, value in vendor.items()))
+    finally:
+        database.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List, add or update vendors")
+    parser.add_argument("--add", metavar="CODE", help="create or update the vendor with this vendedor_code")
+    parser.add_argument("--nome")
+    parser.add_argument("--commission", type=int, help="commission in percent of each sale")
+    parser.add_argument("--inactive", action="store_true", help="stop accepting this code on new purchases")
+    parser.add_argument("--replay", action="store_true", help="count every sale not yet in the vendor counters")
+    asyncio.run(_main(parser.parse_args()))
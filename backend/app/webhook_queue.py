@@ -0,0 +1,321 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+import vendors
+import payment_events
+from admission import refresh_responses
+from status_stream import get_status_broker
+from reservations import get_reservation_engine
+from inventory import get_inventory
+from checkin import issue_tickets, revoke_tickets
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+# Payment statuses that give the purchase's held tables and stock back
+RELEASE_STATUSES = {"rejected", "cancelled", "refunded", "charged_back"}
+
+
+async def apply_payments(db, payments, source, now=None):
+    """Apply fetched Mercado Pago payments to their purchases.
+
+    Status on the purchase (guarded by ``payment_events.purchase_filter``)
+    and an entry in payment_events for each payment, in two ``bulk_write``
+    calls. What follows from the status only happens for the payments the
+    purchase actually took: tables and stock kept or released, tickets and
+    vendor sales for approved ones. Payments without an external_reference
+    are ignored.
+    """
+    now = now or datetime.utcnow()
+    purchase_updates = []
+    events = []
+    for payment_data in payments:
+        external_reference = payment_data.get("external_reference")
+        if not external_reference:
+            continue
+        purchase_updates.append(UpdateOne(
+            payment_events.purchase_filter(external_reference, payment_data),
+            {"$set": payment_events.purchase_fields(payment_data, now)},
+        ))
+        events.append(payment_events.insert(external_reference, payment_data, source, now))
+    if not purchase_updates:
+        return
+
+    await db.purchases.bulk_write(purchase_updates, ordered=False)
+    await db[payment_events.EVENTS].bulk_write(events, ordered=False)
+
+    # Re-read what each purchase ended up with: the guard may have refused a payment
+    current = {p["external_reference"]: p async for p in db.purchases.find(
+        {"external_reference": {"$in": [p["external_reference"] for p in payments if p.get("external_reference")]}},
+        {"external_reference": 1, "status": 1, "payment_id": 1},
+    )}
+    applied = []
+    approved = {}
+    released = set()
+    broker = get_status_broker()
+    for payment_data in payments:
+        external_reference = payment_data.get("external_reference")
+        purchase = current.get(external_reference)
+        if purchase is None:
+            continue
+        if purchase.get("payment_id") != payment_data["id"] or purchase.get("status") != payment_data["status"]:
+            if payment_data["status"] == "approved" and purchase.get("payment_id") != payment_data["id"]:
+                # Paid after the purchase was settled by another payment
+                logger.error("Payment %s approved but purchase %s is %s with payment %s: refund it",
+                             payment_data["id"], external_reference, purchase.get("status"), purchase.get("payment_id"))
+            continue
+        broker.publish(external_reference, payment_data["status"], payment_data["id"])
+        applied.append(payment_data)
+        if payment_data["status"] == "approved":
+            approved[external_reference] = payment_data
+        elif payment_data["status"] in RELEASE_STATUSES:
+            released.add(external_reference)
+
+    await refresh_responses(db, applied)
+
+    # Table holds follow the payment: kept when paid, freed when it fails
+    engine = get_reservation_engine()
+    lost = await engine.confirm(approved)
+    if lost:
+        # Paid for tables it no longer holds: flagged for the reconciliation / refund
+        await db.purchases.bulk_write([
+            UpdateOne({"external_reference": reference}, {"$set": {"tables_lost": table_ids}})
+            for reference, table_ids in lost.items()
+        ], ordered=False)
+    await engine.release(released)
+    # A card payment under review keeps its tables a while longer, never indefinitely
+    in_process = [p["external_reference"] for p in applied if p["status"] == "in_process"]
+    await engine.hold_until(in_process, datetime.utcnow() + timedelta(seconds=engine.hold_seconds))
+    await get_inventory().release_purchases(released)
+    # Refunded and charged back purchases lose the tickets they were issued
+    await revoke_tickets(db, released)
+
+    # Tickets for every approved purchase, vendor bookkeeping for those that came from a vendor
+    if approved:
+        purchases = await db.purchases.find(
+            {"external_reference": {"$in": list(approved)}},
+            {"external_reference": 1, "event_id": 1, "vendedor_code": 1, "conviteType": 1, "mesa": 1,
+             "estacionamento": 1, "nome": 1, "sobrenome": 1},
+        ).to_list(length=None)
+        await issue_tickets(db, purchases)
+        for purchase in purchases:
+            if purchase.get("vendedor_code"):
+                await vendors.record_sale(
+                    db, purchase["vendedor_code"], approved[purchase["external_reference"]], purchase
+                )
+
+
+class WebhookQueue:
+    """Mongo-backed queue for Mercado Pago payment notifications.
+
+    ``enqueue`` keeps at most one queued document per payment: repeated
+    notifications for a payment that is still waiting are folded into that
+    document (``notifications`` counts them). Workers claim queued documents
+    in batches, fetch each payment once from the gateway and apply all purchase
+    updates with a single ``bulk_write``. When that fails the batch is applied
+    one payment at a time, so only the notification at fault is retried; after
+    ``max_attempts`` claims it is left ``failed``.
+    """
+
+    def __init__(self, workers=4, batch_size=50, poll_interval=0.5,
+                 visibility_timeout=60, max_attempts=5):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.db = None
+        self.gateway = None
+        self._tasks = []
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._counters = {
+            "enqueued": 0,
+            "duplicates_dropped": 0,
+            "processed": 0,
+            "failed": 0,
+            "batches": 0,
+        }
+
+    def start(self, db, gateway):
+        self.db = db
+        self.gateway = gateway
+        self._stopping = False
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"webhook-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info("Webhook queue started with %s workers", self.workers)
+
+    async def stop(self, drain_timeout=0):
+        """Stop the workers, first letting them finish their batch for up to ``drain_timeout`` seconds."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._tasks and drain_timeout:
+            await asyncio.wait(self._tasks, timeout=drain_timeout)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Webhook queue stopped!")
+
+    async def enqueue(self, payload):
+        """Persist a payment notification. Returns False if it was coalesced."""
+        payment_id = str(payload["data"]["id"])
+        now = datetime.utcnow()
+        try:
+            result = await self.db.webhook_queue.update_one(
+                {"payment_id": payment_id, "status": QUEUED},
+                {
+                    "$setOnInsert": {"received_at": now, "attempts": 0},
+                    "$set": {"payload": payload, "last_received_at": now},
+                    "$inc": {"notifications": 1},
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Another request inserted the queued document first
+            result = None
+
+        if result is not None and result.upserted_id is not None:
+            self._counters["enqueued"] += 1
+            self._wakeup.set()
+            return True
+        self._counters["duplicates_dropped"] += 1
+        return False
+
+    async def _claim_batch(self):
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=self.visibility_timeout)
+        # Claimed too often by workers that died on it (a notification that crashes the process)
+        given_up = await self.db.webhook_queue.update_many(
+            {"status": PROCESSING, "claimed_at": {"$lt": stale}, "attempts": {"$gte": self.max_attempts}},
+            {"$set": {"status": FAILED, "processed_at": now}},
+        )
+        self._counters["failed"] += given_up.modified_count
+        batch = []
+        while len(batch) < self.batch_size:
+            doc = await self.db.webhook_queue.find_one_and_update(
+                {"$or": [
+                    {"status": QUEUED},
+                    # Claimed by a worker that died before finishing
+                    {"status": PROCESSING, "claimed_at": {"$lt": stale}, "attempts": {"$lt": self.max_attempts}},
+                ]},
+                {"$set": {"status": PROCESSING, "claimed_at": now}, "$inc": {"attempts": 1}},
+                sort=[("received_at", 1)],
+                return_document=ReturnDocument.AFTER,  # attempts includes this claim
+            )
+            if doc is None:
+                break
+            batch.append(doc)
+        return batch
+
+    async def _fetch(self, doc):
+        try:
+            payment_info = await self.gateway.get_payment(doc["payment_id"])
+        except Exception as e:
+            logger.error("Error fetching payment %s: %s", doc['payment_id'], e)
+            return None
+        if payment_info["status"] != 200:
+            logger.error("Mercado Pago returned %s for payment %s", payment_info['status'], doc['payment_id'])
+            return None
+        return payment_info["response"]
+
+    def _retry_or_fail(self, doc, now):
+        """Queue update for a notification that could not be handled this time."""
+        retry = doc["attempts"] < self.max_attempts
+        if not retry:
+            self._counters["failed"] += 1
+        return UpdateOne({"_id": doc["_id"]}, {"$set": {"status": QUEUED if retry else FAILED, "processed_at": now}})
+
+    async def _apply(self, fetched, now):
+        """Apply ``(doc, payment)`` pairs in one go, or one by one if that fails. Returns the docs that failed."""
+        try:
+            await apply_payments(self.db, [payment for _, payment in fetched], "webhook", now)
+            return []
+        except Exception as e:
+            if len(fetched) == 1:
+                logger.error("Error applying payment %s: %s", fetched[0][1].get("id"), e)
+                return [fetched[0][0]]
+            # One bad payment must not hold back the rest of the batch
+            logger.warning("Error applying a batch of %s payments, applying them one by one: %s", len(fetched), e)
+        failed = []
+        for doc, payment in fetched:
+            try:
+                await apply_payments(self.db, [payment], "webhook", now)
+            except Exception as e:
+                logger.error("Error applying payment %s: %s", payment.get("id"), e)
+                failed.append(doc)
+        return failed
+
+    async def process_batch(self, batch):
+        payments = await asyncio.gather(*(self._fetch(doc) for doc in batch))
+        now = datetime.utcnow()
+
+        queue_updates = []
+        fetched = []
+        for doc, payment_data in zip(batch, payments):
+            if payment_data is None:
+                queue_updates.append(self._retry_or_fail(doc, now))
+            else:
+                fetched.append((doc, payment_data))
+
+        failed = {doc["_id"] for doc in await self._apply(fetched, now)} if fetched else set()
+        for doc, _ in fetched:
+            if doc["_id"] in failed:
+                queue_updates.append(self._retry_or_fail(doc, now))
+                continue
+            queue_updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"status": DONE, "processed_at": now}}))
+            self._counters["processed"] += 1
+
+        if queue_updates:
+            await self.db.webhook_queue.bulk_write(queue_updates, ordered=False)
+        self._counters["batches"] += 1
+
+    async def _worker(self, index):
+        while not self._stopping:
+            try:
+                batch = await self._claim_batch()
+                if batch:
+                    await self.process_batch(batch)
+                    continue
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Webhook worker %s error: %s", index, e)
+                await asyncio.sleep(self.poll_interval)
+
+    async def metrics(self):
+        """Queue depth, lag of the oldest queued notification and counters."""
+        depth = await self.db.webhook_queue.count_documents({"status": QUEUED})
+        oldest = await self.db.webhook_queue.find_one(
+            {"status": QUEUED}, {"received_at": 1}, sort=[("received_at", 1)]
+        )
+        lag = (datetime.utcnow() - oldest["received_at"]).total_seconds() if oldest else 0.0
+        return {
+            "depth": depth,
+            "in_progress": await self.db.webhook_queue.count_documents({"status": PROCESSING}),
+            "lag_seconds": lag,
+            "workers": len(self._tasks),
+            **self._counters,
+        }
+
+
+webhook_queue = WebhookQueue()
+
+
+def get_webhook_queue() -> WebhookQueue:
+    return webhook_queue
@@ -0,0 +1,120 @@
+"""Door check-in benchmark at a target scan rate.
+
+Issues --tickets tickets, then measures:
+  * validate: signature check + in-memory lookup, per scan, no I/O
+  * check_in: a paced run of --rate scans/minute for --seconds, each scan
+    admitted through the conditional update, with ~5% repeated codes and
+    ~1% forged ones; any ticket admitted twice fails the run.
+
+    MONGO_URL=mongodb://localhost:27017 python backend/benchmarks/bench_checkin.py --rate 10000
+    python backend/benchmarks/bench_checkin.py --mongo-url memory   # pip install mongomock-motor
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import timeit
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+os.environ.setdefault("APP_ENV", "development")  # test ticket signing key
+
+from checkin import CheckInIndex, InvalidTicket, TicketAlreadyUsed, issue_tickets, sign  # noqa: E402
+
+DATABASE = "bench_checkin"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(mongo_url, tickets, rate, seconds):
+    if mongo_url == "memory":
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(mongo_url)
+    db = client[DATABASE]
+    try:
+        await client.drop_database(DATABASE)
+        for start in range(0, tickets, 5000):
+            await issue_tickets(db, [
+                {"external_reference": f"ref{n:07d}", "conviteType": "unitario", "nome": "Convidado"}
+                for n in range(start, min(tickets, start + 5000))
+            ])
+        index = CheckInIndex()
+        index.db = db
+        await index.reload()
+        codes = [sign(f"ref{n:07d}-1") for n in range(tickets)]
+
+        sample = codes[:1000]
+        number = 100
+        seconds_per = min(timeit.repeat(lambda: [index.validate(c) for c in sample], number=number, repeat=3))
+        print(f"validate    {seconds_per / (number * len(sample)) * 1e6:.2f} us/scan ({len(index.status)} tickets indexed)")
+
+        scans = int(rate * seconds / 60)
+        interval = 60 / rate
+        random.shuffle(codes)
+        latencies = []
+        results = Counter()
+        admitted = Counter()
+
+        async def scan(code):
+            started = time.perf_counter()
+            try:
+                ticket = await index.check_in(code, device_id="bench")
+                admitted[ticket["ticket_id"]] += 1
+                results["admitted"] += 1
+            except TicketAlreadyUsed:
+                results["already_used"] += 1
+            except InvalidTicket:
+                results["invalid"] += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        pending = []
+        started = time.perf_counter()
+        for n in range(scans):
+            roll = random.random()
+            if roll < 0.01:
+                code = codes[n % len(codes)]
+                code = code[:-1] + ("1" if code[-1] == "0" else "0")  # forged signature
+            elif roll < 0.06 and n:
+                code = codes[random.randrange(n) % len(codes)]  # re-scan of an earlier ticket
+            else:
+                code = codes[n % len(codes)]
+            pending.append(asyncio.create_task(scan(code)))
+            # Open-loop pacing: scans arrive at the target rate whatever the latency
+            delay = started + (n + 1) * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await asyncio.gather(*pending)
+        elapsed = time.perf_counter() - started
+
+        double = [t for t, n in admitted.items() if n > 1]
+        print(f"check_in    {scans} scans in {elapsed:.1f}s ({scans / elapsed * 60:,.0f}/min) "
+              f"p50={percentile(latencies, 50):.2f}ms p99={percentile(latencies, 99):.2f}ms "
+              f"max={max(latencies):.2f}ms {dict(results)}")
+        print("single-use  ok" if not double else f"single-use  FAILED: {len(double)} tickets admitted twice")
+        return 1 if double else 0
+    finally:
+        await client.drop_database(DATABASE)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"),
+                        help="MongoDB URL, or 'memory' for mongomock_motor")
+    parser.add_argument("--tickets", type=int, default=20_000)
+    parser.add_argument("--rate", type=int, default=10_000, help="scans per minute")
+    parser.add_argument("--seconds", type=float, default=30)
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(run(args.mongo_url, args.tickets, args.rate, args.seconds)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Per-event query latency as finished events pile up, archived or kept hot.
+
+Seeds one event on sale, then adds finished events (same size: --purchases
+purchases, their tickets and payment events, --tables tables) in steps up to
+--archived. Two databases grow side by side:
+
+* hot:      finished events stay in the hot collections, as with one
+            unscoped set of collections;
+* archived: each finished event is moved out by archive.archive_event.
+
+After every step it times the queries the event on sale serves (table list,
+available camarotes, sold count of its price book, status-compra by
+reference, offline check-in sync) and prints the median per query, with the
+documents left in the hot collections.
+
+    python backend/benchmarks/bench_events.py --mongo-url memory --purchases 300 --archived 0,5,20
+    MONGO_URL=mongodb://localhost:27017 python backend/benchmarks/bench_events.py --archived 0,10,50,100
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import archive  # noqa: E402
+from checkin import ticket_docs  # noqa: E402
+from events import EVENT_COLLECTIONS, EVENTS, FINISHED  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+
+HOT_EVENT = "evento-ativo"
+DATABASES = {"hot": "bench_events_hot", "archived": "bench_events_archived"}
+PAYMENT_IDS = iter(range(6_000_000_000, 7_000_000_000))
+
+
+def event_docs(event_id, purchases, tables, now):
+    docs = {"purchases": [], "tickets": [], "tables": [], "payment_events": []}
+    for n in range(purchases):
+        reference = f"{event_id}-{n:06d}"
+        approved = random.random() < 0.7
+        purchase = {"event_id": event_id, "external_reference": reference, "nome": "Convidado",
+                    "conviteType": random.choice(["unitario", "casal"]), "mesa": False, "estacionamento": False,
+                    "total_amount": 2500, "status": "approved" if approved else "in_process",
+                    "payment_id": next(PAYMENT_IDS), "created_at": now - timedelta(minutes=n)}
+        docs["purchases"].append(purchase)
+        if approved:
+            docs["tickets"] += ticket_docs(purchase, now - timedelta(minutes=n))
+            docs["payment_events"].append({"external_reference": reference, "status": "approved",
+                                           "source": "webhook", "received_at": now})
+    docs["tables"] = [{"event_id": event_id, "number": str(i), "type": "camarote" if i % 5 == 0 else "regular",
+                       "status": "available" if i % 3 else "reserved", "capacity": 4} for i in range(tables)]
+    return docs
+
+
+async def add_event(db, event_id, args, status, now):
+    for collection, docs in event_docs(event_id, args.purchases, args.tables, now).items():
+        if docs:
+            await db[collection].insert_many(docs, ordered=False)
+    await db[EVENTS].update_one({"_id": event_id}, {"$set": {"status": status}}, upsert=True)
+
+
+def hot_queries(db, now):
+    since = now - timedelta(minutes=30)
+    return {
+        "tables": lambda: db.tables.find({"event_id": HOT_EVENT}).to_list(length=None),
+        "camarotes": lambda: db.tables.find(
+            {"event_id": HOT_EVENT, "status": "available", "type": "camarote"}).to_list(length=None),
+        "sold": lambda: db.purchases.count_documents({"event_id": HOT_EVENT, "status": "approved"}),
+        "status": lambda: db.purchases.find_one(
+            {"external_reference": f"{HOT_EVENT}-{random.randrange(10):06d}", "event_id": HOT_EVENT},
+            {"payment_id": 1}),
+        "checkin-sync": lambda: db.tickets.find(
+            {"event_id": HOT_EVENT, "updated_at": {"$gt": since}}, {"status": 1}).to_list(length=None),
+    }
+
+
+async def median_us(query, samples):
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        await query()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1e6
+
+
+async def hot_documents(db):
+    counts = await asyncio.gather(*(db[c].count_documents({}) for c in [*EVENT_COLLECTIONS, "payment_events"]))
+    return sum(counts)
+
+
+async def run(args):
+    if args.mongo_url == "memory":
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+    steps = sorted({int(step) for step in args.archived.split(",")})
+    now = datetime.utcnow()
+    dbs = {mode: client[name] for mode, name in DATABASES.items()}
+    try:
+        for mode, db in dbs.items():
+            await client.drop_database(DATABASES[mode])
+            await ensure_indexes(db)
+            await add_event(db, HOT_EVENT, args, "active", now)
+
+        names = list(hot_queries(dbs["hot"], now))
+        print(f"{'mode':<10}{'finished':>9}{'hot docs':>10}" + "".join(f"{name + ' µs':>17}" for name in names))
+        finished = 0
+        for step in steps:
+            while finished < step:
+                event_id = f"evento-{finished:04d}"
+                for mode, db in dbs.items():
+                    await add_event(db, event_id, args, FINISHED, now)
+                    if mode == "archived":
+                        await archive.archive_event(db, event_id, args.batch_size)
+                finished += 1
+            for mode, db in dbs.items():
+                timings = [await median_us(query, args.samples) for query in hot_queries(db, now).values()]
+                print(f"{mode:<10}{finished:>9}{await hot_documents(db):>10,}"
+                      + "".join(f"{us:>17,.0f}" for us in timings))
+    finally:
+        for name in DATABASES.values():
+            await client.drop_database(name)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"),
+                        help="MongoDB URL, or 'memory' for mongomock_motor")
+    parser.add_argument("--purchases", type=int, default=2_000, help="purchases per event")
+    parser.add_argument("--tables", type=int, default=200, help="tables per event")
+    parser.add_argument("--archived", default="0,10,50", help="numbers of finished events to measure at")
+    parser.add_argument("--samples", type=int, default=200, help="runs of each query per measurement")
+    parser.add_argument("--batch-size", type=int, default=1000, help="archive batch size")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Backlog benchmark for the abandoned-purchase sweeper.
+
+Seeds N stale pending purchases, runs one full sweep and, at the same
+time, a loop of single-purchase reads standing in for request traffic.
+Reports purchases expired per second and the reads' latency during the
+sweep, so long locks or a starved event loop show up as p99 spikes.
+
+    MONGO_URL=mongodb://localhost:27017 python backend/benchmarks/bench_expiry.py --purchases 300000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from bson import ObjectId  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+from expiry import ExpirySweeper  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+from inventory import get_inventory  # noqa: E402
+from reservations import get_reservation_engine  # noqa: E402
+
+DATABASE = "bench_expiry"
+
+
+async def seed(db, purchases):
+    expired_at = datetime.utcnow() - timedelta(minutes=1)
+    for start in range(0, purchases, 5000):
+        batch = []
+        for _ in range(min(5000, purchases - start)):
+            oid = ObjectId()
+            batch.append({"_id": oid, "external_reference": str(oid), "status": "pending",
+                          "created_at": expired_at, "expires_at": expired_at})
+        await db.purchases.insert_many(batch, ordered=False)
+
+
+async def reader(db, done, latencies):
+    while not done.is_set():
+        started = time.perf_counter()
+        await db.purchases.find_one({"external_reference": "probe"}, {"status": 1})
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.005)
+
+
+async def run(mongo_url, purchases, batch_size):
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[DATABASE]
+    try:
+        await client.drop_database(DATABASE)
+        await ensure_indexes(db)
+        await seed(db, purchases)
+        await db.purchases.insert_one({"external_reference": "probe", "status": "approved"})
+        get_inventory().db = db
+        get_reservation_engine().db = db
+
+        sweeper = ExpirySweeper(batch_size=batch_size)
+        sweeper.db = db
+        await sweeper.acquire_lease()
+
+        done = asyncio.Event()
+        latencies = []
+        probe = asyncio.create_task(reader(db, done, latencies))
+        started = time.perf_counter()
+        expired = await sweeper.sweep()
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe
+
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"expired={expired} in {elapsed:.1f}s ({expired / elapsed:,.0f}/s) batches={sweeper.stats()['batches']}")
+        print(f"reads during sweep: n={len(latencies)} p50={p50:.2f}ms p99={p99:.2f}ms max={latencies[-1]:.2f}ms")
+    finally:
+        await client.drop_database(DATABASE)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--purchases", type=int, default=300_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.mongo_url, args.purchases, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Peak RSS and throughput of the streaming exports on a large collection.
+
+Seeds --rows synthetic purchases (one minute apart in created_at) into
+--database, then runs the exports.py CLI in a child process for the first
+0, 10% and 100% of them and reports rows/s, output size and the child's
+peak RSS from wait4. Streaming keeps the peak flat as the row count grows;
+--materialized adds the same export done with cursor.to_list() for
+comparison.
+
+    MONGO_URL=mongodb://localhost:27017 python backend/benchmarks/bench_export.py --rows 1000000 --gzip
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+os.environ.setdefault("MERCADO_PAGO_ACCESS_TOKEN", "TEST-bench")
+
+from bson import ObjectId  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+START = datetime(2026, 1, 1)
+
+MATERIALIZED = """
+import asyncio, csv, sys
+from datetime import datetime
+import database, exports
+async def main():
+    await database.connect_to_mongo()
+    spec = exports.EXPORTS["purchases"]
+    query = {"created_at": {"$lt": datetime.fromisoformat(sys.argv[1])}}
+    docs = await database.get_database().purchases.find(query, {"_id": 0}).to_list(None)
+    writer = csv.writer(open("/dev/null", "w"))
+    writer.writerow(spec["columns"])
+    writer.writerows([exports._cell(doc.get(c)) for c in spec["columns"]] for doc in docs)
+asyncio.run(main())
+"""
+
+
+async def seed(mongo_url, database, rows, batch_size=10_000):
+    client = AsyncIOMotorClient(mongo_url)
+    purchases = client[database].purchases
+    await purchases.drop()
+    for offset in range(0, rows, batch_size):
+        docs = []
+        for i in range(offset, min(rows, offset + batch_size)):
+            oid = ObjectId()
+            docs.append({
+                "_id": oid, "external_reference": str(oid), "nome": f"Convidado{i}", "sobrenome": "Bench",
+                "telefone": "11999990000", "conviteType": "casal" if i % 4 == 0 else "unitario",
+                "mesa": i % 5 == 0, "estacionamento": i % 7 == 0, "total_amount": 2500 + (i % 3) * 500,
+                "price_tier": "lote1", "status": "approved" if i % 10 else "expired", "status_detail": "accredited",
+                "payment_method": "pix", "payment_id": 10_000_000 + i, "vendedor_code": f"V{i % 50}",
+                "created_at": START + timedelta(minutes=i), "updated_at": START + timedelta(minutes=i, seconds=30),
+            })
+        await purchases.insert_many(docs, ordered=False)
+    client.close()
+
+
+def run_child(argv, env):
+    """Run a child process, returning (seconds, peak RSS in MB)."""
+    started = time.perf_counter()
+    process = subprocess.Popen(argv, cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise RuntimeError(f"{argv} exited with {process.returncode}")
+    peak_kb = usage.ru_maxrss  # kilobytes on Linux
+    return time.perf_counter() - started, peak_kb / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--database", default="bench_export")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--materialized", action="store_true", help="also time cursor.to_list() + csv")
+    parser.add_argument("--no-seed", action="store_true", help="reuse the purchases already in --database")
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        started = time.perf_counter()
+        asyncio.run(seed(args.mongo_url, args.database, args.rows))
+        print(f"seeded {args.rows:,} purchases in {time.perf_counter() - started:.1f}s")
+
+    env = {**os.environ, "MONGO_URL": args.mongo_url, "DATABASE_NAME": args.database, "LOG_LEVEL": "WARNING"}
+    output = f"/tmp/bench_export.{args.format}" + (".gz" if args.gzip else "")
+    print(f"{'mode':<13}{'rows':>11}{'seconds':>9}{'rows/s':>11}{'MB out':>9}{'peak RSS MB':>13}")
+    for rows in (0, args.rows // 10, args.rows):
+        end = (START + timedelta(minutes=rows)).isoformat()
+        argv = [sys.executable, "exports.py", "purchases", "--format", args.format, "--end", end,
+                "--batch-size", str(args.batch_size), "-o", output] + (["--gzip"] if args.gzip else [])
+        seconds, peak = run_child(argv, env)
+        size = os.path.getsize(output) / 1e6
+        print(f"{'streaming':<13}{rows:>11,}{seconds:>9.2f}{rows / seconds:>11,.0f}{size:>9.1f}{peak:>13.1f}")
+        if args.materialized:
+            seconds, peak = run_child([sys.executable, "-c", MATERIALIZED, end], env)
+            print(f"{'materialized':<13}{rows:>11,}{seconds:>9.2f}{rows / seconds:>11,.0f}{'':>9}{peak:>13.1f}")
+    os.remove(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""End-to-end benchmark of the ticket purchase funnel.
+
+Each virtual buyer runs iniciar-compra -> criar-pagamento-pix ->
+status-compra -> webhook against the app in-process, with Mercado Pago
+replaced by fake_mercadopago (also in-process). Mongo is the one at
+--mongo-url, or an in-memory mongomock_motor database with --mongo-url memory
+(pip install mongomock-motor).
+
+Per-endpoint throughput and latency percentiles are printed, and written as
+JSON with --output so runs from different commits can be diffed:
+
+    python backend/benchmarks/bench_funnel.py --buyers 2000 -c 200 --output funnel.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "app"))
+sys.path.insert(0, BENCH_DIR)
+os.environ.setdefault("APP_ENV", "development")  # test ticket signing key
+os.environ.setdefault("MERCADO_PAGO_ACCESS_TOKEN", "TEST-bench")
+# Every virtual buyer shares one client address; keep the per-IP limit out of the way
+os.environ.setdefault("RATE_LIMIT_IP_PER_MINUTE", "10000000")
+os.environ.setdefault("RATE_LIMIT_IP_BURST", "100000")
+
+import httpx  # noqa: E402
+
+ENDPOINTS = ["iniciar-compra", "criar-pagamento-pix", "status-compra", "webhook"]
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure(mongo_url, database_name, mp_latency_ms):
+    """Point the app at the chosen Mongo and an in-process fake Mercado Pago."""
+    os.environ["DATABASE_NAME"] = database_name
+    if mongo_url != "memory":
+        os.environ["MONGO_URL"] = mongo_url
+
+    import config
+    config.DATABASE_NAME = database_name
+
+    import database
+    database.DATABASE_NAME = database_name
+    if mongo_url == "memory":
+        from mongomock_motor import AsyncMongoMockClient
+
+        async def connect_in_memory():
+            database.db.client = AsyncMongoMockClient()
+            database.db.db = database.db.client[database_name]
+        database.connect_to_mongo = connect_in_memory
+
+    import fake_mercadopago
+    import payment_gateway
+    fake_mercadopago.LATENCY_MS = mp_latency_ms
+    payment_gateway.gateway = payment_gateway.PaymentGateway(
+        base_url="http://fake-mercadopago",
+        access_token="TEST-bench",
+        transport=httpx.ASGITransport(app=fake_mercadopago.app),
+    )
+
+    import main
+    return main.app, main
+
+
+async def run(args):
+    app, main = configure(args.mongo_url, args.database, args.mp_latency_ms)
+    await main.startup()
+
+    latencies = {name: [] for name in ENDPOINTS}
+    errors = {name: 0 for name in ENDPOINTS}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def call(client, name, method, url, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        latencies[name].append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            errors[name] += 1
+            return None
+        return response.json()
+
+    async def buyer(client, i):
+        async with semaphore:
+            purchase = await call(client, "iniciar-compra", "POST", "/api/iniciar-compra", json={
+                "nome": f"Bench{i}", "sobrenome": "Funnel", "telefone": "11 99999-0000",
+                "conviteType": "unitario", "mesa": False, "estacionamento": False, "amount": 25.0,
+            })
+            if purchase is None:
+                return
+            reference = purchase["external_reference"]
+            payment = await call(client, "criar-pagamento-pix", "POST", "/api/criar-pagamento-pix", json={
+                "payment_method_id": "pix", "transaction_amount": 25.0,
+                "payer": {"email": f"bench{i}@example.com", "first_name": f"Bench{i}", "last_name": "Funnel"},
+                "external_reference": reference, "notification_url": "http://localhost/api/webhook",
+                "description": "Convite",
+            })
+            await call(client, "status-compra", "GET", f"/api/status-compra/{reference}")
+            if payment is not None:
+                await call(client, "webhook", "POST", "/api/webhook",
+                           json={"type": "payment", "data": {"id": str(payment["payment_id"])}})
+
+    transport = httpx.ASGITransport(app=app)
+    started = time.perf_counter()
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            await asyncio.gather(*(buyer(client, i) for i in range(args.buyers)))
+        elapsed = time.perf_counter() - started
+    finally:
+        if args.mongo_url != "memory":
+            import database
+            await database.db.client.drop_database(args.database)
+        await main.shutdown()
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "buyers": args.buyers,
+            "concurrency": args.concurrency,
+            "mongo": "memory" if args.mongo_url == "memory" else "mongodb",
+            "mp_latency_ms": args.mp_latency_ms,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "funnels_per_s": round(args.buyers / elapsed, 2),
+        "endpoints": {
+            name: {
+                "requests": len(samples),
+                "errors": errors[name],
+                "rps": round(len(samples) / elapsed, 2),
+                "mean_ms": round(sum(samples) / len(samples), 3) if samples else None,
+                "p50_ms": percentile(samples, 50),
+                "p90_ms": percentile(samples, 90),
+                "p99_ms": percentile(samples, 99),
+                "max_ms": round(max(samples), 3) if samples else None,
+            }
+            for name, samples in latencies.items()
+        },
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"),
+                        help="MongoDB URL, or 'memory' for mongomock_motor")
+    parser.add_argument("--database", default="bench_funnel")
+    parser.add_argument("--buyers", type=int, default=1000)
+    parser.add_argument("-c", "--concurrency", type=int, default=100)
+    parser.add_argument("--mp-latency-ms", type=float, default=0.0,
+                        help="artificial latency of the fake Mercado Pago")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    print(f"commit={results['commit']} buyers={args.buyers} concurrency={args.concurrency} "
+          f"funnels/s={results['funnels_per_s']}")
+    print(f"{'endpoint':<22}{'req':>7}{'err':>6}{'rps':>9}{'p50':>9}{'p90':>9}{'p99':>9}")
+    for name, stats in results["endpoints"].items():
+        print(f"{name:<22}{stats['requests']:>7}{stats['errors']:>6}{stats['rps']:>9}"
+              f"{stats['p50_ms'] or 0:>9.1f}{stats['p90_ms'] or 0:>9.1f}{stats['p99_ms'] or 0:>9.1f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Load benchmark for POST /api/iniciar-compra.
+
+Fires N concurrent purchase initiations against a running server and prints
+latency percentiles. Run it against the same Mongo before and after a change
+to compare, e.g.:
+
+    cd backend/app && python main.py            # in one terminal
+    python backend/benchmarks/bench_iniciar_compra.py --url http://localhost:5000 -c 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def purchase_payload(i):
+    return {
+        "nome": f"Bench{i}",
+        "sobrenome": "Load",
+        "telefone": "11 99999-0000",
+        "conviteType": "unitario",
+        "mesa": False,
+        "estacionamento": False,
+        "amount": 25.0,
+    }
+
+
+async def run(url, concurrency, requests):
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/api/iniciar-compra", json=purchase_payload(i))
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    print(f"requests={requests} concurrency={concurrency} errors={errors}")
+    print(f"throughput={requests / elapsed:.1f} req/s")
+    print(
+        f"p50={percentile(latencies, 50):.1f}ms "
+        f"p95={percentile(latencies, 95):.1f}ms "
+        f"p99={percentile(latencies, 99):.1f}ms "
+        f"mean={statistics.mean(latencies):.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("-c", "--concurrency", type=int, default=500)
+    parser.add_argument("-n", "--requests", type=int, default=None,
+                        help="total requests (defaults to the concurrency)")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.concurrency, args.requests or args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
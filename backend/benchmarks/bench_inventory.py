@@ -0,0 +1,71 @@
+"""Contention benchmark for the sharded inventory counters.
+
+Runs B concurrent buyers against one hot SKU with 1 shard and with N
+shards, reports purchases/second and fails if any unit is oversold.
+
+    MONGO_URL=mongodb://localhost:27017 python backend/benchmarks/bench_inventory.py --buyers 500 --stock 300
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+from inventory import Inventory, SoldOut  # noqa: E402
+
+SKU = "convite:unitario"
+
+
+async def round_trip(db, buyers, stock, shards):
+    inventory = Inventory()
+    inventory.db = db
+    await inventory.set_stock(SKU, stock, shards)
+    sold = 0
+
+    async def buyer():
+        nonlocal sold
+        try:
+            await inventory.reserve([SKU])
+            sold += 1
+        except SoldOut:
+            pass
+
+    started = time.perf_counter()
+    await asyncio.gather(*(buyer() for _ in range(buyers)))
+    elapsed = time.perf_counter() - started
+
+    await inventory.refresh()
+    remaining = inventory.remaining()[SKU]
+    ok = sold == min(buyers, stock) and remaining == stock - sold and remaining >= 0
+    print(f"shards={shards:<3} sold={sold:<5} remaining={remaining:<5} "
+          f"throughput={buyers / elapsed:>8.0f} buyers/s {'ok' if ok else 'OVERSOLD'}")
+    return ok
+
+
+async def run(mongo_url, buyers, stock, shards):
+    client = AsyncIOMotorClient(mongo_url, maxPoolSize=max(100, buyers))
+    db = client["bench_inventory"]
+    try:
+        results = [await round_trip(db, buyers, stock, n) for n in sorted({1, shards})]
+    finally:
+        await client.drop_database("bench_inventory")
+        client.close()
+    return 0 if all(results) else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--buyers", type=int, default=500)
+    parser.add_argument("--stock", type=int, default=300)
+    parser.add_argument("--shards", type=int, default=16)
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(run(args.mongo_url, args.buyers, args.stock, args.shards)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Throughput benchmark for PaymentGateway against the fake Mercado Pago server.
+
+    python backend/benchmarks/fake_mercadopago.py --latency-ms 150 &
+    python backend/benchmarks/bench_payment_gateway.py --url http://localhost:8081 -n 2000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from payment_gateway import PaymentGateway  # noqa: E402
+
+
+async def run(url, requests, max_concurrency):
+    gateway = PaymentGateway(base_url=url, access_token="TEST-bench",
+                             max_concurrency=max_concurrency)
+    await gateway.start()
+
+    async def one(i):
+        await gateway.create_payment({
+            "payment_method_id": "pix",
+            "transaction_amount": 25.0,
+            "external_reference": f"bench-{i}",
+            "payer": {"email": "bench@example.com"},
+        })
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    await gateway.close()
+
+    stats = gateway.metrics()["operations"]["create"]
+    print(f"requests={requests} max_concurrency={max_concurrency}")
+    print(f"throughput={requests / elapsed:.1f} payments/s")
+    print(f"mean={stats['total_ms'] / stats['calls']:.1f}ms max={stats['max_ms']:.1f}ms "
+          f"errors={stats['errors']} timeouts={stats['timeouts']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8081")
+    parser.add_argument("-n", "--requests", type=int, default=1000)
+    parser.add_argument("--max-concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.requests, args.max_concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Parse/serialize cost of a payment request: raw dicts vs the typed models.
+
+Three ways of turning the body of POST /api/criar-pagamento-pix into the
+Mercado Pago payload and the route's response into bytes:
+
+  dict   json.loads + the old required_fields loop, response through
+         jsonable_encoder + JSONResponse (what FastAPI does for a dict)
+  model  json.loads + model_validate (a pydantic parameter in FastAPI)
+  json   model_validate_json on the raw body, response through ORJSONResponse
+
+No server or database is involved; each path is timed for --iterations
+calls and reported in microseconds per request.
+
+    python backend/benchmarks/bench_payment_models.py --iterations 200000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+
+from payment_models import MercadoPagoPayment, PixPaymentCreated, PixPaymentRequest  # noqa: E402
+
+REQUIRED_FIELDS = ["payment_method_id", "payer", "external_reference", "notification_url"]
+
+BODY = json.dumps({
+    "payment_method_id": "pix",
+    "transaction_amount": 25.0,
+    "external_reference": "6650f1c2a9d3e4b5c6d7e8f9",
+    "notification_url": "https://example.com/api/webhook",
+    "description": "Convite unitario",
+    "payer": {
+        "email": "comprador@example.com",
+        "first_name": "Maria",
+        "last_name": "Silva",
+        "identification": {"type": "CPF", "number": "12345678909"},
+    },
+    "vendedor_code": "V123",
+}).encode()
+
+MP_RESPONSE = {
+    "id": 1000000001,
+    "status": "pending",
+    "status_detail": "pending_waiting_transfer",
+    "external_reference": "6650f1c2a9d3e4b5c6d7e8f9",
+    "transaction_amount": 25.0,
+    "point_of_interaction": {
+        "transaction_data": {"qr_code": "000201" + "0" * 200, "qr_code_base64": "iVBORw0KGgo=" * 400},
+    },
+}
+
+
+def dict_path():
+    payment_data = json.loads(BODY)
+    for field in REQUIRED_FIELDS:
+        if field not in payment_data:
+            raise ValueError(field)
+    payment_data["payer"].get("first_name", "")
+    payment_data["payment_method_id"] = "pix"
+    outgoing = payment_data
+    response = {
+        "payment_id": MP_RESPONSE["id"],
+        "status": MP_RESPONSE["status"],
+        "qr_code_base64": MP_RESPONSE["point_of_interaction"]["transaction_data"]["qr_code_base64"],
+    }
+    return outgoing, JSONResponse(jsonable_encoder(response)).body
+
+
+def model_path():
+    payment = PixPaymentRequest.model_validate(json.loads(BODY))
+    outgoing = payment.to_mercadopago(25.0)
+    created = MercadoPagoPayment.model_validate(MP_RESPONSE)
+    response = PixPaymentCreated(payment_id=created.id, status=created.status, qr_code_base64=created.qr_code_base64)
+    return outgoing, JSONResponse(jsonable_encoder(response)).body
+
+
+def json_path():
+    payment = PixPaymentRequest.model_validate_json(BODY)
+    outgoing = payment.to_mercadopago(25.0)
+    created = MercadoPagoPayment.model_validate(MP_RESPONSE)
+    response = PixPaymentCreated(payment_id=created.id, status=created.status, qr_code_base64=created.qr_code_base64)
+    return outgoing, ORJSONResponse(response.model_dump()).body
+
+
+PATHS = {"dict": dict_path, "model": model_path, "json": json_path}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5, help="best of N runs")
+    args = parser.parse_args()
+
+    # Same response bytes on every path
+    bodies = {name: json.loads(path()[1]) for name, path in PATHS.items()}
+    assert bodies["dict"] == bodies["model"] == bodies["json"]
+
+    results = {}
+    for name, path in PATHS.items():
+        best = min(timeit.repeat(path, number=args.iterations, repeat=args.repeat))
+        results[name] = best / args.iterations * 1e6
+    print(f"{'path':<8}{'us/request':>12}{'vs dict':>10}")
+    for name, us in results.items():
+        print(f"{name:<8}{us:>12.2f}{results['dict'] / us:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Micro-benchmark of price resolution per request.
+
+Compares PriceBook.quote (one lookup in the precomputed matrix) with
+computing the total from the price constants on every call.
+
+    python backend/benchmarks/bench_pricing.py
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import config  # noqa: E402
+from pricing import PriceBook  # noqa: E402
+
+BASE = {
+    "unitario": config.CONVITE_UNITARIO_PRICE,
+    "casal": config.CONVITE_CASAL_PRICE,
+    "camarote": config.CONVITE_CAMAROTE_PRICE,
+}
+
+
+def computed(convite_type, mesa, estacionamento, vendor):
+    total = BASE[convite_type] / 100
+    if mesa and convite_type != "camarote":
+        total += config.MESA_PRICE / 100
+    if estacionamento:
+        total += config.ESTACIONAMENTO_PRICE / 100
+    if vendor:
+        total *= 0.9
+    return int(round(total * 100))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--number", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    book = PriceBook(path=None)
+    cases = [("unitario", False, False, False), ("casal", True, True, True), ("camarote", True, False, True)]
+
+    for label, fn in (("precomputed", book.quote), ("computed", computed)):
+        seconds = min(timeit.repeat(
+            lambda: [fn(*case) for case in cases], number=args.number // len(cases), repeat=3
+        ))
+        print(f"{label:<12} {seconds / args.number * 1e9:>8.1f} ns/quote")
+
+
+if __name__ == "__main__":
+    main()
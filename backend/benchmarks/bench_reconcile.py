@@ -0,0 +1,118 @@
+"""Offline benchmark of the payment reconciliation job.
+
+Seeds N open purchases spread over --hours, and payments for most of them
+in fake_mercadopago (in-process, so no network and no Mercado Pago
+account): --approved share approved, --rejected share rejected, the rest
+with no payment yet. Then runs a dry run, the real run and a second run
+that must find nothing left to change, printing purchases/s and how many
+Mercado Pago searches each needed.
+
+    python backend/benchmarks/bench_reconcile.py --mongo-url memory --purchases 20000
+    MONGO_URL=mongodb://localhost:27017 python backend/benchmarks/bench_reconcile.py --mp-latency-ms 80
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "app"))
+sys.path.insert(0, BENCH_DIR)
+os.environ.setdefault("MERCADO_PAGO_ACCESS_TOKEN", "TEST-bench")
+
+import httpx  # noqa: E402
+from bson import ObjectId  # noqa: E402
+
+import fake_mercadopago  # noqa: E402
+from inventory import get_inventory  # noqa: E402
+from payment_gateway import PaymentGateway  # noqa: E402
+from reconciliation import Reconciler  # noqa: E402
+from reservations import get_reservation_engine  # noqa: E402
+
+DATABASE = "bench_reconcile"
+
+
+async def seed(db, purchases, hours, approved, rejected):
+    now = datetime.utcnow()
+    first = now - timedelta(hours=hours)
+    ids = itertools.count(5_000_000_000)
+    fake_mercadopago.payments.clear()
+    for start in range(0, purchases, 5000):
+        docs = []
+        for i in range(start, min(purchases, start + 5000)):
+            created_at = first + timedelta(seconds=hours * 3600 * i / purchases)
+            oid = ObjectId.from_datetime(created_at)
+            oid = ObjectId(str(oid)[:8] + str(ObjectId())[8:])  # unique, still in creation order
+            reference = str(oid)
+            docs.append({"_id": oid, "external_reference": reference, "status": "pending", "nome": f"N{i}",
+                         "conviteType": "unitario", "created_at": created_at,
+                         "expires_at": created_at + timedelta(minutes=30)})
+            roll = random.random()
+            if roll < approved + rejected:
+                payment_id = next(ids)
+                fake_mercadopago.payments[payment_id] = {
+                    "id": payment_id, "status": "approved" if roll < approved else "rejected",
+                    "status_detail": "accredited", "external_reference": reference, "transaction_amount": 25.0,
+                    "date_created": (created_at + timedelta(seconds=random.uniform(5, 600))).isoformat(),
+                }
+        await db.purchases.insert_many(docs, ordered=False)
+
+
+async def run(args):
+    if args.mongo_url == "memory":
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+    db = client[DATABASE]
+    fake_mercadopago.LATENCY_MS = args.mp_latency_ms
+    gateway = PaymentGateway(base_url="http://fake-mercadopago", access_token="TEST-bench",
+                             transport=httpx.ASGITransport(app=fake_mercadopago.app))
+    get_inventory().db = db
+    get_reservation_engine().db = db
+    try:
+        await client.drop_database(DATABASE)
+        await seed(db, args.purchases, args.hours, args.approved, args.rejected)
+        print(f"seeded {args.purchases:,} open purchases, {len(fake_mercadopago.payments):,} payments")
+
+        print(f"{'run':<8}{'scanned':>9}{'changed':>9}{'windows':>9}{'searches':>10}{'seconds':>9}{'purchases/s':>13}")
+        for name, dry_run in (("dry-run", True), ("apply", False), ("again", False)):
+            calls = gateway.metrics()["operations"].get("search", {}).get("calls", 0)
+            reconciler = Reconciler(db, gateway, batch_size=args.batch_size, concurrency=args.concurrency,
+                                    page_size=args.page_size, window_minutes=args.window_minutes,
+                                    min_age_seconds=0, dry_run=dry_run)
+            report = await reconciler.run(restart=True)
+            searches = gateway.metrics()["operations"].get("search", {}).get("calls", 0) - calls
+            print(f"{name:<8}{report['scanned']:>9,}{report['changed']:>9,}{report['windows']:>9,}{searches:>10,}"
+                  f"{report['elapsed_s']:>9.2f}{report['purchases_per_s']:>13,.0f}")
+        if report["changed"]:
+            print("second run still found changes")
+            sys.exit(1)
+    finally:
+        await gateway.close()
+        await client.drop_database(DATABASE)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"),
+                        help="MongoDB URL, or 'memory' for mongomock_motor")
+    parser.add_argument("--purchases", type=int, default=20_000)
+    parser.add_argument("--hours", type=float, default=48, help="time span the purchases were created over")
+    parser.add_argument("--approved", type=float, default=0.7)
+    parser.add_argument("--rejected", type=float, default=0.1)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--window-minutes", type=int, default=60)
+    parser.add_argument("--mp-latency-ms", type=float, default=0.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
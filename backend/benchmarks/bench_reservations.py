@@ -0,0 +1,81 @@
+"""Concurrency check and throughput benchmark for the table reservation engine.
+
+Fires N simultaneous reservations at T tables in a scratch database and
+fails (exit code 1) if any table ends up held by more than one purchase.
+The same double-booking check runs in the test suite (tests/test_reservations.py).
+
+    MONGO_URL=mongodb://localhost:27017 python backend/benchmarks/bench_reservations.py -n 1000 --tables 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+from config import DEFAULT_EVENT_ID  # noqa: E402
+from reservations import ReservationEngine, TableUnavailable  # noqa: E402
+
+
+async def run(mongo_url, attempts, tables):
+    client = AsyncIOMotorClient(mongo_url, maxPoolSize=200)
+    db = client["bench_reservations"]
+    await db.tables.drop()
+    await db.reservations.drop()
+    table_ids = [
+        str(table_id) for table_id in (await db.tables.insert_many([
+            {"event_id": DEFAULT_EVENT_ID, "number": str(i), "type": "camarote", "status": "available", "location": "bench", "capacity": 8}
+            for i in range(tables)
+        ])).inserted_ids
+    ]
+
+    engine = ReservationEngine()
+    engine.db = db
+    won = []
+    lost = 0
+
+    async def attempt(i):
+        nonlocal lost
+        table_id = table_ids[i % tables]
+        try:
+            await engine.reserve(table_id, f"purchase-{i}")
+            won.append(table_id)
+        except TableUnavailable:
+            lost += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(attempt(i) for i in range(attempts)))
+    elapsed = time.perf_counter() - started
+
+    winners_per_table = Counter(won)
+    reservations_per_table = Counter()
+    async for reservation in db.reservations.find({}, {"table_id": 1}):
+        reservations_per_table[reservation["table_id"]] += 1
+    double_booked = [
+        t for t in table_ids if winners_per_table[t] > 1 or reservations_per_table[t] > 1
+    ]
+
+    print(f"attempts={attempts} tables={tables} won={len(won)} lost={lost}")
+    print(f"throughput={attempts / elapsed:.0f} reservations/s elapsed={elapsed * 1000:.0f}ms")
+    print(f"double_booked={len(double_booked)}")
+
+    await client.drop_database("bench_reservations")
+    client.close()
+    return 1 if double_booked or len(won) != tables else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("-n", "--attempts", type=int, default=1000)
+    parser.add_argument("--tables", type=int, default=50)
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(run(args.mongo_url, args.attempts, args.tables)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Cold-start time of a worker, checked against a budget.
+
+Every sample runs in a fresh interpreter, as a new worker would:
+
+  import      python -c "import main" (modules, routers, create_app)
+  ready       serve.py --workers 1 from spawn until /readyz answers 200;
+              needs the MongoDB at MONGO_URL, skipped with --no-serve
+
+The slowest imports under main (from python -X importtime) are listed so
+a regression points at its module. The exit status is 1 when the median
+of a phase goes over its budget, so this can gate a CI job:
+
+    python backend/benchmarks/bench_startup.py --runs 5 --import-budget-ms 800 --ready-budget-ms 2000
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+ENV = {**os.environ, "LOG_LEVEL": "WARNING"}
+ENV.setdefault("MERCADO_PAGO_ACCESS_TOKEN", "TEST-bench")
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print((time.perf_counter() - t) * 1000)"
+
+
+def time_import():
+    out = subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], cwd=APP_DIR, env=ENV, text=True)
+    return float(out.strip().splitlines()[-1])
+
+
+def slowest_imports(limit):
+    """Top-level modules imported by main, by cumulative import time."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=APP_DIR, env=ENV, text=True, capture_output=True, check=True)
+    rows, current = [], []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( +)(\S+)", line)
+        if not match:
+            continue
+        depth = (len(match.group(2)) - 1) // 2
+        if depth == 1:
+            current.append((int(match.group(1)) / 1000, match.group(3)))
+        elif depth == 0:
+            # A top-level entry closes the tree of its children (site, then main)
+            if match.group(3) == "main":
+                rows = current
+            current = []
+    return sorted(rows, reverse=True)[:limit]
+
+
+def time_ready(port, timeout=60):
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", "1", "--port", str(port), "--host", "127.0.0.1"],
+        cwd=APP_DIR, env=ENV,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            while time.perf_counter() - started < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError(f"serve.py exited with {server.returncode}")
+                try:
+                    if client.get("/readyz").status_code == 200:
+                        return (time.perf_counter() - started) * 1000
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.01)
+        raise RuntimeError(f"not ready after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+def report(name, samples, budget):
+    median = statistics.median(samples)
+    verdict = "ok" if budget is None or median <= budget else "OVER BUDGET"
+    print(f"{name:<8} median {median:8.1f} ms  min {min(samples):8.1f}  max {max(samples):8.1f}"
+          f"  budget {budget if budget is not None else '-':>6}  {verdict}")
+    return verdict == "ok"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=1000)
+    parser.add_argument("--ready-budget-ms", type=float, default=2500)
+    parser.add_argument("--no-serve", action="store_true", help="only measure the import (no MongoDB needed)")
+    parser.add_argument("--port", type=int, default=5056)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    within = report("import", [time_import() for _ in range(args.runs)], args.import_budget_ms)
+    if not args.no_serve:
+        within &= report("ready", [time_ready(args.port) for _ in range(args.runs)], args.ready_budget_ms)
+
+    print("\nslowest imports under main:")
+    for ms, module in slowest_imports(args.top):
+        print(f"  {ms:8.1f} ms  {module}")
+    sys.exit(0 if within else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Dashboard polling: N individual status-compra calls vs one batch call.
+
+Seeds --references purchases (in-process app, Mercado Pago replaced by
+fake_mercadopago): most already carry a payment_id, --unpaid share only
+has a payment in Mercado Pago, as when the webhook is late. Each round
+polls a fresh set of references once per purchase with GET
+/api/status-compra/{ref} (-c at a time) and once with POST
+/api/status-compra/batch, printing wall time, Mercado Pago calls and
+whether both returned the same payment ids.
+
+    python backend/benchmarks/bench_status_batch.py --mongo-url memory --references 500 --mp-latency-ms 80
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+import httpx  # noqa: E402
+
+from bench_funnel import configure  # noqa: E402
+
+PAYMENT_IDS = iter(range(7_000_000_000, 8_000_000_000))
+
+
+async def seed(db, references, unpaid):
+    """Insert purchases; returns {external_reference: expected payment_id}."""
+    import fake_mercadopago
+    from bson import ObjectId
+    from config import DEFAULT_EVENT_ID
+
+    now = datetime.utcnow()
+    expected, docs = {}, []
+    for i in range(references):
+        reference = str(ObjectId())
+        created_at = now - timedelta(minutes=random.uniform(1, 25))
+        payment_id = next(PAYMENT_IDS)
+        doc = {"event_id": DEFAULT_EVENT_ID, "external_reference": reference, "status": "pending", "nome": f"Bench{i}",
+               "conviteType": "unitario", "created_at": created_at}
+        if random.random() < unpaid:
+            fake_mercadopago.payments[payment_id] = {
+                "id": payment_id, "status": "approved", "status_detail": "accredited",
+                "external_reference": reference, "transaction_amount": 25.0,
+                "date_created": (created_at + timedelta(seconds=30)).isoformat(),
+            }
+        else:
+            doc["payment_id"] = payment_id
+        docs.append(doc)
+        expected[reference] = str(payment_id)
+    await db.purchases.insert_many(docs)
+    return expected
+
+
+def mp_calls(gateway):
+    return sum(op["calls"] for op in gateway.metrics()["operations"].values())
+
+
+async def run(args):
+    app, main = configure(args.mongo_url, args.database, args.mp_latency_ms)
+    await main.startup()
+    import database
+    import payment_gateway
+
+    db = database.get_database()
+    gateway = payment_gateway.get_gateway()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                     timeout=300) as client:
+            async def individual(references):
+                async def one(reference):
+                    async with semaphore:
+                        response = await client.get(f"/api/status-compra/{reference}")
+                        return response.json().get("payment_id") if response.status_code == 200 else None
+                return await asyncio.gather(*(one(r) for r in references))
+
+            async def batch(references):
+                response = await client.post("/api/status-compra/batch", json={"references": references})
+                response.raise_for_status()
+                return [item["payment_id"] for item in response.json()["results"]]
+
+            print(f"{'mode':<12}{'refs':>6}{'seconds':>9}{'refs/s':>10}{'MP calls':>10}{'correct':>9}")
+            for round_ in range(args.rounds):
+                for name, poll in (("individual", individual), ("batch", batch)):
+                    expected = await seed(db, args.references, args.unpaid)
+                    references = list(expected)
+                    calls = mp_calls(gateway)
+                    started = time.perf_counter()
+                    payment_ids = await poll(references)
+                    seconds = time.perf_counter() - started
+                    correct = sum(expected[r] == p for r, p in zip(references, payment_ids))
+                    print(f"{name:<12}{len(references):>6}{seconds:>9.3f}{len(references) / seconds:>10,.0f}"
+                          f"{mp_calls(gateway) - calls:>10}{correct:>9}")
+    finally:
+        if args.mongo_url != "memory":
+            await database.db.client.drop_database(args.database)
+        await main.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"),
+                        help="MongoDB URL, or 'memory' for mongomock_motor")
+    parser.add_argument("--database", default="bench_status_batch")
+    parser.add_argument("--references", type=int, default=500)
+    parser.add_argument("--unpaid", type=float, default=0.2, help="share of purchases without a payment_id")
+    parser.add_argument("-c", "--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--mp-latency-ms", type=float, default=0.0,
+                        help="artificial latency of the fake Mercado Pago")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Compare cached table views with the uncached find() path.
+
+Seeds a scratch database with N tables and times both paths:
+
+    MONGO_URL=mongodb://localhost:27017 python backend/benchmarks/bench_table_cache.py --tables 300
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+from config import DEFAULT_EVENT_ID  # noqa: E402
+from table_cache import TableInventoryCache  # noqa: E402
+
+
+async def timed(label, iterations, call):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await call()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {iterations / elapsed:>10.0f} req/s  {elapsed / iterations * 1e6:>8.1f} us/req")
+
+
+async def run(mongo_url, tables, iterations):
+    client = AsyncIOMotorClient(mongo_url)
+    db = client["bench_table_cache"]
+    await db.tables.drop()
+    await db.tables.insert_many([
+        {"event_id": DEFAULT_EVENT_ID, "number": str(i), "type": "camarote" if i % 5 == 0 else "regular",
+         "status": "available" if i % 3 else "reserved", "location": f"setor {i % 10}", "capacity": 4}
+        for i in range(tables)
+    ])
+
+    async def uncached():
+        docs = await db.tables.find(
+            {"event_id": DEFAULT_EVENT_ID, "status": "available", "type": "camarote"}
+        ).to_list(length=None)
+        for doc in docs:
+            doc["_id"] = str(doc["_id"])
+
+    cache = TableInventoryCache(max_age=3600)
+    cache.db = db
+
+    async def cached():
+        await cache.view(status="available", type="camarote")
+
+    print(f"tables={tables} iterations={iterations}")
+    await timed("uncached", iterations, uncached)
+    await timed("cached", iterations, cached)
+    print(f"cache stats: {cache.stats()}")
+
+    await client.drop_database("bench_table_cache")
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--tables", type=int, default=300)
+    parser.add_argument("-n", "--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.mongo_url, args.tables, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Vendor code validation and vendor counter writes, before and after the registry.
+
+Seeds --vendors vendors, then measures:
+
+* validating a vendedor_code: VendorRegistry.get (a dict lookup) against the
+  find_one per iniciar-compra it replaces;
+* recording --sales sales: the old path (a vendors upsert per sale) against
+  record_sale + one batched flush;
+* crash safety: sales left uncounted, and a flush applied but never marked
+  counted, are replayed from vendor_sales; the counters must equal the sales.
+
+    python backend/benchmarks/bench_vendors.py --mongo-url memory --sales 5000
+    MONGO_URL=mongodb://localhost:27017 python backend/benchmarks/bench_vendors.py
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "app"))
+os.environ.setdefault("MERCADO_PAGO_ACCESS_TOKEN", "TEST-bench")
+
+from bson import ObjectId  # noqa: E402
+
+import sales_rollups  # noqa: E402
+import vendors  # noqa: E402
+from indexes import INDEXES, ensure_indexes  # noqa: E402
+
+DATABASE = "bench_vendors"
+PAYMENT_IDS = iter(range(9_000_000_000, 10_000_000_000))
+
+
+async def legacy_record_sale(db, vendedor_code, payment_info, purchase):
+    """record_sale as it was: every new sale upserts its vendor's counters."""
+    now = datetime.utcnow()
+    sale = {"vendedor_code": vendedor_code, "payment_id": payment_info["id"],
+            "purchase_id": payment_info["external_reference"], "amount": payment_info["transaction_amount"],
+            "status": payment_info["status"], "created_at": now}
+    result = await db.vendor_sales.update_one({"payment_id": payment_info["id"]}, {"$setOnInsert": sale},
+                                              upsert=True)
+    if result.upserted_id is None:
+        return False
+    await db.vendors.update_one(
+        {"code": vendedor_code},
+        {"$inc": {"total_sales": 1, "total_amount": payment_info["transaction_amount"]}, "$set": {"last_sale_at": now}},
+        upsert=True,
+    )
+    await sales_rollups.apply_sale(db, sale, purchase)
+    return True
+
+
+def sale(codes):
+    payment_id = next(PAYMENT_IDS)
+    return random.choice(codes), {"id": payment_id, "external_reference": f"ref{payment_id}",
+                                  "transaction_amount": random.choice([25.0, 40.0, 45.0]), "status": "approved"}
+
+
+async def check_counters(db):
+    """Vendor counters must match the counted sales exactly."""
+    expected = defaultdict(lambda: [0, 0.0])
+    async for s in db.vendor_sales.find({}, {"vendedor_code": 1, "amount": 1, "counted": 1}):
+        if s.get("counted") is not True:
+            return f"sale {s['_id']} not counted"
+        expected[s["vendedor_code"]][0] += 1
+        expected[s["vendedor_code"]][1] += s["amount"]
+    async for v in db.vendors.find({"total_sales": {"$gt": 0}}, {"code": 1, "total_sales": 1, "total_amount": 1}):
+        count, amount = expected.pop(v["code"], (0, 0.0))
+        if v["total_sales"] != count or abs(v["total_amount"] - amount) > 1e-6:
+            return f"{v['code']}: counters {v['total_sales']}/{v['total_amount']} != sales {count}/{amount}"
+    return f"{len(expected)} vendors with sales but no counters" if expected else None
+
+
+async def run(args):
+    if args.mongo_url == "memory":
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+    db = client[DATABASE]
+    purchase = {"conviteType": "unitario", "mesa": False, "estacionamento": False}
+    try:
+        await client.drop_database(DATABASE)
+        await ensure_indexes(db, {name: INDEXES[name] for name in ("vendors", "vendor_sales", "sales_rollups")})
+        codes = [f"V{i:04d}" for i in range(args.vendors)]
+        await db.vendors.insert_many([{"code": c, "nome": f"Vendedor {c}", "active": True,
+                                       "commission_percent": random.choice([5, 10, 15])} for c in codes])
+        registry = vendors.get_vendor_registry()
+        registry.db = db
+        registry.replay_after = timedelta(0)  # replay everything, there are no live workers
+        await registry.reload()
+
+        print(f"{'validation':<28}{'lookups':>9}{'µs/lookup':>11}")
+        lookups = [random.choice(codes + ["typo"]) for _ in range(args.lookups)]
+        started = time.perf_counter()
+        for code in lookups:
+            registry.get(code)
+        print(f"{'registry dict lookup':<28}{len(lookups):>9,}{(time.perf_counter() - started) / len(lookups) * 1e6:>11.2f}")
+        queries = lookups[:args.queries]
+        started = time.perf_counter()
+        for code in queries:
+            await db.vendors.find_one({"code": code}, {"_id": 1})
+        print(f"{'find_one per purchase':<28}{len(queries):>9,}{(time.perf_counter() - started) / len(queries) * 1e6:>11.2f}")
+
+        print(f"\n{'recording':<28}{'sales':>9}{'seconds':>9}{'sales/s':>10}{'vendor writes':>15}")
+        started = time.perf_counter()
+        for _ in range(args.sales):
+            await legacy_record_sale(db, *sale(codes), purchase)
+        seconds = time.perf_counter() - started
+        print(f"{'upsert per sale (old)':<28}{args.sales:>9,}{seconds:>9.2f}{args.sales / seconds:>10,.0f}{args.sales:>15,}")
+        # Same starting point for the new path
+        await db.vendor_sales.delete_many({})
+        await db[sales_rollups.ROLLUPS].delete_many({})
+        await db.vendors.update_many({}, {"$unset": {"total_sales": "", "total_amount": "", "last_sale_at": ""}})
+
+        writes = registry.stats()["vendor_writes"]
+        started = time.perf_counter()
+        for _ in range(args.sales):
+            await vendors.record_sale(db, *sale(codes), purchase)
+        await registry.flush()
+        seconds = time.perf_counter() - started
+        print(f"{'record_sale + flush':<28}{args.sales:>9,}{seconds:>9.2f}{args.sales / seconds:>10,.0f}"
+              f"{registry.stats()['vendor_writes'] - writes:>15,}")
+
+        # Crash 1: sales recorded, worker died before flushing
+        for _ in range(args.sales // 10):
+            await vendors.record_sale(db, *sale(codes), purchase)
+        registry._pending = []
+        # Crash 2: a flush added its $inc but died before marking its sales counted
+        for _ in range(args.sales // 10):
+            await vendors.record_sale(db, *sale(codes), purchase)
+        claimed, registry._pending = registry._pending, []
+        token = ObjectId.from_datetime(datetime(2020, 1, 1))
+        await db.vendor_sales.update_many({"_id": {"$in": claimed}}, {"$set": {"counted": token}})
+        await registry._apply_flush(token)
+        await db.vendor_sales.update_many({"_id": {"$in": claimed}}, {"$set": {"counted": token}})
+        replayed = await registry.replay()
+        problem = await check_counters(db)
+        print(f"\nreplayed {replayed:,} sales after simulated crashes: {problem or 'counters match vendor_sales'}")
+        if problem:
+            sys.exit(1)
+    finally:
+        await client.drop_database(DATABASE)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"),
+                        help="MongoDB URL, or 'memory' for mongomock_motor")
+    parser.add_argument("--vendors", type=int, default=200)
+    parser.add_argument("--sales", type=int, default=20_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2_000, help="find_one lookups to time")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Throughput scaling curve of serve.py from 1 to N worker processes.
+
+For each worker count the app is started with serve.py, polled on /readyz
+until every worker is up, then loaded for --seconds by --clients client
+processes (so the load generator is not the bottleneck) on a read path
+that stays in-process (GET /api/tables, GET /api/precos) and on
+GET /api/status-compra, which reads Mongo. Workers are stopped with
+SIGTERM, exercising the graceful drain.
+
+    MONGO_URL=mongodb://localhost:27017 python backend/benchmarks/bench_workers.py --max-workers 8
+
+The table printed is the scaling curve: req/s per worker count and the
+speedup over one worker. Keep --clients at or above the core count of the
+machine under test, and run the client on another machine for numbers
+above what one box can both serve and generate.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+PATHS = ["/api/tables", "/api/precos"]
+
+
+def wait_ready(base_url, workers, timeout=60):
+    """Poll /readyz until ``workers`` distinct pids have answered ready."""
+    pids = set()
+    deadline = time.monotonic() + timeout
+    with httpx.Client(base_url=base_url, timeout=2) as client:
+        while time.monotonic() < deadline:
+            try:
+                response = client.get("/readyz")
+                if response.status_code == 200:
+                    pids.add(response.json()["pid"])
+                    if len(pids) >= workers:
+                        return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.05)
+    raise RuntimeError(f"only {len(pids)} of {workers} workers became ready")
+
+
+async def _load(base_url, paths, seconds, connections):
+    done = 0
+    errors = 0
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=10) as client:
+        deadline = time.monotonic() + seconds
+
+        async def loop(offset):
+            nonlocal done, errors
+            n = offset
+            while time.monotonic() < deadline:
+                try:
+                    response = await client.get(paths[n % len(paths)])
+                    if response.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                done += 1
+                n += 1
+
+        await asyncio.gather(*(loop(i) for i in range(connections)))
+    return done, errors
+
+
+def client_process(args):
+    return asyncio.run(_load(*args))
+
+
+def measure(base_url, paths, seconds, clients, connections):
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.map(client_process, [(base_url, paths, seconds, connections)] * clients)
+    requests = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    return requests / seconds, errors
+
+
+def run_workers(workers, args):
+    port = args.port
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port), "--host", "127.0.0.1"],
+        cwd=APP_DIR, env={**os.environ, "LOG_LEVEL": "WARNING"},
+    )
+    try:
+        wait_ready(base_url, workers)
+        with httpx.Client(base_url=base_url) as client:
+            reference = client.post("/api/iniciar-compra", json={
+                "nome": "Bench", "sobrenome": "Workers", "telefone": "11 99999-0000",
+                "conviteType": "unitario", "mesa": False, "estacionamento": False,
+            }).json()["external_reference"]
+        row = {"workers": workers}
+        row["cached_rps"], row["cached_errors"] = measure(base_url, PATHS, args.seconds, args.clients, args.connections)
+        row["mongo_rps"], row["mongo_errors"] = measure(
+            base_url, [f"/api/status-compra/{reference}"], args.seconds, args.clients, args.connections
+        )
+        return row
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--clients", type=int, default=os.cpu_count() or 1, help="load generator processes")
+    parser.add_argument("--connections", type=int, default=32, help="connections per client process")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--output", help="write the curve as JSON to this file")
+    args = parser.parse_args()
+
+    counts = sorted({1, *[2 ** i for i in range(1, 8) if 2 ** i < args.max_workers], args.max_workers})
+    rows = []
+    print(f"{'workers':>7} {'cached rps':>11} {'speedup':>8} {'mongo rps':>10} {'speedup':>8} {'errors':>7}")
+    for workers in counts:
+        row = run_workers(workers, args)
+        rows.append(row)
+        base = rows[0]
+        print(f"{workers:>7} {row['cached_rps']:>11,.0f} {row['cached_rps'] / base['cached_rps']:>7.2f}x "
+              f"{row['mongo_rps']:>10,.0f} {row['mongo_rps'] / base['mongo_rps']:>7.2f}x "
+              f"{row['cached_errors'] + row['mongo_errors']:>7}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cpus": os.cpu_count(), "rows": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
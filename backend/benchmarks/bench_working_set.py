@@ -0,0 +1,109 @@
+"""Working-set size of the purchases collection before and after slimming.
+
+Seeds purchases that embed a Mercado Pago-sized payment_details payload,
+measures the collection and the bytes the status-compra read pulls per
+call, runs payment_events.migrate and measures again.
+
+    MONGO_URL=mongodb://localhost:27017 python backend/benchmarks/bench_working_set.py --purchases 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import bson  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+import payment_events  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+
+DATABASE = "bench_working_set"
+
+
+def fake_payment(n):
+    """Roughly the shape and size of a PIX payment response."""
+    return {
+        "id": 10_000_000 + n,
+        "status": "approved",
+        "status_detail": "accredited",
+        "external_reference": f"ref-{n}",
+        "transaction_amount": 25.0,
+        "date_created": datetime.utcnow().isoformat(),
+        "payer": {"email": f"buyer{n}@example.com", "identification": {"type": "CPF", "number": "00000000000"}},
+        "fee_details": [{"type": "mercadopago_fee", "amount": 0.25, "fee_payer": "collector"}],
+        "point_of_interaction": {"transaction_data": {
+            "qr_code": "0" * 180,
+            "qr_code_base64": "A" * 2400,
+            "ticket_url": f"https://www.mercadopago.com.br/payments/{n}/ticket",
+        }},
+        "additional_info": {"items": [{"title": "Convite", "quantity": 1, "unit_price": 25.0}]},
+    }
+
+
+async def seed(db, purchases):
+    batch = []
+    for n in range(purchases):
+        payment = fake_payment(n)
+        batch.append({
+            "external_reference": f"ref-{n}",
+            "nome": "Fulano", "sobrenome": "de Tal", "telefone": "11 99999-0000",
+            "conviteType": "unitario", "mesa": False, "estacionamento": False,
+            "total_amount": 2500, "status": "approved", "payment_id": payment["id"],
+            "payment_details": payment, "updated_at": datetime.utcnow(),
+        })
+        if len(batch) == 1000:
+            await db.purchases.insert_many(batch)
+            batch = []
+    if batch:
+        await db.purchases.insert_many(batch)
+
+
+async def measure(db, label, projection, samples):
+    stats = await db.command("collStats", "purchases")
+    read_bytes = 0
+    started = time.perf_counter()
+    for n in range(samples):
+        doc = await db.purchases.find_one({"external_reference": f"ref-{n}"}, projection)
+        read_bytes += len(bson.encode(doc))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<7} size={stats['size'] / 2**20:>8.1f} MiB  avg_doc={stats['avgObjSize']:>6.0f} B  "
+          f"storage={stats['storageSize'] / 2**20:>7.1f} MiB  indexes={stats['totalIndexSize'] / 2**20:>6.1f} MiB  "
+          f"status read={read_bytes / samples:>6.0f} B/call {elapsed / samples * 1000:.2f} ms/call")
+
+
+async def run(mongo_url, purchases, batch_size, samples):
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[DATABASE]
+    try:
+        await client.drop_database(DATABASE)
+        await ensure_indexes(db)
+        await seed(db, purchases)
+        samples = min(samples, purchases)
+        await measure(db, "before", None, samples)
+
+        started = time.perf_counter()
+        migrated = await payment_events.migrate(db, batch_size)
+        print(f"migrated {migrated} purchases in {time.perf_counter() - started:.1f}s")
+        await db.command("compact", "purchases")
+        await measure(db, "after", {"payment_id": 1}, samples)
+    finally:
+        await client.drop_database(DATABASE)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--purchases", type=int, default=20_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--samples", type=int, default=2_000, help="status reads timed per phase")
+    args = parser.parse_args()
+    asyncio.run(run(args.mongo_url, args.purchases, args.batch_size, args.samples))
+
+
+if __name__ == "__main__":
+    main()
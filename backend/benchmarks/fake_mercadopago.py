@@ -0,0 +1,123 @@
+"""Local stand-in for the Mercado Pago payments API.
+
+Implements just enough of /v1/payments for the backend to run offline:
+create, get by id and search by external_reference or by a date_created
+range (sorted, paginated). Payments are kept in memory. Point the backend
+at it with MERCADO_PAGO_API_URL, e.g.:
+
+    python backend/benchmarks/fake_mercadopago.py --port 8081 --latency-ms 150
+    MERCADO_PAGO_API_URL=http://localhost:8081 python main.py
+"""
+import argparse
+import asyncio
+import itertools
+import random
+from datetime import datetime
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+
+LATENCY_MS = 0.0
+APPROVE_RATIO = 1.0
+
+app = FastAPI()
+payments = {}
+_ids = itertools.count(1_000_000_000)
+
+
+async def simulate_latency():
+    if LATENCY_MS:
+        await asyncio.sleep(LATENCY_MS / 1000)
+
+
+def build_payment(data):
+    payment_id = next(_ids)
+    method = data.get("payment_method_id")
+    payment = {
+        "id": payment_id,
+        "status": "pending" if method == "pix" else (
+            "approved" if random.random() < APPROVE_RATIO else "rejected"
+        ),
+        "status_detail": "accredited",
+        "payment_method_id": method,
+        "transaction_amount": data.get("transaction_amount"),
+        "external_reference": data.get("external_reference"),
+        "payer": data.get("payer", {}),
+        "date_created": datetime.utcnow().isoformat(),
+    }
+    if method == "pix":
+        payment["point_of_interaction"] = {
+            "transaction_data": {"qr_code": f"pix-{payment_id}", "qr_code_base64": "iVBORw0KGgo="}
+        }
+    return payment
+
+
+@app.post("/v1/payments")
+async def create_payment(request: Request):
+    await simulate_latency()
+    payment = build_payment(await request.json())
+    payments[payment["id"]] = payment
+    return JSONResponse(payment, status_code=201)
+
+
+def parse_date(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+@app.get("/v1/payments/search")
+async def search_payments(external_reference: str = None, range_field: str = Query(None, alias="range"),
+                          begin_date: str = None, end_date: str = None, sort: str = None,
+                          criteria: str = "asc", limit: int = 30, offset: int = 0):
+    await simulate_latency()
+    results = [
+        p for p in payments.values()
+        if external_reference is None or p["external_reference"] == external_reference
+    ]
+    if range_field:
+        begin = parse_date(begin_date) if begin_date else datetime.min
+        end = parse_date(end_date) if end_date else datetime.max
+        results = [p for p in results if begin <= parse_date(p[range_field]) <= end]
+    if sort:
+        results.sort(key=lambda p: p.get(sort) or "", reverse=criteria == "desc")
+    return {
+        "paging": {"total": len(results), "limit": limit, "offset": offset},
+        "results": results[offset:offset + limit],
+    }
+
+
+@app.get("/v1/payments/{payment_id}")
+async def get_payment(payment_id: int):
+    await simulate_latency()
+    if payment_id not in payments:
+        raise HTTPException(status_code=404, detail="Payment not found")
+    return payments[payment_id]
+
+
+@app.put("/v1/payments/{payment_id}")
+async def update_payment(payment_id: int, request: Request):
+    """Not part of the real API surface we use; lets benchmarks flip a PIX to approved."""
+    if payment_id not in payments:
+        raise HTTPException(status_code=404, detail="Payment not found")
+    payments[payment_id].update(await request.json())
+    return payments[payment_id]
+
+
+def main():
+    global LATENCY_MS, APPROVE_RATIO
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="artificial delay added to every call")
+    parser.add_argument("--approve-ratio", type=float, default=1.0,
+                        help="share of card payments created as approved")
+    args = parser.parse_args()
+    LATENCY_MS = args.latency_ms
+    APPROVE_RATIO = args.approve_ratio
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
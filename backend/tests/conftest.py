@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+os.environ.setdefault("MERCADO_PAGO_ACCESS_TOKEN", "TEST-tests")
+os.environ.setdefault("APP_ENV", "development")  # test ticket signing key
+
+# Tests marked mongo need a real mongod (explain plans, true concurrency):
+# MONGO_TEST_URL=mongodb://localhost:27017 python -m pytest -q backend/tests
+MONGO_TEST_URL = os.getenv("MONGO_TEST_URL")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "mongo: needs a real mongod at MONGO_TEST_URL")
+
+
+def pytest_collection_modifyitems(config, items):
+    if MONGO_TEST_URL:
+        return
+    skip = pytest.mark.skip(reason="MONGO_TEST_URL is not set")
+    for item in items:
+        if "mongo" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def mongo_client_factory():
+    """Builds a client inside the test's own event loop: ``"memory"`` or the real mongod."""
+    def factory(backend):
+        if backend == "memory":
+            mongomock_motor = pytest.importorskip("mongomock_motor")
+            return mongomock_motor.AsyncMongoMockClient()
+        from motor.motor_asyncio import AsyncIOMotorClient
+        return AsyncIOMotorClient(MONGO_TEST_URL, maxPoolSize=200)
+    return factory
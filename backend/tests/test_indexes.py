@@ -0,0 +1,24 @@
+import asyncio
+
+import pytest
+
+from indexes import HOT_QUERIES, check_query_plans, ensure_indexes, index_report
+
+DATABASE = "test_indexes"
+
+
+@pytest.mark.mongo
+def test_hot_queries_use_an_index(mongo_client_factory):
+    async def run():
+        client = mongo_client_factory("mongo")
+        await client.drop_database(DATABASE)
+        db = client[DATABASE]
+        try:
+            await ensure_indexes(db)
+            assert all(not r["missing"] for r in (await index_report(db)).values())
+            return await check_query_plans(db, HOT_QUERIES)
+        finally:
+            await client.drop_database(DATABASE)
+            client.close()
+
+    assert asyncio.run(run()) == []
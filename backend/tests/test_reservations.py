@@ -0,0 +1,51 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+from config import DEFAULT_EVENT_ID
+from reservations import HELD, ReservationEngine, TableUnavailable
+
+DATABASE = "test_reservations"
+
+
+async def race(db, attempts, tables):
+    """Fire ``attempts`` simultaneous reservations at ``tables`` tables; returns (winners, reservations) per table."""
+    result = await db.tables.insert_many([
+        {"event_id": DEFAULT_EVENT_ID, "number": str(i), "type": "camarote", "status": "available", "capacity": 8}
+        for i in range(tables)
+    ])
+    table_ids = [str(table_id) for table_id in result.inserted_ids]
+    engine = ReservationEngine()
+    engine.db = db
+    winners = Counter()
+
+    async def attempt(i):
+        table_id = table_ids[i % tables]
+        try:
+            await engine.reserve(table_id, f"purchase-{i}")
+            winners[table_id] += 1
+        except TableUnavailable:
+            pass
+
+    await asyncio.gather(*(attempt(i) for i in range(attempts)))
+    reservations = Counter()
+    async for reservation in db.reservations.find({"status": HELD}, {"table_id": 1}):
+        reservations[reservation["table_id"]] += 1
+    return table_ids, winners, reservations
+
+
+@pytest.mark.parametrize("backend", ["memory", pytest.param("mongo", marks=pytest.mark.mongo)])
+def test_no_table_is_held_twice(backend, mongo_client_factory):
+    async def run():
+        client = mongo_client_factory(backend)
+        await client.drop_database(DATABASE)
+        try:
+            return await race(client[DATABASE], attempts=1000, tables=50)
+        finally:
+            await client.drop_database(DATABASE)
+            client.close()
+
+    table_ids, winners, reservations = asyncio.run(run())
+    assert all(winners[t] == 1 for t in table_ids)
+    assert all(reservations[t] == 1 for t in table_ids)
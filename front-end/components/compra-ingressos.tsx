@@ -347,7 +347,7 @@ export function CompraIngressos({
           )}
         </div>
       )}
-      {showStatusScreen && purchaseId && <StatusScreenBrick purchaseId={purchaseId} amount={paymentAmount} />}
+      {showStatusScreen && purchaseId && <StatusScreenBrick purchaseId={purchaseId} />}
     </div>
   )
 }
@@ -4,42 +4,35 @@ import type React from "react"
 
 import { useEffect, useState } from "react"
 import { Card, CardContent } from "@/components/ui/card"
-import { useVendedor } from "../app/hooks/useVendedor"
+import { assinarStatusCompra } from "@/lib/api"
 
 interface StatusScreenBrickProps {
   purchaseId: string // ID da compra (usado para buscar o status do pagamento)
-  amount: number
 }
 
-export const StatusScreenBrick: React.FC<StatusScreenBrickProps> = ({ purchaseId, amount }) => {
+export const StatusScreenBrick: React.FC<StatusScreenBrickProps> = ({ purchaseId }) => {
   const [paymentId, setPaymentId] = useState<string | null>(null)
   const [status, setStatus] = useState<string | null>(null)
   const [error, setError] = useState<string | null>(null)
-  const { vendedor } = useVendedor() // Obtendo o código do vendedor
 
   useEffect(() => {
-    const fetchPaymentStatus = async () => {
-      try {
-        const response = await fetch(`/api/status-compra/${purchaseId}`)
-        const data = await response.json()
-
-        if (response.ok && data.payment_id) {
-          setPaymentId(data.payment_id)
+    // Status por push (SSE): atualiza a tela quando o webhook muda a compra, sem polling
+    try {
+      return assinarStatusCompra(purchaseId, (data) => {
+        if (data.payment_id) {
+          setPaymentId(String(data.payment_id))
           setStatus(data.status) // Salva o status do pagamento
-        } else {
-          setError("Erro ao buscar informações do pagamento")
         }
-      } catch (error) {
-        setError("Erro ao comunicar com o servidor")
-      }
+      })
+    } catch (error) {
+      setError("Erro ao comunicar com o servidor")
     }
-
-    fetchPaymentStatus()
   }, [purchaseId])
 
   useEffect(() => {
     if (!paymentId) return
 
+    let controller: any // a brick é recriada a cada novo status recebido pelo stream
     const script = document.createElement("script")
     script.src = "https://sdk.mercadopago.com/js/v2"
     script.type = "text/javascript"
@@ -58,21 +51,6 @@ export const StatusScreenBrick: React.FC<StatusScreenBrickProps> = ({ purchaseId
           callbacks: {
             onReady: async () => {
               console.log("Status Screen Brick pronto")
-
-              // Register the sale if payment was successful and we have a vendor code
-              if (status === "approved" && vendedor) {
-                try {
-                  await registerSale(vendedor, {
-                    id: paymentId,
-                    external_reference: purchaseId,
-                    status,
-                    transaction_amount: amount,
-                  })
-                  console.log("Venda registrada com sucesso!")
-                } catch (error) {
-                  console.error("Erro ao registrar venda:", error)
-                }
-              }
             },
             onError: (error: any) => {
               console.error("Erro ao carregar Status Screen Brick:", error)
@@ -81,16 +59,17 @@ export const StatusScreenBrick: React.FC<StatusScreenBrickProps> = ({ purchaseId
           },
         }
 
-        await bricksBuilder.create("statusScreen", "statusScreenBrick", settings)
+        controller = await bricksBuilder.create("statusScreen", "statusScreenBrick", settings)
       }
 
       renderStatusScreenBrick()
     }
 
     return () => {
+      controller?.unmount()
       document.body.removeChild(script)
     }
-  }, [paymentId, status, vendedor, purchaseId, amount])
+  }, [paymentId, status])
 
   if (error) {
     return (
@@ -110,27 +89,3 @@ export const StatusScreenBrick: React.FC<StatusScreenBrickProps> = ({ purchaseId
     </Card>
   )
 }
-
-async function registerSale(
-  vendedor: string,
-  saleData: {
-    id: string
-    external_reference: string
-    status: string
-    transaction_amount: number
-  },
-) {
-  try {
-    await fetch("/api/registrar-venda", {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({ vendedor, ...saleData }),
-    })
-  } catch (error) {
-    console.error("Erro ao registrar venda:", error)
-    throw error // Re-throw para o chamador lidar com o erro
-  }
-}
-
@@ -118,23 +118,27 @@ export const statusCompra = async (externalReference: string) => {
     }
 };
 
-// Vendor Sales Endpoints
-export const registrarVenda = async (vendedorCode: string, paymentInfo: {
-    id: string,
-    external_reference: string,
-    transaction_amount: number,
-    status: string
-}) => {
-    try {
-        const response = await axios.post(`${API_BASE_URL}/api/registrar-venda`, {
-            vendedor_code: vendedorCode,
-            payment_info: paymentInfo
-        });
-        return response.data;
-    } catch (error) {
-        console.error('Error registering sale:', error);
-        throw error;
-    }
+// Status após os quais a compra não muda mais (FINAL_STATUSES em backend/app/status_stream.py)
+export const STATUS_FINAIS = ['approved', 'rejected', 'cancelled', 'refunded', 'charged_back', 'expired'];
+
+// Server-Sent Events: recebe o status da compra sem polling. Retorna a função para fechar o stream.
+// O servidor encerra o stream no status final; fechamos o EventSource para ele não reconectar.
+export const assinarStatusCompra = (
+    externalReference: string,
+    onStatus: (data: { status: string, payment_id: string | null }) => void
+) => {
+    const source = new EventSource(`${API_BASE_URL}/api/status-compra/${externalReference}/stream`);
+    source.addEventListener('status', (event) => {
+        const data = JSON.parse((event as MessageEvent).data);
+        if (STATUS_FINAIS.includes(data.status)) {
+            source.close();
+        }
+        onStatus(data);
+    });
+    source.onerror = (error) => {
+        console.error('Error on purchase status stream:', error);
+    };
+    return () => source.close();
 };
 
 // Mercado Pago Webhook